@@ -1,13 +1,19 @@
+import io
+import os
 import sys
 import json
 import time
 import argparse
 import subprocess
+import atexit
 from os import getpid
 from datetime import datetime
-from flask import Flask, render_template, redirect, url_for, request, jsonify
+from flask import Flask, render_template, redirect, url_for, request, jsonify, abort, send_file
 
 from gustavio import GustavIO
+from sessions import SessionManager
+from audio import AudioStore
+from gustav.forms.html import channel
 
 
 app = Flask(__name__)
@@ -42,6 +48,19 @@ def speech():
 def lateralization():
     return render_template('lateralization.html')
 
+@app.route('/audio/<subject_id>/<name>')
+def audio(subject_id, name):
+    # Trial audio, from memory (see audio.py). conditional answers Range
+    # requests (for seeking in a trial bundle) and If-None-Match. The browser
+    # must check with us before reusing a cached copy, and the etag is a hash
+    # of the audio, so it never plays a stale stimulus
+    data, mimetype, etag = AUDIO.get(subject_id, name)
+    if data is None:
+        abort(404)
+    response = send_file(io.BytesIO(data), mimetype=mimetype, download_name=name, conditional=True, etag=etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 @app.route('/login', methods=['POST'])
 def login():
     client_request = dict(request.form)
@@ -104,13 +123,11 @@ def setupapi():
 @app.route('/killpid', methods=['POST'])
 def killpid():
     client_request = dict(request.form)
-    procs = GIO.get_processes()
     GIO.update_running()
     if client_request['pid'] == 'all':
-        # Kill all gustav
-        gustav_pids = [s['pid'] for s in GIO.running['subjects']]
+        # Kill all gustav (the registry only lists live sessions)
         gustav_ports = {s['pid']: s['port'] for s in GIO.running['subjects']}
-        pids = [p for p in procs if p in gustav_pids]
+        pids = list(gustav_ports)
         response = f'Attempted killing {len(pids)} PIDs'
         for pid in pids:
             success = GIO.kill(pid)
@@ -127,7 +144,8 @@ def killpid():
         procs = GIO.get_processes(status=['running'])
         gustav_pids = [s['pid'] for s in GIO.running['subjects']]
         server_pids = list(GIO.running['ports'].values())
-        pids = [p for p in procs if p not in gustav_pids and p not in server_pids]
+        worker_pids = [pid for pool in GIO.pools.values() for pid in pool.processes]
+        pids = [p for p in procs if p not in gustav_pids and p not in server_pids and p not in worker_pids]
         response = f'Found {len(pids)} processes to cleanup'
         for pid in pids:
             success = GIO.kill(pid)
@@ -135,11 +153,31 @@ def killpid():
     return jsonify(response)
 
 
+def session_api(client_request):
+    # Each client id gets its own session, running in this process
+    subject_id = client_request.get('id')
+    if client_request['type'] == "style":
+        AUDIO.drop(subject_id)
+        session, style = SM.start(subject_id, os.path.join(GIO.script_dir, GIO.script))
+        if session is None:
+            msg = 'The experiment could not be started, please try again later.<br>'
+            return {'type': 'ignore', 'message': msg}
+        return style
+    session = SM.get(subject_id)
+    if session is None:
+        return {'type': 'abort', 'message': 'Session not found, please reload the page.'}
+    response = AUDIO.extract(subject_id, session.request(client_request))
+    print(f'Sending: {json.dumps(response, indent=2)}')
+    return response
+
+
 @app.route('/api', methods=['POST'])
 def api():
     print(f'Received: {json.dumps(dict(request.form), indent=2)}')
     # Forward request to gustav
     client_request = dict(request.form)
+    if SM is not None:
+        return jsonify(session_api(client_request))
     # Loading home page
     if client_request['type'] == "style":
         # If a gustav process is already running check how long it has been running for
@@ -156,11 +194,12 @@ def api():
                 output = {'type': 'ignore', 'message': msg}
                 return jsonify(output)
         # Initialize new ID
+        AUDIO.drop(getattr(GIO, 'id', None))
         subject_id = str(datetime.timestamp(datetime.now()))
         # Set up experiment
         GIO.setup(subject_id, args.port)
         # Start gustav script
-        GIO.run(sleep=2)
+        GIO.run()
         # Initialize
         GIO.initialize({'id': GIO.id})
         client_request['id'] = GIO.id
@@ -168,10 +207,10 @@ def api():
     client_request['id'] = GIO.id
     GIO.send_request(client_request)
     # Get gustav response
-    response = GIO.get_response()
+    response = AUDIO.extract(GIO.id, GIO.get_response())
     if 'type' in response and response['type'] in ['stop', 'abort']:
-        print('Killing gustav')
-        GIO.kill()
+        print('Gustav script is finishing')
+        GIO.finish()
     # response = GIO.style
     print(f'Sending: {json.dumps(response, indent=2)}')
     return jsonify(response)
@@ -195,8 +234,29 @@ if __name__ == '__main__':
                         help="Run locally at 0.0.0.0 (default: false)")
     parser.add_argument('--debug', '-d', action='store_true', default=True,
                         help="Debug mode (default: true)")
+    parser.add_argument('--transcript', '-t', action='store_true', default=False,
+                        help="Also write requests and responses to json files (default: false)")
+    parser.add_argument('--inprocess', '-i', action='store_true', default=False,
+                        help="Run experiments on threads in this process, many subjects at once (default: false)")
+    parser.add_argument('--max_sessions', '-m', default=50, type=int, metavar='',
+                        help="Max subjects at once, with --inprocess (default: 50)")
+    parser.add_argument('--pool', '-w', default=0, type=int, metavar='',
+                        help="Keep this many pre-started worker processes per experiment (default: 0, start one per subject)")
     args = parser.parse_args()
     print(args.port, type(args.port))
-    GIO = GustavIO(getpid(), port=args.port, local=args.local)
+    pool_size = 0 if args.inprocess else args.pool
+    GIO = GustavIO(getpid(), port=args.port, local=args.local, transcript=args.transcript, pool_size=pool_size)
+    # In debug mode, only the reloader's child process serves requests
+    if pool_size > 0 and (not args.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        GIO.start_pools()
+        atexit.register(GIO.close_pools)
     print(GIO)
+    AUDIO = AudioStore()
+    if args.inprocess:
+        SM = SessionManager(port=args.port, max_sessions=args.max_sessions, transcript=args.transcript)
+        if args.transcript:
+            os.environ[channel.transcript_env] = '1'
+        print(SM)
+    else:
+        SM = None
     app.run(host='0.0.0.0', debug=args.debug, port=args.port)
@@ -0,0 +1,82 @@
+import base64
+import hashlib
+import secrets
+import threading
+
+
+mimetypes = {'wav': 'audio/wav', 'flac': 'audio/flac'}
+
+
+class AudioStore(object):
+    """Trial audio, kept in memory and served at /audio/<id>/<name>
+
+    Forms send each interval's audio (encoded, as 'data') in the trial's
+    items, or all of it as one buffer in the trial's 'bundle'. extract takes
+    it out of the reply, keeps it here, and points the item's (or bundle's)
+    'file' at the audio route instead, so nothing is written to disk.
+    Each subject only has the audio of their current trial; it is replaced
+    by the next trial, and dropped when the experiment stops.
+
+    Names start with a token made for each session of a subject, so a new
+    session (eg., after a reload, with the same client id) never asks for
+    the url of audio that the browser has cached from an earlier one.
+    """
+    def __init__(self):
+        self.buffers = {}
+        self.tokens = {}
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return f"Gustav audio\n  Subjects: {len(self.buffers)} Bytes: {sum(len(d) for b in self.buffers.values() for d, m, e in b.values())}"
+
+    def extract(self, subject_id, response):
+        """
+        Returns response with its audio moved here, for subject_id.
+        """
+        if response.get('type') in ['stop', 'abort']:
+            self.drop(subject_id)
+            return response
+        items = response.get('items') or []
+        bundle = response.get('bundle')
+        if response.get('type') != 'trial' or not (any('data' in item for item in items) or
+                                                    (bundle is not None and 'data' in bundle)):
+            return response
+        buffers = {}
+        with self.lock:
+            token = self.tokens.setdefault(subject_id, secrets.token_hex(4))
+        prefix = f"{token}_{response.get('block')}_{response.get('trial')}"
+        new_items = []
+        for item in items:
+            if 'data' in item:
+                item = dict(item)
+                item['file'] = self._keep(buffers, subject_id, f"{prefix}_{item['id']}", item)
+            new_items.append(item)
+        response = dict(response, items=new_items)
+        if bundle is not None and 'data' in bundle:
+            bundle = dict(bundle)
+            bundle['file'] = self._keep(buffers, subject_id, prefix, bundle)
+            response['bundle'] = bundle
+        with self.lock:
+            self.buffers[subject_id] = buffers
+        return response
+
+    def _keep(self, buffers, subject_id, name, entry):
+        # Moves entry's data to buffers, and returns its url
+        fmt = entry.pop('format', 'wav')
+        name = f'{name}.{fmt}'
+        data = base64.b64decode(entry.pop('data'))
+        buffers[name] = (data, mimetypes.get(fmt, f'audio/{fmt}'), hashlib.sha1(data).hexdigest())
+        return f'audio/{subject_id}/{name}'
+
+    def get(self, subject_id, name):
+        """
+        Returns (data, mimetype, etag), or (None, None, None) if there is no such audio.
+        The etag is a hash of the data.
+        """
+        with self.lock:
+            return self.buffers.get(subject_id, {}).get(name, (None, None, None))
+
+    def drop(self, subject_id):
+        with self.lock:
+            self.buffers.pop(subject_id, None)
+            self.tokens.pop(subject_id, None)
@@ -0,0 +1,79 @@
+import os
+import sys
+import pkgutil
+import importlib
+import threading
+import collections
+
+from gustav.utils import exp as gustav_exp
+from gustav.user_scripts import html as html_scripts
+
+
+# What the server needs to know about an experiment script, read from its setup
+ExperimentInfo = collections.namedtuple('ExperimentInfo',
+                                        ['name', 'title', 'note', 'url', 'form', 'path', 'mtime', 'error'])
+
+
+class ExperimentCatalog(object):
+    """The experiments in gustav.user_scripts.html, read once and kept
+
+    Each script is imported and its setup run when the catalog is first
+    read, and again only when the file changes (its mtime), so landing page
+    requests only stat the files.
+    """
+    def __init__(self, package=html_scripts):
+        self.package = package
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.refresh()
+
+    def __repr__(self):
+        return f"Gustav experiments\n  " + "\n  ".join(f"{e.name}: {e.title}" for e in self.entries.values())
+
+    def refresh(self):
+        """
+        Re-read scripts that are new or have changed, and forget ones that are gone.
+        """
+        with self.lock:
+            entries = collections.OrderedDict()
+            for module in sorted(pkgutil.iter_modules(self.package.__path__), key=lambda m: m.name):
+                if module.ispkg:
+                    continue
+                path = os.path.join(module.module_finder.path, f'{module.name}.py')
+                try:
+                    mtime = os.stat(path).st_mtime
+                except OSError:
+                    continue
+                entry = self.entries.get(module.name)
+                if entry is None or entry.mtime != mtime:
+                    entry = self.read(module.name, path, mtime, reload=entry is not None)
+                entries[module.name] = entry
+            self.entries = entries
+            return list(self.entries.values())
+
+    def read(self, name, path, mtime, reload=False):
+        """
+        Import a script and run its setup on a new exp, to get its info.
+        """
+        submodule = f'{self.package.__name__}.{name}'
+        print(f'Reading experiment: {submodule}')
+        title = name.replace('gustav_exp__', '').replace('_', '\n')
+        try:
+            if reload and submodule in sys.modules:
+                exp_script = importlib.reload(sys.modules[submodule])
+            else:
+                exp_script = importlib.import_module(submodule)
+            if not hasattr(exp_script, 'setup'):
+                return ExperimentInfo(name, title, 'Experiment has no setup function', '', '', path, mtime, True)
+            script_exp = gustav_exp()
+            exp_script.setup(script_exp)
+            form = getattr(exp_script, 'theForm', None)
+            form = form.__name__.split('.')[-1] if form is not None else ''
+            return ExperimentInfo(name, getattr(script_exp, 'title', title), getattr(script_exp, 'note', ''),
+                                  getattr(script_exp, 'url', ''), form, path, mtime, False)
+        except Exception as e:
+            return ExperimentInfo(name, title, f'Failed to load experiment: {e}', '', '', path, mtime, True)
+
+    def get(self, name):
+        self.refresh()
+        return self.entries.get(name)
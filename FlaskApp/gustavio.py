@@ -2,21 +2,24 @@ import os
 import json
 import time
 import shutil
+import threading
 import subprocess
 from datetime import datetime
 
 import psutil
-import pkgutil
 
 from tools import read_json
 
-from gustav.utils import exp as gustav_exp
-from gustav.user_scripts import html as html_scripts
+from gustav.forms.html import channel
+
+from pool import WorkerPool
+from catalog import ExperimentCatalog
+from registry import SessionRegistry
 
 
 class GustavIO(object):
     """Gustav IO"""
-    def __init__(self, server_pid, subject_id="1", port=5050, experiment='', local=False):
+    def __init__(self, server_pid, subject_id="1", port=5050, experiment='', local=False, transcript=False, pool_size=0):
         """
         Initialize gustav input/output.
         """
@@ -38,9 +41,18 @@ class GustavIO(object):
         # script_dir = os.path.join(file_dir, '..', 'gustav', 'user_scripts', 'html')
         # self.script_dir = os.path.abspath(script_dir)
         self.process = None
+        # Requests and responses go over a socket (see gustav/forms/html/channel.py).
+        # If transcript is True, requests are also written to json files in the subject dir
+        self.listener = None
+        self.channel = None
+        self.transcript = transcript
+        # If pool_size > 0, each script gets a pool of that many pre-started workers
+        self.pool_size = pool_size
+        self.pools = {}
         self.dir = None
         self.str_time = None
         self.running_file = os.path.join(file_dir, 'running.json')
+        self.registry = SessionRegistry(self.running_file, self.port, self.server_pid)
         # if self.port == self.base_port and os.path.exists(self.running_file):
         #     print(f'Removing {self.running_file}')
         #     os.remove(self.running_file)
@@ -50,12 +62,39 @@ class GustavIO(object):
         else:
             self.url = 'http://74.109.252.140'
         self.experiments = []
+        self.catalog = ExperimentCatalog()
 
     def setup_script(self, script):
         self.script = script
         file_dir = os.path.dirname(os.path.abspath(__file__))
         script_dir = os.path.join(file_dir, '..', 'gustav', 'user_scripts', 'html')
         self.script_dir = os.path.abspath(script_dir)
+        if self.pool_size > 0:
+            self.get_pool(script)
+
+    def get_pool(self, script):
+        """
+        Get the worker pool for a script, starting it if needed.
+        """
+        if script not in self.pools:
+            log_file = os.path.join(self.root, self.out_dir, str(self.port), 'workers.txt')
+            os.makedirs(os.path.dirname(log_file), exist_ok=True)
+            self.pools[script] = WorkerPool(os.path.join(self.script_dir, script), size=self.pool_size,
+                                            port=self.port, transcript=self.transcript, log_file=log_file)
+        return self.pools[script]
+
+    def start_pools(self):
+        """
+        Start worker pools for all experiments, so the first subjects do not wait either.
+        """
+        for entry in self.catalog.refresh():
+            if not entry.error:
+                self.setup_script(f'{entry.name}.py')
+
+    def close_pools(self):
+        for pool in self.pools.values():
+            pool.close()
+        self.pools = {}
 
     def __repr__(self):
         if self.process is None:
@@ -89,11 +128,47 @@ class GustavIO(object):
         self.ses = self.sessions[self.id]
         print(self)
 
-    def run(self, sleep=3):
-        cmd = ['python', '-u', self.script, '-s', f'{self.id}:{self.port}']
+    def run(self, timeout=20):
+        """
+        Start the gustav script, and wait (up to timeout s) for it to connect.
+        """
+        self.close_channel()
         # redirect output to a file in subject dir
         self.process_out = os.path.join(self.dir, 'out.txt')
-        self.process = subprocess.Popen(cmd, cwd=self.script_dir, stdout=open(self.process_out, 'w'))
+        if self.pool_size > 0:
+            self.run_worker(timeout=timeout)
+            return
+        self.socket_path = channel.socket_path(self.port)
+        self.listener = channel.listen(self.socket_path)
+        cmd = ['python', '-u', self.script, '-s', f'{self.id}:{self.port}']
+        env = dict(os.environ, **{channel.socket_env: self.socket_path,
+                                  channel.transcript_env: '1' if self.transcript else ''})
+        self.process = subprocess.Popen(cmd, cwd=self.script_dir, stdout=open(self.process_out, 'w'), env=env)
+        self.add_running()
+        # The script connects once it is set up and waiting for the first request
+        self.channel = channel.accept(self.listener, timeout=timeout)
+        if self.channel is None:
+            print(f'Gustav script did not connect within {timeout} s')
+
+    def run_worker(self, timeout=20):
+        """
+        Hand the session to a ready worker, and wait (up to timeout s) for its form to connect.
+        """
+        self.channel, self.process = self.get_pool(self.script).acquire(timeout=timeout)
+        if self.channel is None:
+            return
+        self.add_running()
+        self.channel.send({'type': 'session', 'id': self.id, 'port': self.port,
+                           'out': os.path.abspath(self.process_out)})
+        try:
+            msg = self.channel.recv(timeout=timeout)
+        except EOFError:
+            msg = None
+        if msg is None or msg.get('type') != 'connected':
+            print(f'Gustav worker {self.process.pid} did not start the session: {msg}')
+            self.close_channel()
+
+    def add_running(self):
         self.process_start_time = datetime.now()
         self.str_time = self.process_start_time.strftime("%m/%d/%Y, %H:%M:%S")
         print(f'Running script: {self.script} | PID: {self.process.pid}')
@@ -103,35 +178,27 @@ class GustavIO(object):
                    'time': self.str_time,
                    'sid': self.id}
         self.update_running(append=new_run)
-        time.sleep(sleep)
+
+    def close_channel(self):
+        if self.channel is not None:
+            self.channel.close()
+            self.channel = None
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
 
     def update_running(self, append=None, remove=None):
-        pids = self.get_processes(verbose=False)
-        if not os.path.exists(self.running_file):
-            self.running = []
-            with open(self.running_file, 'w') as f:
-                json.dump({'ports': {self.port: self.server_pid}, 'subjects': []}, f)
-        else:
-            with open(self.running_file, 'r') as f:
-                self.running = json.load(f)
-            running = {'ports': {}, 'subjects': []}
-
-            for p in self.running['ports']:
-                if int(self.running['ports'][p]) in pids:
-                    running['ports'][int(p)] = int(self.running['ports'][p])
-
-            for s in self.running['subjects']:
-                if int(s['pid']) in pids:
-                    running['subjects'].append(s)
-            self.running = running
-
-            self.running['ports'][self.port] = self.server_pid
-            if append is not None:
-                self.running['subjects'].append(append)
-            if remove is not None:
-                self.running['subjects'] = [r for r in self.running['subjects'] if r['pid'] != remove['pid']]
-            with open(self.running_file, 'w') as f:
-                json.dump(self.running, f)
+        """
+        Update the registry of sessions (append: a record for self.process, remove: {'pid': pid}),
+        and self.running, with all servers and sessions on this host.
+        """
+        if append is not None:
+            self.registry.add(self.process, append)
+        if remove is not None:
+            self.registry.remove(remove['pid'])
+        self.running = self.registry.snapshot()
 
     def is_running(self):
         if self.process is None:
@@ -150,6 +217,7 @@ class GustavIO(object):
         if pid is None:
             pid = self.process.pid
             self.process.kill()
+            self.close_channel()
         print(f'Killing gustav script pid: {pid}')
         out = subprocess.run(f'kill {pid}', shell=True, capture_output=True, text=True)
         self.update_running(remove={'pid': pid})
@@ -160,6 +228,25 @@ class GustavIO(object):
             print(f'Process {pid} killed')
             return True
 
+    def finish(self, timeout=30):
+        """
+        Let the gustav script exit by itself, once it has sent its last reply (so its form
+        can hand the session to the archiver), and kill it only if it is still running after timeout s.
+        """
+        process = self.process
+        self.close_channel()
+        if process is None:
+            return
+
+        def wait():
+            try:
+                process.wait(timeout)
+                self.update_running(remove={'pid': process.pid})
+            except subprocess.TimeoutExpired:
+                print(f'Gustav script {process.pid} still running after {timeout} s')
+                self.kill(process.pid)
+        threading.Thread(target=wait, daemon=True).start()
+
     def send_request(self, data):
         """
         Send request to gustav.
@@ -176,36 +263,36 @@ class GustavIO(object):
         if not hasattr(self, 'id'):
             print('WARNING: No subject id available, skipping')
         else:
+            # The file gustav would reply to; now only used to name transcript files
             self.expected_response = os.path.join(self.dir, f"g{self.num_trial}_{request_type}.json")
             data['response_file'] = self.expected_response
-            self.dump(data=data, prefix='c')
+            if self.transcript:
+                self.dump(data=data, prefix='c')
+            if self.channel is None:
+                print('WARNING: Gustav script is not connected, skipping')
+            else:
+                self.channel.send(data)
 
     def get_response(self, sleep=0.1, max_timeout=20, max_load_attempts=3):
         """
         Get response from gustav.
+
+        Waits up to max_timeout s for the reply to the last request. sleep
+        and max_load_attempts are unused, and kept for compatibility.
         """
         print(f'Waiting for response: {self.expected_response}')
-        timeout = 0
-        load_attempt = 0
-        while not os.path.exists(self.expected_response) and timeout <= max_timeout:
-            time.sleep(sleep)
-            timeout += sleep
-            # print(f"waiting {timeout} < {max_timeout}")
-        if timeout <= max_timeout:
-            print(f"Received reponse")
-            for i in range(max_load_attempts):
-                try:
-                    self.response = self.load(self.expected_response)
-                except:
-                    load_attempt += 1
-                    print(f'Could not load file, attempt: {load_attempt}/{max_load_attempts}')
-                    time.sleep(sleep)
-            if load_attempt >= max_load_attempts:
-                print(f'Reached max load attempts: {max_load_attempts}, ignoring out')
-                self.response = {}
-        else:
-            print(f'Max timeout ({max_timeout} s) reached, no response!')
-            self.response = {}
+        self.response = {}
+        if self.channel is not None:
+            try:
+                response = self.channel.recv(timeout=max_timeout)
+                if response is None:
+                    print(f'Max timeout ({max_timeout} s) reached, no response!')
+                else:
+                    print(f"Received reponse")
+                    self.response = response
+            except EOFError:
+                print('Gustav script closed the connection')
+                self.close_channel()
         return self.response
 
     def initialize(self, data):
@@ -230,59 +317,37 @@ class GustavIO(object):
     def read_experiments(self, available_ports=[], url=None, name=None):
         """
         Read all available experiment from gustav.user_scripts.html
+        (from the catalog, which only re-reads scripts that have changed)
         """
         experiments = []
-        for html_exp in pkgutil.iter_modules(html_scripts.__path__):
-            submodule = f'gustav.user_scripts.html.{html_exp.name}'
-            exp_title = html_exp.name.replace('gustav_exp__', '').replace('_', '\n')
-            exp = {'title': exp_title,
-                   'description': '',
-                   'url': '', 'ready': False, 'name': html_exp.name}
-            try:
-                exp_script = __import__(submodule, fromlist=[None])
-                if hasattr(exp_script, 'setup'):
-                    exp_script.setup(gustav_exp)
-                    exp['title'] = gustav_exp.title
-                    exp['description'] = gustav_exp.note
-                    # template = exp_script.theForm.Interface.__module__.split('.')[-1]
-                    if len(available_ports) > 0:
-                        port = min(available_ports)
-                        print(f'{len(available_ports)} ports available, selected {port}')
-                        available_ports.remove(port)
-                        exp['url'] = f'{self.url}:{port}/{gustav_exp.url}-{html_exp.name}'
-                        print('---> url: ', exp['url'])
-                        exp['ready'] = True
-                    else:
-                        print('No ports available!')
+        for entry in self.catalog.refresh():
+            exp = {'title': entry.title,
+                   'description': entry.note,
+                   'url': '', 'ready': False, 'name': entry.name}
+            if not entry.error:
+                if len(available_ports) > 0:
+                    port = min(available_ports)
+                    print(f'{len(available_ports)} ports available, selected {port}')
+                    available_ports.remove(port)
+                    exp['url'] = f'{self.url}:{port}/{entry.url}-{entry.name}'
+                    print('---> url: ', exp['url'])
+                    exp['ready'] = True
                 else:
-                    exp['description'] = 'Experiment has no setup function'
-            except Exception as e:
-                exp['description'] = f'Failed to load experiment: {e}'
-                exp['url'] = ''
-                exp['ready'] = False
+                    print('No ports available!')
             if url is None and name is None:
                 experiments.append(exp)
-            else:
-                if url == gustav_exp.url and name == html_exp.name:
-                    experiments.append(exp)
+            elif not entry.error and url == entry.url and name == entry.name:
+                experiments.append(exp)
         return experiments
 
     def get_experiments(self):
-        # Get running processes
-        procs = self.get_processes()
-        # Kill if no activity
-
-        # Get running servers
+        # Get running servers and sessions (only live ones are listed)
         self.update_running()
         exp_ports = [int(p) for p in self.running['ports'] if int(p) != self.base_port]
         print(f'Exp ports: {exp_ports}')
-        port_pids = self.running['ports'].values()
-        print(f'Port pids: {port_pids}')
-        print(f'procs: {procs}')
-        running_ports = [pt for pt, pd in self.running['ports'].items() if pd in port_pids]
-        print(f'Running ports: {running_ports} Total processes: {len(procs)}')
-        # Check ifthe gustav process are running
-        used_ports = [s['port'] for s in self.running['subjects'] if int(s['pid']) in procs]
+        running_ports = list(self.running['ports'])
+        print(f'Running ports: {running_ports}')
+        used_ports = [s['port'] for s in self.running['subjects']]
         print(f'Used ports: {used_ports}')
         available_ports = [p for p in exp_ports if p not in used_ports and p in running_ports]
         print(f'Avail ports: {available_ports}')
@@ -293,11 +358,9 @@ class GustavIO(object):
 
     def get_setup(self):
         self.update_running()
-        procs = self.get_processes()
         exp_ports = [p for p in self.running['ports'] if int(p) != self.base_port]
-        port_pids = self.running['ports'].values()
-        running_ports = [pt for pt, pd in self.running['ports'].items() if pd in port_pids]
-        used_ports = [s['port'] for s in self.running['subjects'] if int(s['pid']) in procs]
+        running_ports = list(self.running['ports'])
+        used_ports = [s['port'] for s in self.running['subjects']]
         available_ports = [p for p in exp_ports if p not in used_ports and p in running_ports]
 
         all_ports = sorted([int(p) for p in self.running['ports']])
@@ -315,7 +378,7 @@ class GustavIO(object):
             port_info.append({'port': f'{port} : {status}', 'id': f'PID: {pid}'})
         exps = [{'title': 'Running ports', 'description': f'{len(port_info)} port(s)', 'subjects': port_info}]
 
-        for exp in self.get_experiments()['experiments']:
+        for exp in self.read_experiments():
             sbj = []
             for r in self.running['subjects']:
                 sbj.append({'id': r['sid'], 'port': r['port'], 'time': r['time']})
@@ -347,6 +410,9 @@ class GustavIO(object):
         return data
 
     def get_processes(self, name='python', status=['running', 'sleeping'], verbose=True):
+        """
+        Scan all processes on the host. Slow; only used to find strays to clean up (see update_running).
+        """
         procs = []
         for proc in psutil.process_iter():
             try:
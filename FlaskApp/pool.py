@@ -0,0 +1,131 @@
+import os
+import sys
+import queue
+import threading
+import subprocess
+
+from gustav.forms.html import channel
+
+
+class WorkerPool(object):
+    """A pool of pre-started python processes, ready to run one gustav script
+
+    Each worker imports the script (and so numpy, psylab, etc) as soon as it
+    starts, connects to the pool's socket, and says it is ready. acquire
+    hands a ready worker to a new subject, and starts a replacement, so the
+    next subject also gets a warm one. Each worker runs one session and
+    exits, so no state is carried from one subject to the next.
+    """
+    def __init__(self, script, size=2, port=5050, transcript=False, log_file=None):
+        self.script = os.path.abspath(script)
+        self.script_dir, self.script_file = os.path.split(self.script)
+        self.size = size
+        self.port = port
+        self.transcript = transcript
+        self.log_file = log_file
+        name = os.path.splitext(self.script_file)[0].replace('gustav_exp__', '')
+        self.socket_path = channel.socket_path(f'{port}_{name}')
+        self.listener = channel.listen(self.socket_path, backlog=size)
+        self.processes = {}
+        self.idle = queue.Queue()
+        self.closed = False
+        self.lock = threading.Lock()
+        self.accept_thread = threading.Thread(target=self._accept, name=f'gustav_pool_{name}', daemon=True)
+        self.accept_thread.start()
+        for i in range(size):
+            self._spawn()
+
+    def __repr__(self):
+        return f"Gustav worker pool\n  Script: {self.script_file} Port: {self.port}\n  Workers: {len(self.processes)} Ready: {self.idle.qsize()}"
+
+    def _spawn(self):
+        env = dict(os.environ, **{channel.socket_env: self.socket_path,
+                                  channel.transcript_env: '1' if self.transcript else ''})
+        out = open(self.log_file, 'a') if self.log_file is not None else subprocess.DEVNULL
+        process = subprocess.Popen([sys.executable, '-u', os.path.abspath(__file__), self.script],
+                                   cwd=self.script_dir, stdout=out, stderr=subprocess.STDOUT, env=env)
+        if out is not subprocess.DEVNULL:
+            out.close()
+        with self.lock:
+            # Forget workers that exited before they were used
+            self.processes = {pid: p for pid, p in self.processes.items() if p.poll() is None}
+            self.processes[process.pid] = process
+        print(f'Started worker {process.pid} for {self.script_file}')
+        return process
+
+    def _accept(self):
+        # Workers connect once they have imported the script
+        while not self.closed:
+            try:
+                conn = channel.accept(self.listener, timeout=1)
+            except OSError:
+                break
+            if conn is None:
+                continue
+            try:
+                msg = conn.recv(timeout=10)
+            except EOFError:
+                msg = None
+            if msg is None or msg.get('type') != 'ready':
+                conn.close()
+                continue
+            self.idle.put((conn, msg['pid']))
+            print(f"Worker {msg['pid']} ready for {self.script_file}")
+
+    def acquire(self, timeout=20):
+        """
+        Returns (channel, process) of a ready worker, or (None, None) if none is ready within timeout s.
+        """
+        while True:
+            try:
+                conn, pid = self.idle.get(timeout=timeout)
+            except queue.Empty:
+                print(f'No worker ready for {self.script_file} within {timeout} s')
+                return None, None
+            with self.lock:
+                process = self.processes.pop(pid, None)
+            # Keep the pool full
+            if not self.closed:
+                self._spawn()
+            if process is not None and process.poll() is None:
+                return conn, process
+            conn.close()
+
+    def close(self):
+        self.closed = True
+        with self.lock:
+            processes = list(self.processes.values())
+            self.processes = {}
+        for process in processes:
+            process.kill()
+        self.listener.close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+def worker(script):
+    """
+    Import script, wait to be given a session, then run it.
+    """
+    import gustav
+    from gustav.gustav import add_path
+    path, name = os.path.split(os.path.abspath(script))
+    add_path(path)
+    __import__(os.path.splitext(name)[0])
+    conn = channel.connect()
+    conn.send({'type': 'ready', 'pid': os.getpid()})
+    try:
+        msg = conn.recv()
+    except EOFError:
+        return
+    if msg.get('type') != 'session':
+        return
+    if msg.get('out'):
+        sys.stdout = open(msg['out'], 'w', buffering=1)
+    # The form gets this connection, and tells the server when it is ready
+    channel.bind(conn, notify=True)
+    gustav.run(experimentFile=script, subjectID=f"{msg['id']}:{msg['port']}")
+
+
+if __name__ == '__main__':
+    worker(sys.argv[1])
@@ -0,0 +1,142 @@
+import os
+import json
+import fcntl
+import signal
+import threading
+
+
+# Counts SIGCHLD signals; each registry polls its children when this changes
+_child_exits = 0
+
+
+def _on_sigchld(signum, frame):
+    # Keep the handler minimal; the exit is handled on the next read
+    global _child_exits
+    _child_exits += 1
+
+
+def pid_alive(pid):
+    """Whether a process exists, without scanning the process table"""
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SessionRegistry(object):
+    """The gustav processes run by the servers on this host
+
+    Each server keeps its own children (subject sessions) in memory, keyed
+    by pid, along with the Popen object, and notices when they exit with
+    Popen.poll (prompted by SIGCHLD). The registry file (running.json) is
+    shared by all of the servers, which each write their own port and
+    sessions to it, only when these change. It is written atomically, under
+    a lock, so servers never see a partly written file.
+
+    Entries from other servers are kept while their server is alive, which
+    is checked with os.kill(pid, 0), not by scanning every process on the host.
+    """
+    def __init__(self, filename, port, server_pid):
+        self.filename = filename
+        self.port = int(port)
+        self.server_pid = server_pid
+        self.children = {}
+        self.lock = threading.RLock()
+        self.child_exits = None
+        self.file_mtime = None
+        self.shared = {'ports': {}, 'subjects': []}
+        try:
+            signal.signal(signal.SIGCHLD, _on_sigchld)
+        except ValueError:
+            # Not the main thread, so no SIGCHLD; poll children on every read instead
+            self.child_exits = -1
+        self.persist()
+
+    def __repr__(self):
+        return f"Gustav sessions on port {self.port}: {len(self.children)}"
+
+    def add(self, process, info):
+        """
+        Register a child process; info is the record stored (pid, port, script, time, sid).
+        """
+        with self.lock:
+            self.children[process.pid] = (process, dict(info, pid=process.pid, port=self.port))
+            self.persist()
+
+    def remove(self, pid):
+        with self.lock:
+            if self.children.pop(int(pid), None) is not None:
+                self.persist()
+
+    def reap(self):
+        """
+        Forget children that have exited. Returns True if any had.
+        """
+        with self.lock:
+            exited = [pid for pid, (process, info) in self.children.items() if process.poll() is not None]
+            for pid in exited:
+                del self.children[pid]
+            if exited:
+                self.persist()
+            return len(exited) > 0
+
+    def sessions(self):
+        with self.lock:
+            if self.child_exits != _child_exits or self.child_exits == -1:
+                if self.child_exits != -1:
+                    self.child_exits = _child_exits
+                self.reap()
+            return [info for process, info in self.children.values()]
+
+    def _read(self):
+        # Re-read the shared file only if another server has changed it
+        try:
+            mtime = os.stat(self.filename).st_mtime_ns
+        except OSError:
+            return {'ports': {}, 'subjects': []}
+        if mtime != self.file_mtime:
+            try:
+                with open(self.filename, 'r') as f:
+                    data = json.load(f)
+                self.shared = {'ports': {int(p): int(pid) for p, pid in data.get('ports', {}).items()},
+                               'subjects': data.get('subjects', [])}
+            except ValueError:
+                self.shared = {'ports': {}, 'subjects': []}
+            self.file_mtime = mtime
+        return self.shared
+
+    def persist(self):
+        """
+        Write this server's port and sessions to the shared file, keeping those of other live servers.
+        """
+        with self.lock, open(self.filename + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.file_mtime = None
+            shared = self._read()
+            ports = {p: pid for p, pid in shared['ports'].items() if p != self.port and pid_alive(pid)}
+            ports[self.port] = self.server_pid
+            subjects = [s for s in shared['subjects'] if int(s['port']) != self.port and int(s['port']) in ports]
+            subjects += [info for process, info in self.children.values()]
+            data = {'ports': ports, 'subjects': subjects}
+            tmp = f'{self.filename}.{os.getpid()}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.filename)
+            self.shared = data
+            self.file_mtime = os.stat(self.filename).st_mtime_ns
+
+    def snapshot(self):
+        """
+        All servers and sessions on this host: {'ports': {port: pid}, 'subjects': [...]}
+        """
+        with self.lock:
+            own = self.sessions()
+            shared = self._read()
+            ports = {p: pid for p, pid in shared['ports'].items() if p == self.port or pid_alive(pid)}
+            ports[self.port] = self.server_pid
+            subjects = [s for s in shared['subjects'] if int(s['port']) != self.port and int(s['port']) in ports
+                        and pid_alive(s['pid'])]
+            return {'ports': ports, 'subjects': subjects + own}
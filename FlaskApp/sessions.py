@@ -0,0 +1,177 @@
+import os
+import json
+import threading
+import traceback
+from datetime import datetime
+
+import gustav
+from gustav.forms.html import channel
+
+
+class Session(object):
+    """A gustav experiment running on a thread in the server process"""
+    def __init__(self, subject_id, script, port, root='static', out_dir='exp', transcript=False):
+        self.id = subject_id
+        self.script = script
+        self.port = port
+        self.transcript = transcript
+        self.dir = os.path.join(root, out_dir, str(port), str(subject_id))
+        self.num_trial = 0
+        self.error = None
+        # The experiment gets its end of the pipe when its form connects
+        self.channel, self.exp_channel = channel.pipe()
+        # One request at a time, so each reply goes back to its request
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name=f'gustav_{subject_id}', daemon=True)
+        self.start_time = None
+        self.str_time = None
+
+    def __repr__(self):
+        return f"Gustav session\n  ID: {self.id} Port: {self.port}\n  Script: {self.script}\n  Running: {self.is_running()}"
+
+    def _run(self):
+        channel.bind(self.exp_channel)
+        try:
+            # Each session gets its own copy of the experiment module
+            gustav.run(experimentFile=self.script, subjectID=f'{self.id}:{self.port}', privateModule=True)
+        except Exception as e:
+            self.error = e
+            print(f'Session {self.id} failed:')
+            traceback.print_exc()
+        finally:
+            # Wake anyone waiting on this session
+            self.exp_channel.close()
+            self.exp_channel.connected.set()
+
+    def start(self, timeout=20):
+        """
+        Start the experiment, and wait (up to timeout s) for it to be ready for requests.
+        """
+        os.makedirs(self.dir, exist_ok=True)
+        self.start_time = datetime.now()
+        self.str_time = self.start_time.strftime("%m/%d/%Y, %H:%M:%S")
+        self.thread.start()
+        if not self.exp_channel.connected.wait(timeout):
+            print(f'Session {self.id} was not ready within {timeout} s')
+            return False
+        return self.is_running()
+
+    def is_running(self):
+        return self.thread.is_alive()
+
+    def elapsed(self):
+        if self.start_time is None:
+            return 0
+        return (datetime.now() - self.start_time).seconds
+
+    def request(self, data, max_timeout=20):
+        """
+        Send a client request to the experiment, and return its reply ({} if none).
+        """
+        if data['type'] == 'answer':
+            request_type = 'trial'
+            self.num_trial += 1
+        else:
+            request_type = data['type']
+        # Forms name their transcript files after this
+        data['response_file'] = os.path.join(self.dir, f"g{self.num_trial}_{request_type}.json")
+        if self.transcript:
+            with open(os.path.join(self.dir, f"c{self.num_trial}_{data['type']}.json"), 'w') as f:
+                json.dump(data, f, indent=2)
+        with self.lock:
+            try:
+                self.channel.send(data)
+                response = self.channel.recv(timeout=max_timeout)
+            except EOFError:
+                print(f'Session {self.id} has ended')
+                response = None
+        if response is None:
+            print(f'No response from session {self.id}')
+            return {}
+        return response
+
+    def stop(self):
+        """
+        End the experiment. Its form sees the connection close, and exits.
+        """
+        self.channel.close()
+
+
+class SessionManager(object):
+    """Runs many gustav experiments at once, each on a thread in this process
+
+    Each subject (keyed by the id the client sends) gets its own Session,
+    with its own exp, so one server can host many subjects at once, without
+    starting a python process for each one.
+    """
+    def __init__(self, port=5050, max_sessions=50, max_age=120 * 60, transcript=False):
+        self.port = port
+        self.max_sessions = max_sessions
+        self.max_age = max_age
+        self.transcript = transcript
+        self.sessions = {}
+        self.lock = threading.Lock()
+        # Forms write style.json as they start, so start one at a time
+        self.start_lock = threading.Lock()
+
+    def __repr__(self):
+        return f"Gustav sessions\n  Port: {self.port}\n  Running: {len(self.sessions)} of {self.max_sessions}"
+
+    def start(self, subject_id, script, timeout=20):
+        """
+        Start a session for subject_id (ending any it already has).
+        Returns the session and the style for the client, or None, None if none could be started.
+        """
+        self.end(subject_id)
+        self.reap()
+        with self.lock:
+            if len(self.sessions) >= self.max_sessions:
+                print(f'Max sessions ({self.max_sessions}) reached, not starting {subject_id}')
+                return None, None
+            session = Session(subject_id, script, self.port, transcript=self.transcript)
+            self.sessions[subject_id] = session
+        with self.start_lock:
+            ready = session.start(timeout=timeout)
+            style = read_style() if ready else None
+        print(session)
+        if not ready:
+            self.end(subject_id)
+            return None, None
+        return session, style
+
+    def get(self, subject_id):
+        with self.lock:
+            return self.sessions.get(subject_id)
+
+    def end(self, subject_id):
+        with self.lock:
+            session = self.sessions.pop(subject_id, None)
+        if session is not None:
+            session.stop()
+        return session
+
+    def reap(self):
+        """
+        Forget sessions that have finished, and end ones older than max_age s.
+        """
+        with self.lock:
+            sessions = list(self.sessions.items())
+        for subject_id, session in sessions:
+            if not session.is_running():
+                with self.lock:
+                    self.sessions.pop(subject_id, None)
+            elif session.elapsed() > self.max_age:
+                print(f'Session {subject_id} has been running for {session.elapsed()} s, ending')
+                self.end(subject_id)
+
+    def status(self):
+        self.reap()
+        with self.lock:
+            sessions = list(self.sessions.values())
+        return [{'id': s.id, 'port': s.port, 'script': os.path.basename(s.script), 'time': s.str_time}
+                for s in sessions]
+
+
+def read_style(filename="static/style.json"):
+    with open(filename, "r") as f:
+        return json.load(f)
@@ -4,6 +4,8 @@ let userSelection = 0;
 let trialPause = false;
 let trialPauseDuration = 1000;
 let performanceFeedback = true;
+// All intervals of the trial in one buffer, if the server sends a bundle
+let trialBundle = null;
 var abortBtn = function (){
     $('.top-right').on("click",function() {
         var confirm = window.confirm("Are you sure you want to cancel the test?");
@@ -16,7 +18,7 @@ var abortBtn = function (){
 // Get styling information from the server
 var mainColors = function (){
     $("#welcome .contextArea p").html('Please wait, initializing the experiment...');
-    let serverResponse = $.post(apiUrl, {'type': 'style'});
+    let serverResponse = $.post(apiUrl, {'type': 'style', 'id': getID()});
     serverResponse.done(function( data ) {
         if (data.type != 'style') {
           $("#welcome").html(data.message);
@@ -206,6 +208,10 @@ var playBtn = function (elem){
         setTimeout(function (){
             getJsonApi({'type': 'answer', 'id': getID(), 'answer': userSelection});
         },testArea.data("next-delay"));
+    }else if (trialBundle !== null){
+        if (trialBundle.paused){
+            playBundle(testArea, ifAllListened);
+        }
     }else{
         el.addClass("playing");
 
@@ -246,6 +252,42 @@ var playBtn = function (elem){
         }, false);
     }
 }
+// Play every interval from the trial bundle; the ISIs are in the audio,
+// so buttons only follow the playback position (data-start, data-end)
+var playBundle = function (testArea, ifAllListened){
+    var buttons = testArea.find("div button");
+    var prompt = testArea.find("p.w-100.text-center");
+    var audio = trialBundle;
+    disableAllPlayButtons();
+    audio.ontimeupdate = function (){
+        var t = audio.currentTime;
+        buttons.each(function (){
+            var btn = $(this);
+            var start = btn.data("start");
+            var end = btn.data("end");
+            if (t >= start && t < end){
+                if (!btn.hasClass("playing")){
+                    btn.addClass("playing");
+                    prompt.html("Playing " + btn.data("eq"));
+                }
+                btn.parent().find("span").css("width",parseInt(((t - start) / (end - start)) * 100, 10)+"%");
+            }else if (t >= end && btn.hasClass("playing")){
+                btn.removeClass("playing").addClass("listened");
+                btn.parent().find("span").css("width","0%");
+                prompt.html(prompt.data("default"));
+            }
+        });
+    };
+    audio.onended = function (){
+        buttons.removeClass("playing").addClass("listened");
+        buttons.parent().find("span").css("width","0%");
+        prompt.html(prompt.data("default"));
+        ifAllListened();
+        activeAllPlayButtons();
+    };
+    audio.currentTime = 0;
+    audio.play();
+}
 var getJsonApi = function (formdata = {'type': 'trial', 'id': getID()}){
     // POST ---------------------------------------------------
     let serverResponse = $.post(apiUrl, formdata);
@@ -262,9 +304,16 @@ var getJsonApi = function (formdata = {'type': 'trial', 'id': getID()}){
                 items.push('<span class="bottom-right">' + data.lower_right_text + '</span>');
                 items.push('<span class="top-right"><img src="static/close.svg" /></span>');
                 // Add audio play buttons here
+                trialBundle = null;
+                if (data.bundle){
+                    // Fetch the whole trial now, while the subject reads the prompt
+                    trialBundle = new Audio(data.bundle.file);
+                    trialBundle.preload = "auto";
+                }
                 $.each( data.items, function( key, val ) {
                     var i = parseInt(key) +1;
-                    items.push('<div><button type="button" onclick="playBtn(this);" data-eq="' + i + '" data-id="' + val.id + '" data-sound="' + val.file + '">' + val.name + '</button><span></span></div>');
+                    var sound = data.bundle ? 'data-start="' + val.start + '" data-end="' + val.end + '"' : 'data-sound="' + val.file + '"';
+                    items.push('<div><button type="button" onclick="playBtn(this);" data-eq="' + i + '" data-id="' + val.id + '" ' + sound + '>' + val.name + '</button><span></span></div>');
                 });
                 correctAnswer = data.answer;
                 console.log("Correct answer:", correctAnswer);
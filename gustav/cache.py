@@ -0,0 +1,449 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2010-2020 Christopher Brown
+#
+# This file is part of gustav.
+#
+# gustav is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# gustav is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gustav.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Comments and/or additions are welcome. Send e-mail to: cbrown1@pitt.edu.
+#
+
+
+"""Caching of stimuli and stimulus components across trials
+
+    Many experiments compute the same things in pre_trial on every trial:
+    a tone at the current frequency, filter coefficients for the current
+    band, etc. This module lets a script compute them once and reuse them,
+    by decorating the function that makes them:
+
+        @gustav.cache.cached
+        def make_tone(exp):
+            sig = psylab.signal.tone(float(exp.var.current['frequency']), exp.user.fs, exp.user.interval)
+            return psylab.signal.ramps(sig, exp.user.fs)
+
+        def pre_trial(exp):
+            sig = make_tone(exp)
+
+    By default, results are keyed by the current levels of the experimental
+    variables and the dynamic value (adaptive method), so a result is only
+    reused when both are the same. If the function uses other things, such
+    as user params, give a key function that returns exactly those:
+
+        @gustav.cache.cached(key=('current',))
+        @gustav.cache.cached(key=lambda exp: (exp.var.current['frequency'], exp.user.fs))
+
+    The key part 'user' (all of exp.user) can be asked for, but scripts 
+    often keep per-trial state there (responses, shuffled ranges), which 
+    makes a key that never repeats.
+
+    Plain functions of their arguments, such as filter design, can be
+    memoized:
+
+        butter = gustav.cache.memoize(scipy.signal.butter)
+        b, a = butter(4, fc / (fs / 2.), btype='highpass')
+
+    Only deterministic functions should be cached; a noise buffer that must
+    be new on every trial should not be. Cached numpy arrays are returned
+    read-only, so modifying a cached stimulus in place raises an error
+    instead of silently changing it for later trials. Copy it first, or use
+    @cached(copy=True).
+
+    Results are held in a stim_cache, which evicts the least recently used
+    items to stay within a memory budget (default_cache, 256 MB, unless
+    another cache is given).
+"""
+
+import sys
+import copy
+import hashlib
+import functools
+import collections
+import collections.abc
+import threading
+import concurrent.futures
+import numpy as np
+
+
+class stim_cache():
+    """A least-recently-used cache bounded by the memory used by its items
+
+        The size of an item is the nbytes of any numpy arrays in it (or
+        sys.getsizeof for other objects). When adding an item takes the total
+        over max_bytes, the least recently used items are evicted. An item
+        larger than max_bytes is not cached.
+    """
+    def __init__(self, max_bytes=256*1024*1024):
+        self.max_bytes = max_bytes
+        self.items = collections.OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Items may be added by the prefetch thread
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return self.items[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, val):
+        size = get_nbytes(val)
+        with self.lock:
+            if key in self.items:
+                self.nbytes -= self.items.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self.items[key] = (val, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                k, (v, s) = self.items.popitem(last=False)
+                self.nbytes -= s
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        return "{} items, {:.1f} MB of {:.1f} MB; {} hits, {} misses, {} evictions".format(
+            len(self.items), self.nbytes / 1048576., self.max_bytes / 1048576.,
+            self.hits, self.misses, self.evictions)
+
+
+default_cache = stim_cache()
+
+
+def get_nbytes(obj):
+    """Returns the approximate memory used by obj, counting numpy arrays by nbytes
+    """
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    elif isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(get_nbytes(o) for o in obj)
+    elif isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(get_nbytes(o) for o in obj.values())
+    return sys.getsizeof(obj)
+
+
+def freeze(obj):
+    """Returns a hashable version of obj, for use in a cache key
+    """
+    if isinstance(obj, np.ndarray):
+        # A digest, so that keys do not hold a copy of the data
+        return ('ndarray', obj.shape, obj.dtype.str, hashlib.sha1(np.ascontiguousarray(obj)).digest())
+    elif isinstance(obj, (dict, collections.abc.Mapping)):
+        return tuple((k, freeze(v)) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        return tuple(freeze(o) for o in obj)
+    elif isinstance(obj, (set, frozenset)):
+        return frozenset(freeze(o) for o in obj)
+    try:
+        hash(obj)
+        return obj
+    except TypeError:
+        return repr(obj)
+
+
+def _get_user(exp):
+    return tuple((k, freeze(v)) for k, v in sorted(vars(exp.user).items())
+                 if k[:2] != "__" and not callable(v))
+
+
+def _get_dynamic(exp):
+    if exp.var.dynamic and 'value' in exp.var.dynamic:
+        return freeze(exp.var.dynamic['value'])
+    return None
+
+
+key_parts = {
+    'current': lambda exp: freeze(exp.var.current),
+    'dynamic': _get_dynamic,
+    'user': _get_user,
+    }
+
+
+def get_key(exp, parts=('current', 'dynamic')):
+    """Returns a cache key from the current state of the experiment
+
+        parts can include 'current' (the levels of the experimental
+        variables), 'dynamic' (the dynamic value), and 'user' (exp.user).
+    """
+    return tuple(key_parts[part](exp) for part in parts)
+
+
+def _readonly(val):
+    if isinstance(val, np.ndarray):
+        val.flags.writeable = False
+    elif isinstance(val, (list, tuple)):
+        for v in val:
+            _readonly(v)
+    elif isinstance(val, dict):
+        for v in val.values():
+            _readonly(v)
+    return val
+
+
+def _copy(val):
+    if isinstance(val, np.ndarray):
+        return val.copy()
+    elif isinstance(val, list):
+        return [_copy(v) for v in val]
+    elif isinstance(val, tuple):
+        return tuple(_copy(v) for v in val)
+    elif isinstance(val, dict):
+        return {k: _copy(v) for k, v in val.items()}
+    return val
+
+
+def cached(func=None, key=('current', 'dynamic'), cache=None, copy=False, prefetch=False):
+    """Decorator that caches the result of a stimulus function of exp
+
+        The function is called as func(exp, *args, **kwargs), and the result
+        is cached under the function, its other arguments, and a key from
+        exp. key is either a sequence of parts for get_key, or a function
+        that takes exp and returns a hashable key. If copy is True, cached
+        arrays are copied before they are returned, otherwise they are
+        read-only.
+
+        If prefetch is True, the function (which must take only exp, and be
+        defined in the experiment script) is also called on a worker thread 
+        while the subject responds, for each of the likely next trials (see 
+        prefetcher), so that the next pre_trial finds its stimulus already 
+        made.
+
+        The wrapped function has a cache attribute (the stim_cache used), and
+        an uncached attribute (the original function).
+    """
+    if func is None:
+        return functools.partial(cached, key=key, cache=cache, copy=copy, prefetch=prefetch)
+    if cache is None:
+        cache = default_cache
+    if callable(key):
+        get = key
+    else:
+        parts = tuple(key)
+        get = lambda exp: get_key(exp, parts)
+    name = "{}.{}".format(func.__module__, func.__qualname__)
+
+    def get_full_key(exp, *args, **kwargs):
+        return (name, get(exp), freeze(args), freeze(kwargs))
+
+    def fill(exp, k, *args, **kwargs):
+        val = _readonly(func(exp, *args, **kwargs))
+        cache.put(k, val)
+        return val
+
+    @functools.wraps(func)
+    def wrapper(exp, *args, **kwargs):
+        k = get_full_key(exp, *args, **kwargs)
+        val = cache.get(k, cache)
+        if val is cache and (getattr(exp, 'prefetcher', None) or default_prefetcher).take(k):
+            val = cache.get(k, cache)
+        if val is cache:
+            val = fill(exp, k, *args, **kwargs)
+        return _copy(val) if copy else val
+    wrapper.cache = cache
+    wrapper.uncached = func
+    wrapper.get_key = get_full_key
+    wrapper.fill = fill
+    wrapper.prefetch = prefetch
+    return wrapper
+
+
+def get_prefetch_funcs(module):
+    """Returns the functions in module decorated with @cached(prefetch=True)
+    """
+    return [f for f in vars(module).values()
+            if callable(f) and getattr(f, 'prefetch', False) is True and hasattr(f, 'fill')]
+
+
+class _dynamic_view(collections.abc.Mapping):
+    # exp.var.dynamic, with a different value
+    def __init__(self, dynamic, value):
+        self.dynamic = dynamic
+        self.value = value
+
+    def __getitem__(self, key):
+        if key == 'value':
+            return self.value
+        return self.dynamic[key]
+
+    def __iter__(self):
+        return iter(self.dynamic)
+
+    def __len__(self):
+        return len(self.dynamic)
+
+
+class _predicted_var(object):
+    def __init__(self, var, current, value, dynamic):
+        self._var = var
+        self.current = copy.deepcopy(current)
+        self.dynamic = dynamic if value is None else _dynamic_view(dynamic, value)
+
+    def __getattr__(self, name):
+        return getattr(self._var, name)
+
+
+def _snapshot(obj):
+    # A deep copy of obj. Attributes that cannot be copied (devices, locks)
+    # are shared; they are not stimulus state
+    try:
+        return copy.deepcopy(obj)
+    except Exception:
+        snap = copy.copy(obj)
+        for k, v in vars(obj).items():
+            try:
+                setattr(snap, k, copy.deepcopy(v))
+            except Exception:
+                pass
+        return snap
+
+
+def snapshot(exp):
+    """Returns copies of exp.user and exp.var.dynamic, for predicted_exp
+    """
+    return _snapshot(exp.user), copy.deepcopy(exp.var.dynamic)
+
+
+class predicted_exp(object):
+    """exp, as it will be on a possible next trial
+
+        var.current and var.dynamic['value'] are replaced with the given 
+        levels and value (if value is None, var.dynamic is not changed). 
+        var.current, var.dynamic and user are copies, taken when it is made
+        (or passed in, from snapshot), so a prefetch on the worker thread 
+        sees the same state its cache key was made from, even as post_trial 
+        changes exp. Everything else is read from exp.
+    """
+    def __init__(self, exp, current, value=None, snap=None):
+        self._exp = exp
+        self.user, dynamic = snapshot(exp) if snap is None else snap
+        self.var = _predicted_var(exp.var, current, value, dynamic)
+
+    def __getattr__(self, name):
+        return getattr(self._exp, name)
+
+
+class prefetcher():
+    """Makes the stimuli for the likely next trials, while the subject responds
+
+        The run loop calls start after pre_trial. It asks the method for
+        the likely next trials (method.predict_next, which returns a list of 
+        (current, dynamic value) pairs, most likely first), and for each 
+        one, queues each function decorated with @cached(prefetch=True) on a 
+        worker thread, which puts the results in the cache. 
+
+        When pre_trial calls the function, the cached wrapper takes the 
+        matching result: if it is done it is used, if it is being made it 
+        waits for it, and if it has not started it is made right away. After
+        pre_trial, finish cancels the candidates that have not started. 
+        Ones that were already made stay in the cache, in case that stimulus 
+        comes up again.
+
+        gustav.run gives each exp its own prefetcher (exp.prefetcher), with 
+        the functions from its own experiment script (get_prefetch_funcs), 
+        so that experiments running at once in one process do not run each 
+        other's functions, or cancel each other's candidates.
+    """
+    def __init__(self, funcs=None):
+        self.funcs = [] if funcs is None else funcs
+        self.pending = {}
+        self.executor = None
+        self.hits = 0
+
+    def start(self, exp):
+        if not self.funcs or not hasattr(exp.method, 'predict_next'):
+            return
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='gustav_prefetch')
+        candidates = exp.method.predict_next(exp)
+        if not candidates:
+            return
+        snap = snapshot(exp)
+        for current, value in candidates:
+            pexp = predicted_exp(exp, current, value, snap)
+            for f in self.funcs:
+                # Keys are made now, and the stimuli later, from the same copy
+                # of the state of exp during this trial
+                k = f.get_key(pexp)
+                if k not in self.pending and k not in f.cache:
+                    self.pending[k] = self.executor.submit(f.fill, pexp, k)
+
+    def take(self, k):
+        """Waits for the prefetch of key k, if there is one. Returns True if it is in the cache
+        """
+        fut = self.pending.pop(k, None)
+        if fut is None or fut.cancel():
+            return False
+        try:
+            fut.result()
+        except Exception:
+            # Let the caller make it again, and raise if it fails there
+            return False
+        self.hits += 1
+        return True
+
+    def finish(self):
+        for k, fut in list(self.pending.items()):
+            if fut.cancel() or fut.done():
+                del self.pending[k]
+
+    def shutdown(self):
+        self.finish()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        self.pending = {}
+
+
+default_prefetcher = prefetcher()
+
+
+def memoize(func=None, cache=None, copy=False):
+    """Wraps a deterministic function, caching its result for each set of arguments
+
+        Use this for eg., filter design: butter = memoize(scipy.signal.butter).
+        Arguments may be numbers, strings, lists, dicts, or numpy arrays.
+    """
+    if func is None:
+        return functools.partial(memoize, cache=cache, copy=copy)
+    if cache is None:
+        cache = default_cache
+    name = "{}.{}".format(getattr(func, '__module__', ''), getattr(func, '__qualname__', repr(func)))
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        k = (name, freeze(args), freeze(kwargs))
+        val = cache.get(k, cache)
+        if val is cache:
+            val = _readonly(func(*args, **kwargs))
+            cache.put(k, val)
+        return _copy(val) if copy else val
+    wrapper.cache = cache
+    wrapper.uncached = func
+    return wrapper
@@ -0,0 +1,551 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2010-2020 Christopher Brown
+#
+# This file is part of gustav.
+#
+# gustav is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# gustav is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gustav.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Comments and/or additions are welcome. Send e-mail to: cbrown1@pitt.edu.
+#
+
+
+"""Structured, typed trial data for Gustav
+
+    In addition to the free-form dataStrings, gustav can write one typed
+    record per trial to a csv file, if exp.trialFile is set (it is expanded
+    like exp.dataFile, eg., './data/$name__$subj.trials.csv'). Each record
+    holds:
+
+        subj        : str   The subject id
+        date        : str   The date of the trial
+        time        : str   The time of the trial
+        block       : int   The block number
+        trial       : int   The trial number
+        trial_block : int   The trial number within the block
+        condition   : int   The condition number
+        var_<name>  : str   The current level of each experimental variable
+        dynamic     : float The dynamic value on this trial (adaptive only)
+        response    : str   The response
+        correct     : float 1 if the response was correct, 0 if not, nan
+                             if unknown
+        rt          : float The reaction time in s, if exp.run.rt was set
+
+    Records are written after every post_trial event, through the same
+    buffered writer as the data and log files. The file begins with a
+    schema line giving the name and type of each column, so a whole
+    directory of files can be read back without guessing:
+
+        >>> d = gustav.data.load('./data')
+        >>> d['dynamic'][d['var_bw'] == '.5'].mean()
+
+    load returns a dict of numpy arrays, one per column, with the rows of
+    every file concatenated.
+
+    This module can also read the python-class datafiles written by the 
+    adaptive method's save_data_block, without executing them:
+
+        >>> blocks = gustav.data.load_blocks('./data', subj='1')
+        >>> [b['dynamic']['mean'] for b in blocks]
+
+    See read_blocks, index_blocks and load_blocks.
+"""
+
+import os
+import re
+import ast
+import csv
+import glob
+import json
+import warnings
+import collections
+import concurrent.futures
+import numpy as np
+
+schema_prefix = "# schema: "
+
+converters = {
+    'int': int,
+    'float': float,
+    'str': str,
+    }
+
+def get_schema(exp):
+    """Returns a list of (column, type) tuples for exp's trial records
+    """
+    schema = [
+        ('subj', 'str'),
+        ('date', 'str'),
+        ('time', 'str'),
+        ('block', 'int'),
+        ('trial', 'int'),
+        ('trial_block', 'int'),
+        ('condition', 'int'),
+        ]
+    for v in exp.var.varlist:
+        schema.append(("var_{}".format(v), 'str'))
+    schema += [
+        ('dynamic', 'float'),
+        ('response', 'str'),
+        ('correct', 'float'),
+        ('rt', 'float'),
+        ]
+    return schema
+
+
+def schema_to_str(schema):
+    return "{}{}\n".format(schema_prefix, ",".join("{}:{}".format(name, typ) for name, typ in schema))
+
+
+def str_to_schema(s):
+    schema = []
+    for item in s[len(schema_prefix):].strip().split(","):
+        name, typ = item.rsplit(":", 1)
+        schema.append((name, typ))
+    return schema
+
+
+def read_schema(filename):
+    """Returns the schema of a trial file, or None if it has none
+    """
+    with open(filename, encoding='utf-8') as f:
+        for line in f:
+            if line.startswith(schema_prefix):
+                return str_to_schema(line)
+    return None
+
+
+def to_row(values):
+    """Formats a list of values as a csv line
+    """
+    out = []
+    for val in values:
+        if val is None or (isinstance(val, float) and np.isnan(val)):
+            out.append("")
+        else:
+            out.append(str(val))
+    return csv_line(out)
+
+
+def csv_line(items):
+    ret = []
+    for item in items:
+        if any(c in item for c in ',"\n\r'):
+            item = '"{}"'.format(item.replace('"', '""'))
+        ret.append(item)
+    return ",".join(ret) + "\n"
+
+
+def get_record(exp, correct=None, rt=None):
+    """Returns the current trial as a list of values, in schema order
+    """
+    dynamic = None
+    if 'values' in exp.var.dynamic and len(exp.var.dynamic['values']) > 0:
+        # The adaptive method has already stepped 'value' for the next trial
+        dynamic = exp.var.dynamic['values'][-1]
+    elif 'value' in exp.var.dynamic:
+        dynamic = exp.var.dynamic['value']
+    if correct is None and 'cur_correct' in exp.var.dynamic:
+        correct = exp.var.dynamic['cur_correct']
+    if rt is None:
+        rt = exp.run.rt
+    record = [
+        exp.subjID,
+        exp.run.date,
+        exp.run.time,
+        exp.run.block+1,
+        exp.run.trials_exp+1,
+        exp.run.trials_block+1,
+        exp.run.condition+1,
+        ]
+    for v in exp.var.varlist:
+        record.append(exp.var.current.get(v))
+    record += [
+        dynamic,
+        exp.run.response,
+        None if correct is None else int(bool(correct)),
+        rt,
+        ]
+    return record
+
+
+def record_trial(exp, correct=None, rt=None):
+    """Appends a record for the current trial to exp.trialFile
+
+        correct and rt default to exp.var.dynamic['cur_correct'] and
+        exp.run.rt, if they are set.
+    """
+    schema = get_schema(exp)
+    if not exp.utils.data_exists(exp, exp.trialFile):
+        header = schema_to_str(schema)
+        header += csv_line([name for name, typ in schema])
+        exp.utils.write_out(exp, header, exp.trialFile)
+    elif not exp.trialFile_checked:
+        file_schema = read_schema(exp.trialFile)
+        if file_schema is not None and file_schema != schema:
+            raise Exception("Trial file {} exists, but has a different schema".format(exp.trialFile))
+    exp.trialFile_checked = True
+    exp.utils.write_out(exp, to_row(get_record(exp, correct=correct, rt=rt)), exp.trialFile)
+
+
+def read(filename):
+    """Reads a trial file, returns the schema and a list of rows (as str)
+
+        The schema, comments and blank lines before the column names are 
+        skipped, and the rest of the file is read as csv, so quoted fields 
+        may hold newlines and '#'. Rows shorter than the schema (eg., the 
+        last row, if gustav stopped while writing it) are skipped with a 
+        warning.
+    """
+    schema = None
+    rows = []
+    with open(filename, encoding='utf-8', newline='') as f:
+        header_lines = 0
+        for line in f:
+            header_lines += 1
+            if line.startswith(schema_prefix):
+                schema = str_to_schema(line)
+            elif line.strip() != '' and not line.startswith("#"):
+                break # Column names
+        if schema is None:
+            raise Exception("No schema found in trial file: {}".format(filename))
+        reader = csv.reader(f)
+        for row in reader:
+            if len(row) == 0:
+                continue
+            if len(row) < len(schema):
+                warnings.warn("Skipping incomplete row at line {} of trial file: {}".format(header_lines + reader.line_num, filename))
+                continue
+            rows.append(row)
+    return schema, rows
+
+
+def load(path, pattern='*.csv'):
+    """Loads trial files into a dict of numpy arrays, one per column
+
+        path can be a trial file, or a directory, in which case all
+        files matching pattern that contain a schema are loaded.
+
+        Columns that are missing in some files are filled with nan (float
+        columns, and int columns, which then become float) or '' (str
+        columns). A 'file' column holds the filename of each row.
+    """
+    if os.path.isdir(path):
+        filenames = sorted(glob.glob(os.path.join(path, pattern)))
+    else:
+        filenames = [path]
+    columns = {'file': []}
+    coltypes = {'file': 'str'}
+    nrows = 0
+    for filename in filenames:
+        try:
+            schema, rows = read(filename)
+        except Exception:
+            if os.path.isdir(path):
+                continue
+            raise
+        for name, typ in schema:
+            if name not in columns:
+                columns[name] = [None] * nrows
+                coltypes[name] = typ
+        for i, (name, typ) in enumerate(schema):
+            conv = converters[typ]
+            columns[name] += [conv(row[i]) if row[i] != '' else None for row in rows]
+        for name in columns:
+            if len(columns[name]) < nrows + len(rows):
+                columns[name] += [None] * (nrows + len(rows) - len(columns[name]))
+        columns['file'][nrows:] = [filename] * len(rows)
+        nrows += len(rows)
+    out = {}
+    for name, vals in columns.items():
+        typ = coltypes[name]
+        if typ == 'str':
+            out[name] = np.array(['' if v is None else v for v in vals], dtype=str)
+        elif typ == 'int' and None not in vals:
+            out[name] = np.array(vals, dtype=int)
+        else:
+            out[name] = np.array([np.nan if v is None else v for v in vals], dtype=float)
+    return out
+
+
+# Block datafiles
+#
+# The adaptive (and pest) method's save_data_block writes each block as a
+# python class. The functions below read these files back without executing
+# them: each block is parsed with ast, and only literal values (plus nan,
+# inf, and numpy scalar and array reprs) are evaluated.
+
+block_index_file = '.gustav_block_index.json'
+
+block_safe_names = {
+    'nan': float('nan'),
+    'inf': float('inf'),
+    'True': True,
+    'False': False,
+    'None': None,
+    }
+
+block_safe_calls = {
+    'array': np.array,
+    'float': float,
+    'float16': float,
+    'float32': float,
+    'float64': float,
+    'int': int,
+    'int8': int,
+    'int16': int,
+    'int32': int,
+    'int64': int,
+    'str': str,
+    'str_': str,
+    'bool_': bool,
+    'OrderedDict': collections.OrderedDict,
+    }
+
+# Reprs like <function step at 0x7f...> are not valid python
+block_unparseable_re = re.compile(r"<(?:function|bound method|class|module|built-in function|built-in method)[^<>\n]*>")
+
+# A class with no body (eg., an empty exp.user, in files written before
+# obj_to_str wrote 'pass' for these)
+block_class_re = re.compile(r"^([ \t]*)class \w+\(?\)?:[ \t]*$")
+
+
+def _fill_empty_classes(source):
+    lines = source.split("\n")
+    out = []
+    for i, line in enumerate(lines):
+        out.append(line)
+        m = block_class_re.match(line)
+        if m:
+            indent = m.group(1)
+            rest = [l for l in lines[i+1:] if l.strip() != ""]
+            if not rest or len(rest[0]) - len(rest[0].lstrip()) <= len(indent):
+                out.append(indent + "    pass")
+    return "\n".join(out)
+
+
+def _dotted_name(node):
+    if isinstance(node, ast.Name):
+        return node.id
+    elif isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def eval_node(node):
+    """Evaluates an ast node that holds a literal value, without executing code
+    """
+    if isinstance(node, ast.Constant):
+        return node.value
+    elif isinstance(node, ast.List):
+        return [eval_node(n) for n in node.elts]
+    elif isinstance(node, ast.Tuple):
+        return tuple(eval_node(n) for n in node.elts)
+    elif isinstance(node, ast.Set):
+        return set(eval_node(n) for n in node.elts)
+    elif isinstance(node, ast.Dict):
+        return dict((eval_node(k), eval_node(v)) for k, v in zip(node.keys, node.values))
+    elif isinstance(node, (ast.Name, ast.Attribute)) and _dotted_name(node) in block_safe_names:
+        return block_safe_names[_dotted_name(node)]
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        val = eval_node(node.operand)
+        return -val if isinstance(node.op, ast.USub) else val
+    elif isinstance(node, ast.Call) and _dotted_name(node.func) in block_safe_calls:
+        # dtype and other keywords (eg., array([1, 2], dtype=int64)) are ignored
+        return block_safe_calls[_dotted_name(node.func)](*[eval_node(n) for n in node.args])
+    raise ValueError("Not a literal: {}".format(ast.dump(node)))
+
+
+def _class_to_dict(node, source):
+    out = collections.OrderedDict()
+    for item in node.body:
+        if isinstance(item, ast.Assign) and len(item.targets) == 1 and isinstance(item.targets[0], ast.Name):
+            try:
+                out[item.targets[0].id] = eval_node(item.value)
+            except (ValueError, TypeError):
+                # Keep the source text of anything that isn't a literal
+                out[item.targets[0].id] = ast.get_source_segment(source, item.value)
+        elif isinstance(item, ast.ClassDef):
+            out[item.name] = _class_to_dict(item, source)
+    return out
+
+
+def parse_block(source, filename='', offset=0):
+    """Parses the source of one block class into a dict
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        source = _fill_empty_classes(block_unparseable_re.sub("None", source))
+        try:
+            tree = ast.parse(source)
+        except SyntaxError as e:
+            raise Exception("Unable to parse block at {}:{}: {}".format(filename, offset, e))
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            block = _class_to_dict(node, source)
+            block['block'] = node.name
+            block['file'] = filename
+            block['offset'] = offset
+            return block
+    raise Exception("No block found at {}:{}".format(filename, offset))
+
+
+def read_blocks(filename, offset=0):
+    """Yields the blocks in a block datafile, one at a time, as dicts
+
+        Each block dict holds the values written by save_data_block ('name',
+        'subjID', 'date', 'variables', 'user', 'dynamic', etc.), plus 'block'
+        (the class name), 'file', and 'offset', the byte offset of the
+        block in the file. Pass offset to start reading at a given block.
+    """
+    with open(filename, 'rb') as f:
+        f.seek(offset)
+        pos = offset
+        start = None
+        lines = []
+        for line in f:
+            if line.startswith(b"class "):
+                if start is not None:
+                    yield parse_block(b"".join(lines).decode('utf-8'), filename, start)
+                start = pos
+                lines = [line]
+            elif start is not None:
+                if line[:1] in (b" ", b"\t") or line.strip() == b"":
+                    lines.append(line)
+                else:
+                    # Anything unindented (eg., dataStrings) ends the block
+                    yield parse_block(b"".join(lines).decode('utf-8'), filename, start)
+                    start = None
+            pos += len(line)
+        if start is not None:
+            yield parse_block(b"".join(lines).decode('utf-8'), filename, start)
+
+
+def read_block(filename, offset):
+    """Returns the single block that starts at offset in filename
+    """
+    for block in read_blocks(filename, offset):
+        return block
+
+
+def _index_entry(block):
+    return {
+        'subj': block.get('subjID'),
+        'date': block.get('date'),
+        'time': block.get('time'),
+        'variables': dict(block.get('variables', {})),
+        'offset': block['offset'],
+        }
+
+
+def _scan_file(args):
+    filename, offset = args
+    return filename, [_index_entry(block) for block in read_blocks(filename, offset)]
+
+
+def _read_file(args):
+    filename, offsets = args
+    if offsets is None:
+        return list(read_blocks(filename))
+    return [read_block(filename, offset) for offset in offsets]
+
+
+def _map(func, items, processes):
+    if processes == 1 or len(items) < 2:
+        return [func(item) for item in items]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(func, items, chunksize=max(1, len(items) // 64)))
+
+
+def index_blocks(path, pattern='*.py', processes=None, save=True):
+    """Builds (or updates) an index of the blocks in a directory of datafiles
+
+        The index is a dict, keyed by filename, of the size and mtime of each
+        file, and a list with the subject id, date, time, variables and byte 
+        offset of each block in it. It is saved to path/.gustav_block_index.json, 
+        and on later calls only new or changed files are scanned. Since 
+        block datafiles are only ever appended to, a file that has grown is 
+        scanned from its last indexed block onwards.
+
+        Files are scanned in parallel using a pool of processes (None to 
+        use one per cpu).
+    """
+    index_path = os.path.join(path, block_index_file)
+    index = {}
+    if os.path.isfile(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+    filenames = sorted(glob.glob(os.path.join(path, pattern)))
+    todo = []
+    for filename in filenames:
+        st = os.stat(filename)
+        entry = index.get(filename)
+        if entry is not None and entry['size'] == st.st_size and entry['mtime'] == st.st_mtime:
+            continue
+        if entry is not None and entry['size'] < st.st_size and len(entry['blocks']) > 0:
+            # Appended to. Re-read the last block, in case it was incomplete
+            offset = entry['blocks'].pop()['offset']
+        else:
+            entry = {'blocks': []}
+            offset = 0
+        entry['size'] = st.st_size
+        entry['mtime'] = st.st_mtime
+        index[filename] = entry
+        todo.append((filename, offset))
+    for filename, blocks in _map(_scan_file, todo, processes):
+        index[filename]['blocks'] += blocks
+    for filename in list(index):
+        if filename not in filenames:
+            del index[filename]
+    if save:
+        with open(index_path + '.tmp', 'w') as f:
+            json.dump(index, f)
+        os.replace(index_path + '.tmp', index_path)
+    return index
+
+
+def load_blocks(path, pattern='*.py', processes=None, subj=None, date=None, variables=None):
+    """Reads all blocks from a datafile, or a directory of datafiles
+
+        When path is a directory, files are read in parallel using a pool 
+        of processes (None to use one per cpu). subj, date, and variables 
+        (a dict of variable levels) can be used to select blocks, in which 
+        case the index (see index_blocks) is used to read only the matching 
+        blocks.
+
+        Returns a list of block dicts (see read_blocks).
+    """
+    if not os.path.isdir(path):
+        return list(read_blocks(path))
+    if subj is None and date is None and variables is None:
+        items = [(filename, None) for filename in sorted(glob.glob(os.path.join(path, pattern)))]
+    else:
+        items = []
+        for filename, entry in sorted(index_blocks(path, pattern, processes).items()):
+            offsets = []
+            for block in entry['blocks']:
+                if subj is not None and block['subj'] != subj:
+                    continue
+                if date is not None and block['date'] != date:
+                    continue
+                if variables is not None and any(block['variables'].get(k) != v for k, v in variables.items()):
+                    continue
+                offsets.append(block['offset'])
+            if offsets:
+                items.append((filename, offsets))
+    blocks = []
+    for file_blocks in _map(_read_file, items, processes):
+        blocks += file_blocks
+    return blocks
@@ -0,0 +1,669 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2010-2020 Christopher Brown
+#
+# This file is part of gustav.
+#
+# gustav is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# gustav is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gustav.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Comments and/or additions are welcome. Send e-mail to: cbrown1@pitt.edu.
+#
+
+""" The parts common to all of the curses forms
+
+    Each form (nafc, localization, etc) is a subclass of Interface, which 
+    sets up curses, and provides the title and status bars, the notify 
+    areas, key input, timers, and the machinery to draw the window. A form 
+    declares the widgets that make up its window (see render), in the order 
+    they are drawn:
+
+        def widgets(self):
+            return [('prompt', self.layout_prompt, self.paint_prompt)] + base.Interface.widgets(self)
+
+    ...and extends place, which is called once each time the terminal 
+    changes size, to compute whatever geometry depends only on the size of 
+    the window (eg., where the buttons go, and so where the notify areas are 
+    centered). Text is split and padded once when it changes, not each time 
+    it is drawn.
+
+    get_resp sleeps in select until there is input on stdin, rather than 
+    polling curses for keys, so a form that is waiting for the subject uses 
+    no cpu, and a key is seen as soon as it arrives. The time the process 
+    woke up for the key is kept in resp_time (ms). select also watches a 
+    pipe, written to on SIGWINCH, so that a resize is still redrawn at once, 
+    and by wake, so that another thread (eg., a timer) can end a wait early.
+
+"""
+
+import os, sys
+import curses
+import select
+import signal
+import time
+import math
+
+from . import render
+
+class Interface(object):
+    def __init__(self):
+        # Initialize text areas
+        self.title_l_str = "Gustav!"
+        self.title_c_str = ""
+        self.title_r_str = ""
+        self.notify_l_str = ""
+        self.notify_l_show = False
+        self.notify_r_str = ""
+        self.notify_r_show = False
+        self.notify_pad = True
+        self.notify_offset_v = 2                # Vertical offset of notifications from top of window
+        self.status_l_str = "Press '/' to quit"
+        self.status_c_str = ""
+        self.status_r_str = ""
+
+        self.keypress_wait = .005 # Sleep time in sec during keypress loop to avoid cpu race
+                                  # Only used on Windows, where select can't wait on the console
+        self.resp_time = None     # Time (ms) that get_resp woke up for the last key
+        self.wait_spin_ms = 2.    # The wait functions sleep until this long before the deadline, then spin
+        self.schedule_ns = None   # The last deadline of schedule_ms
+        self.reset_wait_stats()
+
+        # Some stuff for rendering
+        # Dict so you can specify colors in curses using standard xterm 256-color palette names.
+        self.palette256 = {'Black': 0, 'Maroon': 1, 'Green': 2, 'Olive': 3, 'Navy': 4, 'Purple': 5, 'Teal': 6, 'Silver': 7, 'Grey': 8, 'Red': 9, 'Lime': 10, 'Yellow': 11, 'Blue': 12, 'Fuchsia': 13, 'Aqua': 14, 'White': 15, 'Grey0': 16, 'NavyBlue': 17, 'DarkBlue': 18, 'Blue3-1': 19, 'Blue3-2': 20, 'Blue3': 20, 'Blue1': 21, 'DarkGreen': 22, 'DeepSkyBlue4-1': 23, 'DeepSkyBlue4-2': 24, 'DeepSkyBlue4-3': 25, 'DeepSkyBlue4': 25, 'DodgerBlue3': 26, 'DodgerBlue2': 27, 'Green4': 28, 'SpringGreen4': 29, 'Turquoise4': 30, 'DeepSkyBlue3': 31, 'DeepSkyBlue3': 32, 'DodgerBlue1': 33, 'Green3': 34, 'SpringGreen3': 35, 'DarkCyan': 36, 'LightSeaGreen': 37, 'DeepSkyBlue2': 38, 'DeepSkyBlue1': 39, 'Green3': 40, 'SpringGreen3': 41, 'SpringGreen2': 42, 'Cyan3': 43, 'DarkTurquoise': 44, 'Turquoise2': 45, 'Green1': 46, 'SpringGreen2': 47, 'SpringGreen1': 48, 'MediumSpringGreen': 49, 'Cyan2': 50, 'Cyan1': 51, 'DarkRed': 52, 'DeepPink4': 53, 'Purple4': 54, 'Purple4': 55, 'Purple3': 56, 'BlueViolet': 57, 'Orange4': 58, 'Grey37': 59, 'MediumPurple4': 60, 'SlateBlue3': 61, 'SlateBlue3': 62, 'RoyalBlue1': 63, 'Chartreuse4': 64, 'DarkSeaGreen4': 65, 'PaleTurquoise4': 66, 'SteelBlue': 67, 'SteelBlue3': 68, 'CornflowerBlue': 69, 'Chartreuse3': 70, 'DarkSeaGreen4': 71, 'CadetBlue': 72, 'CadetBlue': 73, 'SkyBlue3': 74, 'SteelBlue1': 75, 'Chartreuse3': 76, 'PaleGreen3': 77, 'SeaGreen3': 78, 'Aquamarine3': 79, 'MediumTurquoise': 80, 'SteelBlue1': 81, 'Chartreuse2': 82, 'SeaGreen2': 83, 'SeaGreen1': 84, 'SeaGreen1': 85, 'Aquamarine1': 86, 'DarkSlateGray2': 87, 'DarkRed': 88, 'DeepPink4': 89, 'DarkMagenta': 90, 'DarkMagenta': 91, 'DarkViolet': 92, 'Purple': 93, 'Orange4': 94, 'LightPink4': 95, 'Plum4': 96, 'MediumPurple3': 97, 'MediumPurple3': 98, 'SlateBlue1': 99, 'Yellow4': 100, 'Wheat4': 101, 'Grey53': 102, 'LightSlateGrey': 103, 'MediumPurple': 104, 'LightSlateBlue': 105, 'Yellow4': 106, 'DarkOliveGreen3': 107, 'DarkSeaGreen': 108, 'LightSkyBlue3': 109, 'LightSkyBlue3': 110, 'SkyBlue2': 111, 'Chartreuse2': 112, 'DarkOliveGreen3': 113, 'PaleGreen3': 114, 'DarkSeaGreen3': 115, 'DarkSlateGray3': 116, 'SkyBlue1': 117, 'Chartreuse1': 118, 'LightGreen': 119, 'LightGreen': 120, 'PaleGreen1': 121, 'Aquamarine1': 122, 'DarkSlateGray1': 123, 'Red3': 124, 'DeepPink4': 125, 'MediumVioletRed': 126, 'Magenta3': 127, 'DarkViolet': 128, 'Purple': 129, 'DarkOrange3': 130, 'IndianRed': 131, 'HotPink3': 132, 'MediumOrchid3': 133, 'MediumOrchid': 134, 'MediumPurple2': 135, 'DarkGoldenrod': 136, 'LightSalmon3': 137, 'RosyBrown': 138, 'Grey63': 139, 'MediumPurple2': 140, 'MediumPurple1': 141, 'Gold3': 142, 'DarkKhaki': 143, 'NavajoWhite3': 144, 'Grey69': 145, 'LightSteelBlue3': 146, 'LightSteelBlue': 147, 'Yellow3': 148, 'DarkOliveGreen3': 149, 'DarkSeaGreen3': 150, 'DarkSeaGreen2': 151, 'LightCyan3': 152, 'LightSkyBlue1': 153, 'GreenYellow': 154, 'DarkOliveGreen2': 155, 'PaleGreen1': 156, 'DarkSeaGreen2': 157, 'DarkSeaGreen1': 158, 'PaleTurquoise1': 159, 'Red3': 160, 'DeepPink3': 161, 'DeepPink3': 162, 'Magenta3': 163, 'Magenta3': 164, 'Magenta2': 165, 'DarkOrange3': 166, 'IndianRed': 167, 'HotPink3': 168, 'HotPink2': 169, 'Orchid': 170, 'MediumOrchid1': 171, 'Orange3': 172, 'LightSalmon3': 173, 'LightPink3': 174, 'Pink3': 175, 'Plum3': 176, 'Violet': 177, 'Gold3': 178, 'LightGoldenrod3': 179, 'Tan': 180, 'MistyRose3': 181, 'Thistle3': 182, 'Plum2': 183, 'Yellow3': 184, 'Khaki3': 185, 'LightGoldenrod2-1': 186, 'LightYellow3': 187, 'Grey84': 188, 'LightSteelBlue1': 189, 'Yellow2': 190, 'DarkOliveGreen1': 191, 'DarkOliveGreen1': 192, 'DarkSeaGreen1': 193, 'Honeydew2': 194, 'LightCyan1': 195, 'Red1': 196, 'DeepPink2': 197, 'DeepPink1': 198, 'DeepPink1': 199, 'Magenta2': 200, 'Magenta1': 201, 'OrangeRed1': 202, 'IndianRed1': 203, 'IndianRed1': 204, 'HotPink': 205, 'HotPink': 206, 'MediumOrchid1': 207, 'DarkOrange': 208, 'Salmon1': 209, 'LightCoral': 210, 'PaleVioletRed1': 211, 'Orchid2': 212, 'Orchid1': 213, 'Orange1': 214, 'SandyBrown': 215, 'LightSalmon1': 216, 'LightPink1': 217, 'Pink1': 218, 'Plum1': 219, 'Gold1': 220, 'LightGoldenrod2-2': 221, 'LightGoldenrod2-3': 222, 'LightGoldenrod2': 222, 'NavajoWhite1': 223, 'MistyRose1': 224, 'Thistle1': 225, 'Yellow1': 226, 'LightGoldenrod1': 227, 'Khaki1': 228, 'Wheat1': 229, 'Cornsilk1': 230, 'Grey100': 231, 'Grey3': 232, 'Grey7': 233, 'Grey11': 234, 'Grey15': 235, 'Grey19': 236, 'Grey23': 237, 'Grey27': 238, 'Grey30': 239, 'Grey35': 240, 'Grey39': 241, 'Grey42': 242, 'Grey46': 243, 'Grey50': 244, 'Grey54': 245, 'Grey58': 246, 'Grey62': 247, 'Grey66': 248, 'Grey70': 249, 'Grey74': 250, 'Grey78': 251, 'Grey82': 252, 'Grey85': 253, 'Grey89': 254, 'Grey93': 255, }
+        # I'm sure there is a better way to do this, but I got tired of looking.
+        self.glyphs = { 'blocks':
+                            {
+                             'block': "█",      # 
+                             'block_hu': "▀",   # half up
+                             'block_hd': "▄",   # half down
+                             'block_hl': "▌",   # half left
+                             'block_hr': "▐",   # half right
+                             'block_qul': "▘",  # quarter upper left
+                             'block_qur': "▝",  # quarter upper right
+                             'block_qll;': "▖", # quarter lower left
+                             'block_qlr': "▗",  # quarter lower right
+                             },
+                        'lines':
+                           {'light':
+                                {'line_h': "─",
+                                 'line_hdd': "╌",
+                                 'line_hdt': "┄",
+                                 'line_hl': "╴",
+                                 'line_hr': "╶",
+                                 'line_v': "│",
+                                 'line_vdd': "╎",
+                                 'line_vdt': "┆",
+                                 'line_vl': "╷",
+                                 'line_vu': "╵",
+                                 'line_vh': "┼",
+                                 'corner_ul': "┌",
+                                 'corner_ur': "┐",
+                                 'corner_ll': "└",
+                                 'corner_lr': "┘",
+                                },
+                            'heavy': 
+                                {'line_h': "━",     # horizontal
+                                 'line_hdd': "╍",   # horizontal dash double
+                                 'line_hdt': "┅",   # horizontal dash triple
+                                 'line_hl': "╸",    # horizontal left
+                                 'line_hr': "╺",    # horizontal right
+                                 'line_v': "┃",     # vertical
+                                 'line_vdd': "╏",   # vertical dash double
+                                 'line_vdt': "┇",   # vertical dash triple
+                                 'line_vu': "╹",    # vertical upper
+                                 'line_vh': "╋",    # vertical horizontal
+                                 'line_vl': "╻",    # vertical lower
+                                 'corner_ul': "┏",  # corner upper left
+                                 'corner_ur': "┓",  # corner upper right
+                                 'corner_ll': "┗",  # corner lower left
+                                 'corner_lr': "┛",  # corner lower right
+                                },
+                           'double':
+                                {'line_h': "═",
+                                 'line_v': "║",
+                                 'line_vh': "╬",
+                                 'corner_ul': "╔",
+                                 'corner_ur': "╗",
+                                 'corner_ll': "╚",
+                                 'corner_lr': "╝",
+                                },
+                            },
+                        }
+
+
+        # Initialize curses stuff
+        self.stdscr = curses.initscr()   # Return a window object representing the entire screen
+        self.stdscr.keypad(True)         # Accept multibyte special keys (eg., curses.KEY_LEFT)
+        self.stdscr.nodelay(True)        # Don't block waiting for input (must then block manually in a while loop)
+        curses.cbreak()                  # Accept keypresses without having to hit enter
+        curses.noecho()                  # Don't automatically echo keypresses to screen
+        curses.curs_set(0)               # Hide the cursor
+        curses.start_color()             # Initialize color
+
+        # Self-pipe to wake get_resp from select, on a resize or from another thread
+        self.resized = False
+        self.woken = False
+        self.sigwinch = None
+        if os.name == 'posix':
+            self.input_fd = sys.stdin.fileno()
+            self.wake_r, self.wake_w = os.pipe()
+            os.set_blocking(self.wake_r, False)
+            os.set_blocking(self.wake_w, False)
+            try:
+                # This replaces the curses handler, so the terminal is resized in wait_input
+                self.sigwinch = signal.signal(signal.SIGWINCH, self.on_sigwinch) or signal.SIG_DFL
+            except ValueError:
+                # Not the main thread; a resize is seen the next time a key is read
+                pass
+        else:
+            self.wake_r = self.wake_w = None
+
+
+    def destroy(self):
+        if self.sigwinch is not None:
+            signal.signal(signal.SIGWINCH, self.sigwinch)
+            self.sigwinch = None
+        if self.wake_r is not None:
+            os.close(self.wake_r)
+            os.close(self.wake_w)
+            self.wake_r = self.wake_w = None
+        self.stdscr.nodelay(False)
+        self.stdscr.keypad(False)
+        curses.curs_set(1)
+        curses.echo()
+        curses.nocbreak()
+        curses.endwin()
+
+
+    def redraw(self):
+        """Draw entire window
+
+            Called when term is resized, or manually by user. Otherwise 
+            only the widgets that have changed are drawn, with update.
+
+        """
+        self.screen.repaint()
+
+
+    def add_widgets(self):
+        """Set up the screen with the form's widgets. Call at the end of __init__
+        """
+        self.screen = render.Screen(self.stdscr, self.draw_frame)
+        for name, layout, paint in self.widgets():
+            self.screen.add(name, layout, paint)
+
+
+    def widgets(self):
+        """The widgets that make up the window, as (name, layout, paint), in the order they are drawn
+        """
+        # Lower left and right notifies are not implemented as they seem a bit overkill
+        return [('notify_l', self.layout_notify_l, self.paint_notify_l),
+                ('notify_r', self.layout_notify_r, self.paint_notify_r),
+                ('title',    self.layout_title,    self.paint_title),
+                ('status',   self.layout_status,   self.paint_status),
+               ]
+
+
+    def draw_frame(self, stdscr):
+        """Draw the border, the only thing that is not a widget, and place
+            the widgets for this size of terminal
+        """
+        self.win_height,self.win_width = stdscr.getmaxyx()
+        self.place()
+        cp = self.border_color()
+        stdscr.attron(cp)
+        stdscr.box()
+        stdscr.attroff(cp)
+
+
+    def border_color(self):
+        return self.cp['default']
+
+
+    def place(self):
+        """Compute the geometry that depends only on the size of the window
+
+            The notify areas start on line notify_y, and are centered between 
+            the left edge of the window and notify_x1, and between notify_x2 
+            and the right edge. Forms extend this to place their own widgets.
+        """
+        self.notify_y = max(self.notify_offset_v, (self.win_height // 10)) # Terminal line to start at
+        self.notify_x1 = self.notify_x2 = self.win_width // 2
+
+
+    def layout_prompt(self):
+        if not self.prompt_show:
+            return None
+        lines, w = render.prompt_lines(self.prompt)
+        this_x = int((self.win_width // 2) - (w // 2) - w % 2)
+        return (self.pad_y, this_x, len(lines), w)
+
+    def paint_prompt(self, win):
+        lines, w = render.prompt_lines(self.prompt)
+        x0 = int((self.win_width // 2) - (w // 2) - w % 2)
+        for y, line in enumerate(lines):
+            this_x = int((self.win_width // 2) - (len(line) // 2) - len(line) % 2) - x0
+            render.put(win, y, this_x, line, curses.A_BOLD | self.prompt_color)
+
+
+    def layout_notify_l(self):
+        if not self.notify_l_show:
+            return None
+        lines, w = render.notify_lines(self.notify_l_str, self.notify_pad)
+        return render.notify_left(lines, w, self.notify_y, self.notify_x1, self.notify_pad)
+
+    def paint_notify_l(self, win):
+        lines, w = render.notify_lines(self.notify_l_str, self.notify_pad)
+        render.paint_notify(win, lines, self.notify_pad, self.glyphs['blocks'], self.cp['notify_ul'], self.cp['notify_ul_pad'])
+
+
+    def layout_notify_r(self):
+        if not self.notify_r_show:
+            return None
+        lines, w = render.notify_lines(self.notify_r_str, self.notify_pad)
+        return render.notify_right(lines, w, self.notify_y, self.notify_x2, self.win_width, self.notify_pad)
+
+    def paint_notify_r(self, win):
+        lines, w = render.notify_lines(self.notify_r_str, self.notify_pad)
+        render.paint_notify(win, lines, self.notify_pad, self.glyphs['blocks'], self.cp['notify_ur'], self.cp['notify_ur_pad'])
+
+
+    def layout_title(self):
+        return (0, 1, 1, self.win_width-2)
+
+    def paint_title(self, win):
+        render.bar(win, self.title_l_str, self.title_c_str, self.title_r_str, self.cp['title'], bold=True)
+
+
+    def layout_status(self):
+        return (self.win_height-1, 1, 1, self.win_width-2)
+
+    def paint_status(self, win):
+        render.bar(win, self.status_l_str, self.status_c_str, self.status_r_str, self.cp['status'])
+
+
+    def rectangle(self, win, uly, ulx, lry, lrx, cp=None):
+        """Draw a rectangle with corners at the provided upper-left
+            and lower-right coordinates, in color pair cp if provided.
+
+            https://stackoverflow.com/questions/52804155/extending-curses-rectangle-box-to-edge-of-terminal-in-python
+        """
+        if cp is not None:
+            win.attron(cp)
+        win.vline(uly+1, ulx, curses.ACS_VLINE, lry - uly - 1)
+        win.hline(uly, ulx+1, curses.ACS_HLINE, lrx - ulx - 1)
+        win.hline(lry, ulx+1, curses.ACS_HLINE, lrx - ulx - 1)
+        win.vline(uly+1, lrx, curses.ACS_VLINE, lry - uly - 1)
+        win.addch(uly, ulx, curses.ACS_ULCORNER)
+        win.addch(uly, lrx, curses.ACS_URCORNER)
+        win.addch(lry, ulx, curses.ACS_LLCORNER)
+        try:
+            win.addch(lry, lrx, curses.ACS_LRCORNER)
+        except curses.error:
+            # The last cell of a window; curses complains that the cursor can't move past it
+            pass
+        if cp is not None:
+            win.attroff(cp)
+
+
+    def round_to(self, x, base):
+        """Rounds x to the nearest base, which can be any float
+        """
+        recip = 1/float(base)
+        return round(x * recip) / recip
+
+
+    #########################################################################
+    ## USER FACING FUNCTIONS BELOW
+
+    def get_resp(self, timeout=None):
+        """Wait modally for a keypress, returns the key as a char. 
+            If you want to evaluate arrow keys etc, use ord:
+
+                ret = get_resp()
+                if ord(ret) == curses.KEY_LEFT:
+                    # do something to the left
+
+            If timeout is None, then block. If it is a float, wait at 
+            least that many seconds, return None if no input. Also 
+            returns None if woken by another thread with wake.
+
+            The time (ms, see timestamp_ms) that the process woke up 
+            for the key is kept in resp_time.
+        """
+
+        try:
+            ret = None
+            woke = None
+            self.woken = False
+            if timeout is not None:
+                timeout_end = time.monotonic() + timeout
+            curses.flushinp()
+            while True:
+                key = self.stdscr.getch()
+                if key == curses.KEY_RESIZE:
+                    self.redraw()
+                    woke = None
+                elif key != curses.ERR:
+                    # Something else: return key as char and let user evaluate
+                    self.resp_time = (woke if woke is not None else self.timestamp_ns()) * 1e-6
+                    ret = chr(key)
+                    break
+                elif self.woken:
+                    break
+                else:
+                    # Nothing buffered; sleep until there is
+                    remaining = None
+                    if timeout is not None:
+                        remaining = timeout_end - time.monotonic()
+                        if remaining <= 0:
+                            break
+                    woke = self.wait_input(remaining)
+            return ret
+
+        except:
+            self.destroy()
+            raise Exception("Error getting input")
+
+    def wait_input(self, timeout=None, fds=()):
+        """Block until there is input on stdin (or on any of fds), a resize, 
+            or a wake, or until timeout (s) has passed. Returns a timestamp 
+            (ns, see timestamp_ns) taken as soon as the process wakes up.
+
+            Nothing runs while waiting; the process sleeps in select.
+        """
+        if self.wake_r is None:
+            # No select on the console on Windows, so poll
+            time.sleep(self.keypress_wait if timeout is None else max(min(timeout, self.keypress_wait), 0))
+            return self.timestamp_ns()
+        readable, writable, errors = select.select([self.input_fd, self.wake_r] + list(fds), [], [], timeout)
+        t = self.timestamp_ns()
+        if self.wake_r in readable:
+            try:
+                while os.read(self.wake_r, 64):
+                    pass
+            except BlockingIOError:
+                pass
+        if self.resized:
+            # resizeterm queues a KEY_RESIZE, as curses would have
+            self.resized = False
+            try:
+                cols, lines = os.get_terminal_size(self.input_fd)
+                curses.resizeterm(lines, cols)
+            except OSError:
+                pass
+        return t
+
+    def wake(self):
+        """Interrupt get_resp, which then returns None
+
+            Safe to call from another thread, eg., a timer.
+        """
+        self.woken = True
+        self.poke()
+
+    def poke(self):
+        # Write to the self-pipe, to wake wait_input
+        if self.wake_w is not None:
+            try:
+                os.write(self.wake_w, b'.')
+            except OSError:
+                pass
+
+    def on_sigwinch(self, signum, frame):
+        self.resized = True
+        self.poke()
+    
+    def update_Title_Left(self, s, redraw=False):
+        """Update the text on the left side of the title bar
+
+            redraw is a bool specifying whether to redraw window. 
+            A window redraw can also be set with update.
+        """
+        self.screen.touch('title')
+        self.title_l_str = s
+        if redraw: 
+            self.update()
+
+    def update_Title_Center(self, s, redraw=False):
+        """Update the text in the center of the title bar
+
+            redraw is a bool specifying whether to redraw window. 
+            A window redraw can also be set with update.
+        """
+        self.screen.touch('title')
+        self.title_c_str = s
+        if redraw: 
+            self.update()
+
+    def update_Title_Right(self, s, redraw=False):
+        """Update the text on the right side of the title bar
+
+            redraw is a bool specifying whether to redraw window. 
+            A window redraw can also be set with update.
+        """
+        self.screen.touch('title')
+        self.title_r_str = s
+        if redraw: 
+            self.update()
+
+    def update_Notify_Left(self, s, show=None, redraw=False):
+        """Update the notify text in the upper left.
+
+            show is a bool specifying whether to show the text,
+            set to None to leave this param unchanged [default].
+            show can also be set with show_Notify_Left.
+
+            redraw is a bool specifying whether to redraw window. 
+            A window redraw can also be set with update.
+        """
+        self.screen.touch('notify_l')
+        self.notify_l_str = s
+        if show is not None:
+            self.notify_l_show = show
+        if redraw: 
+            self.update()
+
+    def update_Notify_Right(self, s, show=None, redraw=False):
+        """Update the notify text in the upper right.
+
+            show is a bool specifying whether to show the text,
+            set to None to leave this param unchanged [default].
+            show can also be set with show_Notify_Right.
+
+            redraw is a bool specifying whether to redraw window. 
+            A window redraw can also be set with update.
+        """
+        self.screen.touch('notify_r')
+        self.notify_r_str = s
+        if show is not None:
+            self.notify_r_show = show
+        if redraw: 
+            self.update()
+
+    def show_Notify_Left(self, show=None, redraw=True):
+        """Show the left notify text
+
+            If show==None, toggle. Otherwise show should be a bool.
+
+            redraw is a bool specifying whether to redraw window. 
+            A window redraw can also be set with update.
+        """        
+        self.screen.touch('notify_l')
+        if show is not None:
+            self.notify_l_show = show
+        else:
+            self.notify_l_show = not self.notify_l_show
+
+        if redraw: 
+            self.update()
+
+    def show_Notify_Right(self, show=None, redraw=True):
+        """Show the right notify text
+
+            If show==None, toggle. Otherwise show should be a bool.
+
+            redraw is a bool specifying whether to redraw window. 
+            A window redraw can also be set with update.
+        """        
+        self.screen.touch('notify_r')
+
+        if show is not None:
+            self.notify_r_show = show
+        else:
+            self.notify_r_show = not self.notify_r_show
+
+        if redraw: 
+            self.update()
+
+    def update_Status_Left(self, s, redraw=False):
+        """Update the text on the left side of the status bar
+
+            redraw is a bool specifying whether to redraw window. 
+            A window redraw can also be set with update.
+        """
+        self.screen.touch('status')
+        self.status_l_str = s
+        if redraw: 
+            self.update()
+
+    def update_Status_Center(self, s, redraw=False):
+        """Update the text in the center of the status bar
+
+            redraw is a bool specifying whether to redraw window. 
+            A window redraw can also be set with update.
+        """
+        self.screen.touch('status')
+        self.status_c_str = s
+        if redraw: 
+            self.update()
+
+    def update_Status_Right(self, s, redraw=False):
+        """Update the text on the right side of the status bar
+
+            redraw is a bool specifying whether to redraw window. 
+            A window redraw can also be set with update.
+        """
+        self.screen.touch('status')
+        self.status_r_str = s
+        if redraw: 
+            self.update()
+
+    def update(self):
+        """Draw whatever has changed since the last update
+        """
+        self.screen.update()
+
+
+    # High precision timer stuff:
+    # CLOCK_MONOTONIC_RAW is not slewed by ntp, so intervals are not stretched 
+    # or shrunk while the clock is being adjusted. It is read through the vdso, 
+    # with no system call, so it is cheap enough to spin on.
+    if hasattr(time, 'CLOCK_MONOTONIC_RAW'): # Linux, macOS
+        def timestamp_ns(self):
+            "return a high-precision timestamp in nanoseconds (ns)"
+            return time.clock_gettime_ns(time.CLOCK_MONOTONIC_RAW)
+    else: # Windows; perf_counter is QueryPerformanceCounter
+        def timestamp_ns(self):
+            "return a high-precision timestamp in nanoseconds (ns)"
+            return time.perf_counter_ns()
+
+    def timestamp_s(self):
+        "return a high-precision timestamp in seconds (sec)"
+        return self.timestamp_ns()*1e-9 #sec 
+
+    def timestamp_us(self):
+        "return a high-precision timestamp in microseconds (us)"
+        return self.timestamp_ns()*1e-3 #us 
+
+    def timestamp_ms(self):
+        "return a high-precision timestamp in milliseconds (ms)"
+        return self.timestamp_ns()*1e-6 #ms 
+
+    # Other timing functions
+    # These sleep until wait_spin_ms before the deadline, and only spin (on 
+    # timestamp_ns) for that last bit, so long waits don't cause a cpu race.
+    def wait_until_ns(self, deadline_ns):
+        """Wait (block) until timestamp_ns() reaches deadline_ns
+
+            Returns the time it woke up (ns). How late that was is added to 
+            the stats in get_wait_stats.
+        """
+        spin_ns = int(self.wait_spin_ms * 1e6)
+        remaining = deadline_ns - self.timestamp_ns()
+        if remaining > spin_ns:
+            # time.sleep uses clock_nanosleep with an absolute deadline where it can
+            time.sleep((remaining - spin_ns) * 1e-9)
+        now = self.timestamp_ns()
+        while now < deadline_ns:
+            now = self.timestamp_ns()
+        late = now - deadline_ns
+        self.wait_n += 1
+        self.wait_late_sum += late
+        self.wait_late_sumsq += late * late
+        self.wait_late_max = max(self.wait_late_max, late)
+        return now
+
+    def wait_ms(self, delay_ms):
+        "Wait (block) for delay_ms milliseconds (ms) using a high-precision timer"
+        self.wait_until_ns(self.timestamp_ns() + int(delay_ms * 1e6))
+        return
+
+    def wait_us(self, delay_us):
+        "Wait (block) for delay_us microseconds (us) using a high-precision timer"
+        self.wait_until_ns(self.timestamp_ns() + int(delay_us * 1e3))
+        return 
+
+    def schedule_ms(self, delay_ms):
+        """Wait (block) until delay_ms milliseconds (ms) after the last scheduled time
+
+            The deadlines are absolute, so lateness doesn't accumulate: after 
+            reset_schedule, four calls to schedule_ms(250) end 1 s after the 
+            reset, however late each of them wakes up. Use it to time the 
+            events of a trial (intervals, isis, etc). If the schedule hasn't 
+            been reset, it starts now.
+        """
+        if self.schedule_ns is None:
+            self.reset_schedule()
+        self.schedule_ns += int(delay_ms * 1e6)
+        self.wait_until_ns(self.schedule_ns)
+        return
+
+    def reset_schedule(self, t_ms=None):
+        """Start the schedule used by schedule_ms at t_ms (a timestamp_ms), or now
+        """
+        if t_ms is None:
+            self.schedule_ns = self.timestamp_ns()
+        else:
+            self.schedule_ns = int(t_ms * 1e6)
+
+    def get_wait_stats(self):
+        """Returns how late the waits have woken up, as a dict of n, and the 
+            mean, sd and max in microseconds (us)
+        """
+        if self.wait_n == 0:
+            return {'n': 0, 'mean_us': None, 'sd_us': None, 'max_us': None}
+        mean = self.wait_late_sum / self.wait_n
+        var = max(self.wait_late_sumsq / self.wait_n - mean * mean, 0)
+        return {'n': self.wait_n, 
+                'mean_us': mean * 1e-3, 
+                'sd_us': math.sqrt(var) * 1e-3, 
+                'max_us': self.wait_late_max * 1e-3,
+               }
+
+    def reset_wait_stats(self):
+        self.wait_n = 0
+        self.wait_late_sum = 0
+        self.wait_late_sumsq = 0
+        self.wait_late_max = 0
@@ -105,7 +105,7 @@
     including xfce4-terminal, gnome-terminal, qterminal, konsole, and 
     xterm. It may require the TERM var to be set for color support:
 
-        env TERM=xterm-256color python3 lateralization.py
+        env TERM=xterm-256color python3 -m gustav.forms.curses.lateralization
 
     It is working well on python 3.x. Much of the rendering is based on unicode 
     which is a mess in py2, and since py2 has reached end-of-life, not much work
@@ -124,101 +124,21 @@
 """
 
 #from __future__ import unicode_literals
-import os, sys
 import curses
-import time
 import math
 
-class Interface():
+from . import base
+from . import render
+
+class Interface(base.Interface):
     def __init__(self):
-        # Initialize text areas
+        base.Interface.__init__(self)
         self.title_l_str = "Gustav Lat!"
-        self.title_c_str = ""
-        self.title_r_str = ""
-        self.notify_l_str = ""
-        self.notify_l_show = False
-        self.notify_r_str = ""
-        self.notify_r_show = False
-        self.notify_pad = True
-        self.notify_offset_v = 2                # Vertical offset of notifications from top of window
         self.status_l_str = ""
         self.status_c_str = "Press '/' to quit"
-        self.status_r_str = ""
-
-        self.keypress_wait = .005 # Sleep time in sec during keypress loop to avoid cpu race
-                                  # Longer values are better for slower machines
-
-        # Some stuff for rendering
-        # Dict so you can specify colors in curses using standard xterm 256-color palette names.
-        self.palette256 = {'Black': 0, 'Maroon': 1, 'Green': 2, 'Olive': 3, 'Navy': 4, 'Purple': 5, 'Teal': 6, 'Silver': 7, 'Grey': 8, 'Red': 9, 'Lime': 10, 'Yellow': 11, 'Blue': 12, 'Fuchsia': 13, 'Aqua': 14, 'White': 15, 'Grey0': 16, 'NavyBlue': 17, 'DarkBlue': 18, 'Blue3': 19, 'Blue3': 20, 'Blue1': 21, 'DarkGreen': 22, 'DeepSkyBlue4': 23, 'DeepSkyBlue4': 24, 'DeepSkyBlue4': 25, 'DodgerBlue3': 26, 'DodgerBlue2': 27, 'Green4': 28, 'SpringGreen4': 29, 'Turquoise4': 30, 'DeepSkyBlue3': 31, 'DeepSkyBlue3': 32, 'DodgerBlue1': 33, 'Green3': 34, 'SpringGreen3': 35, 'DarkCyan': 36, 'LightSeaGreen': 37, 'DeepSkyBlue2': 38, 'DeepSkyBlue1': 39, 'Green3': 40, 'SpringGreen3': 41, 'SpringGreen2': 42, 'Cyan3': 43, 'DarkTurquoise': 44, 'Turquoise2': 45, 'Green1': 46, 'SpringGreen2': 47, 'SpringGreen1': 48, 'MediumSpringGreen': 49, 'Cyan2': 50, 'Cyan1': 51, 'DarkRed': 52, 'DeepPink4': 53, 'Purple4': 54, 'Purple4': 55, 'Purple3': 56, 'BlueViolet': 57, 'Orange4': 58, 'Grey37': 59, 'MediumPurple4': 60, 'SlateBlue3': 61, 'SlateBlue3': 62, 'RoyalBlue1': 63, 'Chartreuse4': 64, 'DarkSeaGreen4': 65, 'PaleTurquoise4': 66, 'SteelBlue': 67, 'SteelBlue3': 68, 'CornflowerBlue': 69, 'Chartreuse3': 70, 'DarkSeaGreen4': 71, 'CadetBlue': 72, 'CadetBlue': 73, 'SkyBlue3': 74, 'SteelBlue1': 75, 'Chartreuse3': 76, 'PaleGreen3': 77, 'SeaGreen3': 78, 'Aquamarine3': 79, 'MediumTurquoise': 80, 'SteelBlue1': 81, 'Chartreuse2': 82, 'SeaGreen2': 83, 'SeaGreen1': 84, 'SeaGreen1': 85, 'Aquamarine1': 86, 'DarkSlateGray2': 87, 'DarkRed': 88, 'DeepPink4': 89, 'DarkMagenta': 90, 'DarkMagenta': 91, 'DarkViolet': 92, 'Purple': 93, 'Orange4': 94, 'LightPink4': 95, 'Plum4': 96, 'MediumPurple3': 97, 'MediumPurple3': 98, 'SlateBlue1': 99, 'Yellow4': 100, 'Wheat4': 101, 'Grey53': 102, 'LightSlateGrey': 103, 'MediumPurple': 104, 'LightSlateBlue': 105, 'Yellow4': 106, 'DarkOliveGreen3': 107, 'DarkSeaGreen': 108, 'LightSkyBlue3': 109, 'LightSkyBlue3': 110, 'SkyBlue2': 111, 'Chartreuse2': 112, 'DarkOliveGreen3': 113, 'PaleGreen3': 114, 'DarkSeaGreen3': 115, 'DarkSlateGray3': 116, 'SkyBlue1': 117, 'Chartreuse1': 118, 'LightGreen': 119, 'LightGreen': 120, 'PaleGreen1': 121, 'Aquamarine1': 122, 'DarkSlateGray1': 123, 'Red3': 124, 'DeepPink4': 125, 'MediumVioletRed': 126, 'Magenta3': 127, 'DarkViolet': 128, 'Purple': 129, 'DarkOrange3': 130, 'IndianRed': 131, 'HotPink3': 132, 'MediumOrchid3': 133, 'MediumOrchid': 134, 'MediumPurple2': 135, 'DarkGoldenrod': 136, 'LightSalmon3': 137, 'RosyBrown': 138, 'Grey63': 139, 'MediumPurple2': 140, 'MediumPurple1': 141, 'Gold3': 142, 'DarkKhaki': 143, 'NavajoWhite3': 144, 'Grey69': 145, 'LightSteelBlue3': 146, 'LightSteelBlue': 147, 'Yellow3': 148, 'DarkOliveGreen3': 149, 'DarkSeaGreen3': 150, 'DarkSeaGreen2': 151, 'LightCyan3': 152, 'LightSkyBlue1': 153, 'GreenYellow': 154, 'DarkOliveGreen2': 155, 'PaleGreen1': 156, 'DarkSeaGreen2': 157, 'DarkSeaGreen1': 158, 'PaleTurquoise1': 159, 'Red3': 160, 'DeepPink3': 161, 'DeepPink3': 162, 'Magenta3': 163, 'Magenta3': 164, 'Magenta2': 165, 'DarkOrange3': 166, 'IndianRed': 167, 'HotPink3': 168, 'HotPink2': 169, 'Orchid': 170, 'MediumOrchid1': 171, 'Orange3': 172, 'LightSalmon3': 173, 'LightPink3': 174, 'Pink3': 175, 'Plum3': 176, 'Violet': 177, 'Gold3': 178, 'LightGoldenrod3': 179, 'Tan': 180, 'MistyRose3': 181, 'Thistle3': 182, 'Plum2': 183, 'Yellow3': 184, 'Khaki3': 185, 'LightGoldenrod2': 186, 'LightYellow3': 187, 'Grey84': 188, 'LightSteelBlue1': 189, 'Yellow2': 190, 'DarkOliveGreen1': 191, 'DarkOliveGreen1': 192, 'DarkSeaGreen1': 193, 'Honeydew2': 194, 'LightCyan1': 195, 'Red1': 196, 'DeepPink2': 197, 'DeepPink1': 198, 'DeepPink1': 199, 'Magenta2': 200, 'Magenta1': 201, 'OrangeRed1': 202, 'IndianRed1': 203, 'IndianRed1': 204, 'HotPink': 205, 'HotPink': 206, 'MediumOrchid1': 207, 'DarkOrange': 208, 'Salmon1': 209, 'LightCoral': 210, 'PaleVioletRed1': 211, 'Orchid2': 212, 'Orchid1': 213, 'Orange1': 214, 'SandyBrown': 215, 'LightSalmon1': 216, 'LightPink1': 217, 'Pink1': 218, 'Plum1': 219, 'Gold1': 220, 'LightGoldenrod2': 221, 'LightGoldenrod2': 222, 'NavajoWhite1': 223, 'MistyRose1': 224, 'Thistle1': 225, 'Yellow1': 226, 'LightGoldenrod1': 227, 'Khaki1': 228, 'Wheat1': 229, 'Cornsilk1': 230, 'Grey100': 231, 'Grey3': 232, 'Grey7': 233, 'Grey11': 234, 'Grey15': 235, 'Grey19': 236, 'Grey23': 237, 'Grey27': 238, 'Grey30': 239, 'Grey35': 240, 'Grey39': 241, 'Grey42': 242, 'Grey46': 243, 'Grey50': 244, 'Grey54': 245, 'Grey58': 246, 'Grey62': 247, 'Grey66': 248, 'Grey70': 249, 'Grey74': 250, 'Grey78': 251, 'Grey82': 252, 'Grey85': 253, 'Grey89': 254, 'Grey93': 255, }
-        # I'm sure there is a better way to do this, but I got tired of looking.
-        self.glyphs = { 'blocks':
-                            {
-                             'block': "█",      # 
-                             'block_hu': "▀",   # half up
-                             'block_hd': "▄",   # half down
-                             'block_hl': "▌",   # half left
-                             'block_hr': "▐",   # half right
-                             'block_qul': "▘",  # quarter upper left
-                             'block_qur': "▝",  # quarter upper right
-                             'block_qll;': "▖", # quarter lower left
-                             'block_qlr': "▗",  # quarter lower right
-                             },
-                        'lines':
-                            {'heavy': 
-                                {'line_h': "━",     # horizontal
-                                 'line_hdd': "╍",   # horizontal dash double
-                                 'line_hdt': "┅",   # horizontal dash triple
-                                 'line_hl': "╸",    # horizontal left
-                                 'line_hr': "╺",    # horizontal right
-                                 'line_v': "┃",     # vertical
-                                 'line_vdd': "╏",   # vertical dash double
-                                 'line_vdt': "┇",   # vertical dash triple
-                                 'line_vu': "╹",    # vertical upper
-                                 'line_vl': "╻",    # vertical lower
-                                 'corner_ul': "┏",  # corner upper left
-                                 'corner_ur': "┓",  # corner upper right
-                                 'corner_ll': "┗",  # corner lower left
-                                 'corner_lr': "┛",  # corner lower right
-                                },
-                           'light':
-                                {'line_h': "─",
-                                 'line_hdd': "╌",
-                                 'line_hdt': "┄",
-                                 'line_hl': "╴",
-                                 'line_hr': "╶",
-                                 'line_v': "│",
-                                 'line_vdd': "╎",
-                                 'line_vdt': "┆",
-                                 'line_vl': "╷",
-                                 'line_vu': "╵",
-                                 'corner_ul': "┌",
-                                 'corner_ur': "┐",
-                                 'corner_ll': "└",
-                                 'corner_lr': "┘",
-                                },
-                           'double':
-                                {'line_h': "═",
-                                 'line_v': "║",
-                                 'corner_ul': "╔",
-                                 'corner_ur': "╗",
-                                 'corner_ll': "╚",
-                                 'corner_lr': "╝",
-                                },
-                            },
-                        }
         # When drawing lines, use either 'heavy' or 'light' weight (see above)
         self.line_weight = 'heavy'
 
-        # Initialize curses stuff
-        self.stdscr = curses.initscr()   # Return a window object representing the entire screen
-        self.stdscr.keypad(True)         # Accept multibyte special keys (eg., curses.KEY_LEFT)
-        self.stdscr.nodelay(True)        # Don't block waiting for input (must then block manually in a while loop)
-        curses.cbreak()                  # Accept keypresses without having to hit enter
-        curses.noecho()                  # Don't automatically echo keypresses to screen
-        curses.curs_set(0)               # Hide the cursor
-        curses.start_color()             # Initialize color
-
         #####################################################################
         ## Begin lateralization-specific stuff
         self.pos = 0                            # Marker position, 0>=1
@@ -340,474 +260,197 @@ class Interface():
                     'vline':         curses.color_pair(17),
                     }
 
+        self.add_widgets()
         self.redraw()
 
 
-    def destroy(self):
-        self.stdscr.nodelay(False)
-        self.stdscr.keypad(False)
-        curses.curs_set(1)
-        curses.echo()
-        curses.nocbreak()
-        curses.endwin()
-
+    def widgets(self):
+        return ([('face', self.layout_face, self.paint_face)] + base.Interface.widgets(self) + 
+                [('posbar', self.layout_posbar, self.paint_posbar)])
 
-    def redraw(self):
-        """Draw entire window
-
-            Called when term is resized, or manually by user
 
+    def place(self):
+        """Center the face, and place the position bar on it. The notify 
+            areas are centered on either side of the position bar
         """
-        self.win_height,self.win_width = self.stdscr.getmaxyx()
-        
-        glyph_lines = self.glyphs['lines'][self.line_weight]
-        glyph_blocks = self.glyphs['blocks']
+        base.Interface.place(self)
 
         # Compute position of face
         if self.win_width > self.face_width:
             # Window is wider than face
-            pad_w = int((self.win_width // 2) - (self.face_width // 2) - self.face_width % 2)   # How much window space to skip to center text
-            len_w = self.face_width                                                             # How much text can fit in window
-            crop_w = 0                                                                          # How much text to skip so it fits
+            self.pad_w = int((self.win_width // 2) - (self.face_width // 2) - self.face_width % 2)   # How much window space to skip to center text
+            self.len_w = self.face_width                                                             # How much text can fit in window
+            self.crop_w = 0                                                                          # How much text to skip so it fits
         else:
             # Face is wider than window
-            pad_w = 0
-            len_w = self.win_width
-            crop_w = int((self.face_width // 2) - (self.win_width // 2) - self.face_width % 2)
+            self.pad_w = 0
+            self.len_w = self.win_width
+            self.crop_w = int((self.face_width // 2) - (self.win_width // 2) - self.face_width % 2)
 
         # Compute vertical align
         if self.win_height > self.face_height:
             # Window is taller than face
-            pad_h = int((self.win_height // 2) - (self.face_height // 2) - self.face_height % 2)
-            len_h = self.face_height
-            crop_h = 0
+            self.pad_h = int((self.win_height // 2) - (self.face_height // 2) - self.face_height % 2)
+            self.len_h = self.face_height
+            self.crop_h = 0
         else:
             # Face is taller than window
-            pad_h = 0
-            len_h = self.win_height
-            crop_h = int((self.face_height // 2) - (self.win_height // 2) - (self.face_height % 2))
-
-        self.stdscr.erase()
-
-        # Draw face
-        for ii in range(len_h):
-            face_line = self.face_lines[crop_h + ii]
-            cropped_face_line = face_line[crop_w:crop_w+len_w]
-            self.stdscr.addstr(pad_h + ii, pad_w, cropped_face_line.encode("utf-8"), self.cp['face'])
-            if self.vline_show:
-                self.stdscr.addstr(pad_h + ii, int(self.win_width//2)-1, glyph_lines['line_vdd'], self.cp['vline'])
+            self.pad_h = 0
+            self.len_h = self.win_height
+            self.crop_h = int((self.face_height // 2) - (self.win_height // 2) - (self.face_height % 2))
 
         # Compute position and dimensions of position bar
-        self.posbar_x1 = pad_w+1
-        self.posbar_x2 = pad_w+len_w-2
+        self.posbar_x1 = self.pad_w+1
+        self.posbar_x2 = self.pad_w+self.len_w-2
         self.posbar_w = self.posbar_x2 - self.posbar_x1
-        self.w_pos_y = pad_h + self.posbar_offset_v
-
-        # Upper Left Notify
-        if self.notify_l_show:
-            lines = self.notify_l_str.split("\n")
-            ii = max(pad_h + self.notify_offset_v, (self.win_height // 10)) # self.notify_offset_v  # Terminal line to start at
-            adj = 0                    # used to adjust if any lines are off the terminal window
-            w = 0                      # holds the width of the window
-            for line in lines:
-                # Check if any lines are off window after centering, adjust if they are
-                x = int((self.posbar_x1 // 2) - (len(line) // 2) - len(line) % 2)
-                adj = min(x, adj)
-                w = max(len(line), w)
-            if self.notify_pad:
-                # Vertical pad with half-down blocks across top of window
-                this_line = glyph_blocks['block_hd'] * (w+2)
-                x = int((self.posbar_x1 // 2) - (len(this_line) // 2) - len(this_line) % 2) - adj
-                x = max(x, 1)
-                self.stdscr.addstr(ii, x, this_line, self.cp['notify_ul_pad'])
-                # we have padded top, so start text 1 line down
-                ii += 1
-            for line in lines:
-                # Pad shorter lines so window is a nice rectangle
-                pad = w - len(line)
-                this_line = (" " * (pad // 2)) + line + (" " * ((pad // 2) + (pad % 2)))
-                if self.notify_pad:
-                    # Horizontal pad with a space at beginning and end of each line
-                    this_line = " " + this_line + " "
-                x = int((self.posbar_x1 // 2) - (len(this_line) // 2) - len(this_line) % 2) - adj
-                x = max(x, 1)
-                self.stdscr.addstr(ii, x, this_line, self.cp['notify_ul'] | curses.A_BOLD)
-                ii += 1
-            if self.notify_pad:
-                # Vertical pad with half-up blocks across bottom of window
-                this_line = glyph_blocks['block_hu'] * (w+2)
-                x = int((self.posbar_x1 // 2) - (len(this_line) // 2) - len(this_line) % 2) - adj
-                x = max(x, 1)
-                self.stdscr.addstr(ii, x, this_line, self.cp['notify_ul_pad'])
-
-        # Upper Right Notify
-        if self.notify_r_show:
-            lines = self.notify_r_str.split("\n")
-            ii = max(pad_h + self.notify_offset_v, (self.win_height // 10)) # self.notify_offset_v  # Terminal line to start at
-            adj = 0
-            w = 0
-            for line in lines:
-                x = (self.posbar_x2+1) + (int(( (self.win_width - self.posbar_x2) // 2) - (len(line) // 2) - len(line) % 2) )
-                adj = min(self.win_width - (x + len(line)), adj)
-                w = max(len(line), w)
-            if self.notify_pad:
-                this_line = glyph_blocks['block_hd'] * (w+2)
-                x = (self.posbar_x2+1) + (int(( (self.win_width - self.posbar_x2) // 2) - (len(this_line) // 2) - len(this_line) % 2) ) - adj
-                x = min(x, self.win_width - len(this_line)-1)
-                self.stdscr.addstr(ii, x, this_line, self.cp['notify_ur_pad'])
-                ii += 1
-            for line in lines:
-                pad = w - len(line)
-                this_line = (" " * (pad // 2)) + line + (" " * ((pad // 2) + (pad % 2)))
-                if self.notify_pad:
-                    this_line = " " + this_line + " "
-                x = (self.posbar_x2 + 1) + (int(( (self.win_width - self.posbar_x2) // 2) - (len(this_line) // 2) - len(this_line) % 2) ) - adj
-                x = min(x, self.win_width-len(this_line)-1)
-                self.stdscr.addstr(ii, x, this_line, self.cp['notify_ur'] | curses.A_BOLD)
-                ii += 1
-            if self.notify_pad:
-                this_line = glyph_blocks['block_hu'] * (w+2)
-                x = (self.posbar_x2 + 1) + (int(( (self.win_width - self.posbar_x2) // 2) - (len(this_line) // 2) - len(this_line) % 2) ) - adj
-                x = min(x, self.win_width - len(this_line) - 1)
-                self.stdscr.addstr(ii, x, this_line, self.cp['notify_ur_pad'])
-
-        # Lower left and right notifies are not implemented as they seem a bit overkill
-
-        # Border
-        self.stdscr.attron(self.cp['default'])
-        self.stdscr.box()
-        self.stdscr.attroff(self.cp['default'])
-
-        # Title bar
-        self.stdscr.addstr(0, 1, " " * (self.win_width-2), self.cp['title'])
-        if self.title_l_str:
-            self.stdscr.addstr(0, 1, self.title_l_str, curses.A_BOLD | self.cp['title'])
-        if self.title_c_str:
-            x = int((self.win_width // 2) - (len(self.title_c_str) // 2) - len(self.title_c_str) % 2) -1
-            self.stdscr.addstr(0, x, self.title_c_str, curses.A_BOLD | self.cp['title'])
-        if self.title_r_str:
-            x = self.win_width - len(self.title_r_str) - 1
-            self.stdscr.addstr(0, x, self.title_r_str, curses.A_BOLD | self.cp['title'])
-
-        # Status bar
-        self.stdscr.addstr(self.win_height-1, 1, " " * (self.win_width-2), self.cp['status'])
-        if self.status_l_str:
-            self.stdscr.addstr(self.win_height-1, 1, self.status_l_str, self.cp['status'])
-        if self.status_c_str:
-            x = int((self.win_width // 2) - (len(self.status_c_str) // 2) - len(self.status_c_str) % 2) -1
-            self.stdscr.addstr(self.win_height-1, x, self.status_c_str, self.cp['status'])
-        if self.status_r_str:
-            x = self.win_width - len(self.status_r_str) - 1
-            self.stdscr.addstr(self.win_height-1, x, self.status_r_str, self.cp['status'])
-
-
-        # The position bar and marker
-        if self.posbar_show:
-            self.stdscr.attron(curses.color_pair(5))
-            self.stdscr.addstr(pad_h+self.posbar_offset_v,   self.posbar_x1,   glyph_lines['line_h'] * (self.posbar_w+1), self.cp['posbar_m-d-'])
-            self.stdscr.addstr(pad_h+self.posbar_offset_v+1, self.posbar_x1,   glyph_lines['line_h'] * (self.posbar_w+1), self.cp['posbar_m-d-'])
-            self.stdscr.addstr(pad_h+self.posbar_offset_v,   self.posbar_x1-1, glyph_lines['corner_ul'],                  self.cp['posbar_m-d-'])
-            self.stdscr.addstr(pad_h+self.posbar_offset_v,   self.posbar_x2+1, glyph_lines['corner_ur'],                  self.cp['posbar_m-d-'])
-            self.stdscr.addstr(pad_h+self.posbar_offset_v+1, self.posbar_x1-1, glyph_lines['corner_ll'],                  self.cp['posbar_m-d-'])
-            self.stdscr.addstr(pad_h+self.posbar_offset_v+1, self.posbar_x2+1, glyph_lines['corner_lr'],                  self.cp['posbar_m-d-'])
-
-            if self.marker_show:
-                if self.marker_interp is not None:
-                    if self.marker_interp:
-                        interp = .5
-                    else:
-                        interp = 1.
-                else:
-                    if self.diffuse == 0:
-                        interp = .5
-                    else:
-                        interp = 1.
-
-                # Compute positions
-                x = self.round_to(self.posbar_x1 + (self.pos * self.posbar_w), interp)
-                x = max(x,self.posbar_x1)
-                x = min(x,self.posbar_x2)
-
-                # Diffuse area cannot be interpolated because of limitations with char rendering; specifically, 
-                # there is only a fg and a bg, so only 2 things can be rendered in a char position. Here, interp
-                # would mean that there would be three things to render in a char position: typical bg, diffuse 
-                # bg, and the posbar
-                diffuse = self.round_to(int(self.diffuse * self.posbar_w), 1.)
-                diffuse_lo = x - diffuse
-                diffuse_lo = int(max(diffuse_lo,self.posbar_x1))
-                diffuse_lo = int(min(diffuse_lo,self.posbar_x2))
-
-                diffuse_hi = x + diffuse
-                diffuse_hi = int(max(diffuse_hi,self.posbar_x1))
-                diffuse_hi = int(min(diffuse_hi,self.posbar_x2))
-                # Account for marker
-                if diffuse > 0: diffuse_hi += 1
-
-                diffuse_w = diffuse_hi-diffuse_lo
-
-                # Draw Diffuse area if present
-                if diffuse > 0: 
-                    # There is diffuse area. draw it, and assign marker colors: +marker, +diffuse
-                    self.stdscr.addstr(pad_h+self.posbar_offset_v,   diffuse_lo, glyph_lines['line_h'] * diffuse_w, self.cp['posbar_m-d+'])
-                    self.stdscr.addstr(pad_h+self.posbar_offset_v+1, diffuse_lo, glyph_lines['line_h'] * diffuse_w, self.cp['posbar_m-d+'])
-                    # Marker will be drawn on top of diffuse field, use +Marker +Diffuse
-                    marker_fmt = self.cp['posbar_m+d+']
-                else:
-                    # Marker will not be drawn on top of diffuse field, use +Marker -Diffuse
-                    marker_fmt = self.cp['posbar_m+d-']
-
-                # Draw marker
-                # Determine whether marker position is a whole number (single-char), or half (two-char)
-                this_x = int(math.floor(x)) # Get char position or marker1
-                if (interp == 1.) or (x*2 % 2) == 0:
-                    # Use whole-char marker
-                    self.stdscr.addstr(self.w_pos_y, this_x, glyph_blocks['block'], marker_fmt)
-                    self.stdscr.addstr(self.w_pos_y+1, this_x, glyph_blocks['block'], marker_fmt)
-                    # When showing the 2-char (interpolated) marker, the horiz lines of the  
-                    # pos bar disappear for 1/2 char on either side. Here, we recreate that 
-                    # for the 1-char marker, by drawing half horizontal lines on either  
-                    # side. Also handle when marker is at either end of pos bar.
-                    if (x == self.posbar_x1):
-                        edge_lu = glyph_lines['line_vl']
-                        edge_ld = glyph_lines['line_vu']
-                        edge_ru = glyph_lines['line_hr']
-                        edge_rd = glyph_lines['line_hr']
-                    elif (x == self.posbar_x2):
-                        edge_lu = glyph_lines['line_hl']
-                        edge_ld = glyph_lines['line_hl']
-                        edge_ru = glyph_lines['line_vl']
-                        edge_rd = glyph_lines['line_vu']
-                    else: 
-                        edge_lu = glyph_lines['line_hl']
-                        edge_ld = glyph_lines['line_hl']
-                        edge_ru = glyph_lines['line_hr']
-                        edge_rd = glyph_lines['line_hr']
-
-                    if (x > self.posbar_x1) and (diffuse_lo < x):
-                        # There is diffuse area and marker is not at lower edge. Use diffuse bg
-                        self.stdscr.addstr(self.w_pos_y,   this_x-1, edge_lu, self.cp['posbar_m-d+'])
-                        self.stdscr.addstr(self.w_pos_y+1, this_x-1, edge_ld, self.cp['posbar_m-d+'])
-                    else:
-                        # Either no diffuse area or marker is at lower edge. Either way use standard bg
-                        self.stdscr.addstr(self.w_pos_y,   this_x-1, edge_lu, self.cp['posbar_m-d-'])
-                        self.stdscr.addstr(self.w_pos_y+1, this_x-1, edge_ld, self.cp['posbar_m-d-'])
-
-                    if (x < self.posbar_x2) and (diffuse_hi > x):
-                        # There is diffuse area and marker is not at upper edge. Use diffuse bg
-                        self.stdscr.addstr(self.w_pos_y,   this_x+1, edge_ru, self.cp['posbar_m-d+'])
-                        self.stdscr.addstr(self.w_pos_y+1, this_x+1, edge_rd, self.cp['posbar_m-d+'])
-                    else:
-                        # Either no diffuse area or marker is at upper edge. Either way use standard bg
-                        self.stdscr.addstr(self.w_pos_y,   this_x+1, edge_ru, self.cp['posbar_m-d-'])
-                        self.stdscr.addstr(self.w_pos_y+1, this_x+1, edge_rd, self.cp['posbar_m-d-'])
-                else:
-                    # It is x.5; using half-char markers
-                    self.stdscr.addstr(self.w_pos_y,   this_x, glyph_blocks['block_hr'], marker_fmt)
-                    self.stdscr.addstr(self.w_pos_y+1, this_x, glyph_blocks['block_hr'], marker_fmt)
-                    if this_x+1 <= self.posbar_x2:
-                        self.stdscr.addstr(self.w_pos_y,   this_x+1, glyph_blocks['block_hl'], marker_fmt)
-                        self.stdscr.addstr(self.w_pos_y+1, this_x+1, glyph_blocks['block_hl'], marker_fmt)
+        self.w_pos_y = self.pad_h + self.posbar_offset_v
 
-        self.stdscr.refresh()
+        # The border, title and status bars are drawn over the face if it doesn't fit
+        y1, x1 = max(self.pad_h, 1), max(self.pad_w, 1)
+        y2 = min(self.pad_h + self.len_h, self.win_height - 1)
+        x2 = min(self.pad_w + self.len_w, self.win_width - 1)
+        self.face_rect = (y1, x1, y2 - y1, x2 - x1)
 
+        self.notify_y = max(self.pad_h + self.notify_offset_v, (self.win_height // 10)) # Terminal line to start at
+        self.notify_x1 = self.posbar_x1
+        self.notify_x2 = self.posbar_x2
 
-    def rectangle(self, win, uly, ulx, lry, lrx):
-        """Draw a rectangle with corners at the provided upper-left
-            and lower-right coordinates.
 
-            This is not used ATM, the rect for the posbar is drawn by hand to 
-            allow more control over style
+    def layout_face(self):
+        return self.face_rect
 
-            https://stackoverflow.com/questions/52804155/extending-curses-rectangle-box-to-edge-of-terminal-in-python
-        """
-        win.vline(uly+1, ulx, curses.ACS_VLINE, lry - uly - 1)
-        win.hline(uly, ulx+1, curses.ACS_HLINE, lrx - ulx - 1)
-        win.hline(lry, ulx+1, curses.ACS_HLINE, lrx - ulx - 1)
-        win.vline(uly+1, lrx, curses.ACS_VLINE, lry - uly - 1)
-        win.addch(uly, ulx, curses.ACS_ULCORNER)
-        win.addch(uly, lrx, curses.ACS_URCORNER)
-        win.addch(lry, lrx, curses.ACS_LRCORNER)
-        win.addch(lry, ulx, curses.ACS_LLCORNER)
-
-
-    def round_to(self, x, base):
-        """Rounds x to the nearest base, which can be any float
-        """
-        recip = 1/float(base)
-        return round(x * recip) / recip
-
-
-    #########################################################################
-    ## USER FACING FUNCTIONS BELOW
+    def paint_face(self, win):
+        glyph_lines = self.glyphs['lines'][self.line_weight]
+        y0, x0 = self.face_rect[:2]
+        for ii in range(self.len_h):
+            face_line = self.face_lines[self.crop_h + ii]
+            cropped_face_line = face_line[self.crop_w:self.crop_w+self.len_w]
+            render.put(win, self.pad_h + ii - y0, self.pad_w - x0, cropped_face_line, self.cp['face'])
+            if self.vline_show:
+                render.put(win, self.pad_h + ii - y0, int(self.win_width//2)-1 - x0, glyph_lines['line_vdd'], self.cp['vline'])
 
-    def get_resp(self, timeout=None):
-        """Wait modally for a keypress, returns the key as a char. 
-            If you want to evaluate arrow keys etc, use ord:
 
-                ret = get_resp()
-                if ord(ret) == curses.KEY_LEFT:
-                    # do something to the left
+    def layout_posbar(self):
+        if not self.posbar_show:
+            return None
+        return (self.w_pos_y, self.posbar_x1-1, 2, self.posbar_w+3)
 
-            If timeout is None, then block. If it is a float, wait at 
-            least that many seconds, return None if no input.
+    def paint_posbar(self, win):
+        """The position bar and marker
         """
-
-        try:
-            key = curses.ERR
-            waiting = True
-            timeout_start = time.time()
-            # Debugging:
-            #loops = 0
-            self.stdscr.timeout(10)
-            curses.flushinp()
-            while waiting:
-                key = self.stdscr.getch()
-                if key == curses.ERR: # Default wait response from curses; keep waiting
-                    if (timeout is not None) and (time.time() >= timeout_start + timeout):
-                        ret = None
-                        waiting = False
-                    time.sleep(self.keypress_wait) # Avoid cpu race while looping
-                elif key == curses.KEY_RESIZE:
-                    self.redraw()
+        glyph_lines = self.glyphs['lines'][self.line_weight]
+        glyph_blocks = self.glyphs['blocks']
+        def put(y, x, s, attr):
+            # The marker math is in screen coordinates
+            render.put(win, y - self.w_pos_y, x - (self.posbar_x1-1), s, attr)
+
+        put(self.w_pos_y,   self.posbar_x1,   glyph_lines['line_h'] * (self.posbar_w+1), self.cp['posbar_m-d-'])
+        put(self.w_pos_y+1, self.posbar_x1,   glyph_lines['line_h'] * (self.posbar_w+1), self.cp['posbar_m-d-'])
+        put(self.w_pos_y,   self.posbar_x1-1, glyph_lines['corner_ul'],                  self.cp['posbar_m-d-'])
+        put(self.w_pos_y,   self.posbar_x2+1, glyph_lines['corner_ur'],                  self.cp['posbar_m-d-'])
+        put(self.w_pos_y+1, self.posbar_x1-1, glyph_lines['corner_ll'],                  self.cp['posbar_m-d-'])
+        put(self.w_pos_y+1, self.posbar_x2+1, glyph_lines['corner_lr'],                  self.cp['posbar_m-d-'])
+
+        if self.marker_show:
+            if self.marker_interp is not None:
+                if self.marker_interp:
+                    interp = .5
                 else:
-                    # Something else: return key as char and let user evaluate
-                    ret = chr(key)
-                    waiting = False
-                #loops += 1
-                #self.update_Title_Left("Interface Loops: {:}".format(loops), redraw=True)
-            return ret
-
-        except:
-            self.destroy()
-            raise Exception("Error getting input")
-    
-    def update_Title_Left(self, s, redraw=False):
-        """Update the text on the left side of the title bar
-
-            redraw is a bool specifying whether to redraw window. 
-            A window redraw can also be set with update.
-        """
-        self.title_l_str = s
-        if redraw: 
-            self.redraw()
-
-    def update_Title_Center(self, s, redraw=False):
-        """Update the text in the center of the title bar
-
-            redraw is a bool specifying whether to redraw window. 
-            A window redraw can also be set with update.
-        """
-        self.title_c_str = s
-        if redraw: 
-            self.redraw()
-
-    def update_Title_Right(self, s, redraw=False):
-        """Update the text on the right side of the title bar
-
-            redraw is a bool specifying whether to redraw window. 
-            A window redraw can also be set with update.
-        """
-        self.title_r_str = s
-        if redraw: 
-            self.redraw()
-
-    def update_Notify_Left(self, s, show=None, redraw=False):
-        """Update the notify text to the left of the face.
-
-            show is a bool specifying whether to show the text,
-            set to None to leave this param unchanged [default].
-            show can also be set with show_Notify_Left.
-
-            redraw is a bool specifying whether to redraw window. 
-            A window redraw can also be set with update.
-        """
-        self.notify_l_str = s
-        if show is not None:
-            self.notify_l_show = show
-        if redraw: 
-            self.redraw()
-
-    def update_Notify_Right(self, s, show=None, redraw=False):
-        """Update the notify text to the left of the face.
-
-            show is a bool specifying whether to show the text,
-            set to None to leave this param unchanged [default].
-            show can also be set with show_Notify_Left.
-
-            redraw is a bool specifying whether to redraw window. 
-            A window redraw can also be set with update.
-        """
-        self.notify_r_str = s
-        if show is not None:
-            self.notify_r_show = show
-        if redraw: 
-            self.redraw()
-
-    def show_Notify_Left(self, show=None, redraw=True):
-        """Show the left notify text
-
-            If show==None, toggle. Otherwise show should be a bool.
-
-            redraw is a bool specifying whether to redraw window. 
-            A window redraw can also be set with update.
-        """        
-        if show is not None:
-            self.notify_l_show = show
-        else:
-            self.notify_l_show = not self.notify_l_show
-
-        if redraw: 
-            self.redraw()
-
-    def show_Notify_Right(self, show=None, redraw=True):
-        """Show the right notify text
-
-            If show==None, toggle. Otherwise show should be a bool.
-
-            redraw is a bool specifying whether to redraw window. 
-            A window redraw can also be set with update.
-        """        
-
-        if show is not None:
-            self.notify_r_show = show
-        else:
-            self.notify_r_show = not self.notify_r_show
-
-        if redraw: 
-            self.redraw()
-
-    def update_Status_Left(self, s, redraw=False):
-        """Update the text on the left side of the status bar
-
-            redraw is a bool specifying whether to redraw window. 
-            A window redraw can also be set with update.
-        """
-        self.status_l_str = s
-        if redraw: 
-            self.redraw()
-
-    def update_Status_Center(self, s, redraw=False):
-        """Update the text in the center of the status bar
-
-            redraw is a bool specifying whether to redraw window. 
-            A window redraw can also be set with update.
-        """
-        self.status_c_str = s
-        if redraw: 
-            self.redraw()
-
-    def update_Status_Right(self, s, redraw=False):
-        """Update the text on the right side of the status bar
+                    interp = 1.
+            else:
+                if self.diffuse == 0:
+                    interp = .5
+                else:
+                    interp = 1.
+
+            # Compute positions
+            x = self.round_to(self.posbar_x1 + (self.pos * self.posbar_w), interp)
+            x = max(x,self.posbar_x1)
+            x = min(x,self.posbar_x2)
+
+            # Diffuse area cannot be interpolated because of limitations with char rendering; specifically, 
+            # there is only a fg and a bg, so only 2 things can be rendered in a char position. Here, interp
+            # would mean that there would be three things to render in a char position: typical bg, diffuse 
+            # bg, and the posbar
+            diffuse = self.round_to(int(self.diffuse * self.posbar_w), 1.)
+            diffuse_lo = x - diffuse
+            diffuse_lo = int(max(diffuse_lo,self.posbar_x1))
+            diffuse_lo = int(min(diffuse_lo,self.posbar_x2))
+
+            diffuse_hi = x + diffuse
+            diffuse_hi = int(max(diffuse_hi,self.posbar_x1))
+            diffuse_hi = int(min(diffuse_hi,self.posbar_x2))
+            # Account for marker
+            if diffuse > 0: diffuse_hi += 1
+
+            diffuse_w = diffuse_hi-diffuse_lo
+
+            # Draw Diffuse area if present
+            if diffuse > 0: 
+                # There is diffuse area. draw it, and assign marker colors: +marker, +diffuse
+                put(self.w_pos_y,   diffuse_lo, glyph_lines['line_h'] * diffuse_w, self.cp['posbar_m-d+'])
+                put(self.w_pos_y+1, diffuse_lo, glyph_lines['line_h'] * diffuse_w, self.cp['posbar_m-d+'])
+                # Marker will be drawn on top of diffuse field, use +Marker +Diffuse
+                marker_fmt = self.cp['posbar_m+d+']
+            else:
+                # Marker will not be drawn on top of diffuse field, use +Marker -Diffuse
+                marker_fmt = self.cp['posbar_m+d-']
+
+            # Draw marker
+            # Determine whether marker position is a whole number (single-char), or half (two-char)
+            this_x = int(math.floor(x)) # Get char position or marker1
+            if (interp == 1.) or (x*2 % 2) == 0:
+                # Use whole-char marker
+                put(self.w_pos_y, this_x, glyph_blocks['block'], marker_fmt)
+                put(self.w_pos_y+1, this_x, glyph_blocks['block'], marker_fmt)
+                # When showing the 2-char (interpolated) marker, the horiz lines of the  
+                # pos bar disappear for 1/2 char on either side. Here, we recreate that 
+                # for the 1-char marker, by drawing half horizontal lines on either  
+                # side. Also handle when marker is at either end of pos bar.
+                if (x == self.posbar_x1):
+                    edge_lu = glyph_lines['line_vl']
+                    edge_ld = glyph_lines['line_vu']
+                    edge_ru = glyph_lines['line_hr']
+                    edge_rd = glyph_lines['line_hr']
+                elif (x == self.posbar_x2):
+                    edge_lu = glyph_lines['line_hl']
+                    edge_ld = glyph_lines['line_hl']
+                    edge_ru = glyph_lines['line_vl']
+                    edge_rd = glyph_lines['line_vu']
+                else: 
+                    edge_lu = glyph_lines['line_hl']
+                    edge_ld = glyph_lines['line_hl']
+                    edge_ru = glyph_lines['line_hr']
+                    edge_rd = glyph_lines['line_hr']
+
+                if (x > self.posbar_x1) and (diffuse_lo < x):
+                    # There is diffuse area and marker is not at lower edge. Use diffuse bg
+                    put(self.w_pos_y,   this_x-1, edge_lu, self.cp['posbar_m-d+'])
+                    put(self.w_pos_y+1, this_x-1, edge_ld, self.cp['posbar_m-d+'])
+                else:
+                    # Either no diffuse area or marker is at lower edge. Either way use standard bg
+                    put(self.w_pos_y,   this_x-1, edge_lu, self.cp['posbar_m-d-'])
+                    put(self.w_pos_y+1, this_x-1, edge_ld, self.cp['posbar_m-d-'])
+
+                if (x < self.posbar_x2) and (diffuse_hi > x):
+                    # There is diffuse area and marker is not at upper edge. Use diffuse bg
+                    put(self.w_pos_y,   this_x+1, edge_ru, self.cp['posbar_m-d+'])
+                    put(self.w_pos_y+1, this_x+1, edge_rd, self.cp['posbar_m-d+'])
+                else:
+                    # Either no diffuse area or marker is at upper edge. Either way use standard bg
+                    put(self.w_pos_y,   this_x+1, edge_ru, self.cp['posbar_m-d-'])
+                    put(self.w_pos_y+1, this_x+1, edge_rd, self.cp['posbar_m-d-'])
+            else:
+                # It is x.5; using half-char markers
+                put(self.w_pos_y,   this_x, glyph_blocks['block_hr'], marker_fmt)
+                put(self.w_pos_y+1, this_x, glyph_blocks['block_hr'], marker_fmt)
+                if this_x+1 <= self.posbar_x2:
+                    put(self.w_pos_y,   this_x+1, glyph_blocks['block_hl'], marker_fmt)
+                    put(self.w_pos_y+1, this_x+1, glyph_blocks['block_hl'], marker_fmt)
 
-            redraw is a bool specifying whether to redraw window. 
-            A window redraw can also be set with update.
-        """
-        self.status_r_str = s
-        if redraw: 
-            self.redraw()
 
-    def update(self):
-        self.redraw()
+    #########################################################################
+    ## USER FACING FUNCTIONS BELOW
 
     ## Lateralization-specific user functions
 
@@ -837,6 +480,7 @@ class Interface():
             be updated as well.
 
         """
+        self.screen.touch('posbar')
 
         if pos is None:
             if chars:
@@ -861,7 +505,7 @@ class Interface():
 
         # If marker is shown, then a redraw is assumed, even if it wasn't specified
         if redraw | self.marker_show:
-            self.redraw()
+            self.update()
 
     def get_Marker_Pos(self):
         """Return the current marker position, which will be 0<=1.
@@ -882,13 +526,14 @@ class Interface():
             redraw is a bool specifying whether to redraw window. 
             A window redraw can also be set with update.
         """        
+        self.screen.touch('posbar')
         if show is not None:
             self.posbar_show = show
-            self.redraw()
+            self.update()
         else:
             self.posbar_show = not self.posbar_show
             if redraw: 
-                self.redraw()
+                self.update()
 
     def show_Marker(self, show=None, redraw=True):
         """Show the lateral position marker
@@ -899,14 +544,15 @@ class Interface():
             redraw is a bool specifying whether to redraw window. 
             A window redraw can also be set with update.
         """
+        self.screen.touch('posbar')
 
         if show is not None:
             self.marker_show = show
-            self.redraw()
+            self.update()
         else:
             self.marker_show = not self.marker_show
             if redraw: 
-                self.redraw()
+                self.update()
 
     def show_VLine(self, show=None, redraw=True):
         """Show the vertical line indicating the midsagittal plane
@@ -917,14 +563,15 @@ class Interface():
             redraw is a bool specifying whether to redraw window. 
             A window redraw can also be set with update.
         """
+        self.screen.touch('face')
 
         if show is not None:
             self.vline_show = show
-            self.redraw()
+            self.update()
         else:
             self.vline_show = not self.vline_show
             if redraw: 
-                self.redraw()
+                self.update()
 
 
 if __name__ == "__main__":
@@ -987,6 +634,7 @@ if __name__ == "__main__":
                 interface.marker_interp = False
             else:
                 interface.marker_interp = True
+            interface.screen.touch('posbar')
             interface.update_Status_Right("Marker interp: {:}".format(interface.marker_interp), redraw=True)
         elif ord(key) == curses.KEY_LEFT:
             # Move marker to the left
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2010-2020 Christopher Brown
+#
+# This file is part of gustav.
+#
+# gustav is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# gustav is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gustav.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Comments and/or additions are welcome. Send e-mail to: cbrown1@pitt.edu.
+#
+
+""" Incremental rendering for the curses forms
+
+    The screen is split into widgets (a button, a notify area, the title
+    bar, etc). Each widget has its own curses subwindow, and is only drawn
+    when something about it changes. When a form changes the text of the
+    status bar, say, it marks the status bar as dirty:
+
+        self.screen.touch('status')
+
+    ...and on the next update only the dirty widgets are erased and drawn,
+    each is copied to the virtual screen with noutrefresh, and the terminal
+    is written once, with doupdate:
+
+        self.screen.update()
+
+    So a feedback flash on one button only sends that button to the
+    terminal. The whole screen is only cleared and drawn by repaint, which
+    is needed when the terminal is resized (KEY_RESIZE).
+
+    A widget is two functions: layout, which returns where it goes on the
+    screen (y, x, height, width), or None if it is hidden, and paint, which
+    draws it into its window, with 0,0 at the upper left of the widget. When
+    a widget moves or is hidden, the area it leaves is cleared, and any
+    widgets it overlapped are drawn again.
+"""
+
+import curses
+import functools
+import threading
+import collections
+
+
+def put(win, y, x, s, attr=0):
+    """Write s to win at y,x, clipped to the window
+
+        curses raises an error after writing the last cell of a window
+        (the cursor can't move past it), even though the write succeeded.
+        That is ignored, as is anything that falls outside of the window.
+    """
+    h, w = win.getmaxyx()
+    if y < 0 or y >= h or x >= w or not s:
+        return
+    if x < 0:
+        s = s[-x:]
+        x = 0
+    try:
+        win.addstr(y, x, s[:w-x], attr)
+    except curses.error:
+        pass
+
+
+def bar(win, left, center, right, attr, bold=False):
+    """Draws a one-line bar (the title or status bar) with text on the left, center and right
+
+        The window is assumed to start one column in from the edge of the
+        screen, as the bars do.
+    """
+    h, w = win.getmaxyx()
+    text_attr = attr | curses.A_BOLD if bold else attr
+    put(win, 0, 0, " " * w, attr)
+    if left:
+        put(win, 0, 0, left, text_attr)
+    if center:
+        put(win, 0, ((w+2) // 2) - (len(center) // 2) - len(center) % 2 - 2, center, text_attr)
+    if right:
+        put(win, 0, w - len(right), right, text_attr)
+
+
+@functools.lru_cache(maxsize=64)
+def prompt_lines(s):
+    """Returns the lines of a prompt, and the width of the longest
+    """
+    lines = tuple(s.strip("\n").split("\n"))
+    return lines, max(len(line) for line in lines)
+
+
+@functools.lru_cache(maxsize=64)
+def notify_lines(s, pad):
+    """Returns the lines of a notify area, centered and padded to a rectangle, and the width of the text
+
+        Cached, as text is split and padded each time a notify area is
+        placed or drawn, but only changes when the form is given new text.
+    """
+    lines = s.split("\n")
+    w = max(len(line) for line in lines)
+    rect = []
+    for line in lines:
+        # Pad shorter lines so window is a nice rectangle
+        n = w - len(line)
+        this_line = (" " * (n // 2)) + line + (" " * ((n // 2) + (n % 2)))
+        if pad:
+            # Horizontal pad with a space at beginning and end of each line
+            this_line = " " + this_line + " "
+        rect.append(this_line)
+    return tuple(rect), w
+
+
+def notify_left(lines, w, y, x2, pad):
+    """Returns the rect of a notify area centered between the left edge of the screen and x2
+
+        lines and w are from notify_lines. y is the terminal line to start at.
+    """
+    # Adjust if the longest line would be off the terminal window after centering
+    adj = min(int((x2 // 2) - (w // 2) - w % 2), 0)
+    this_w = len(lines[0])
+    x = int((x2 // 2) - (this_w // 2) - this_w % 2) - adj
+    x = max(x, 1)
+    return (y, x, len(lines) + (2 if pad else 0), this_w)
+
+
+def notify_right(lines, w, y, x1, win_width, pad):
+    """Returns the rect of a notify area centered between x1 and the right edge of the screen
+    """
+    x = (x1+1) + (int(( (win_width - x1) // 2) - (w // 2) - w % 2) )
+    adj = min(win_width - (x + w), 0)
+    this_w = len(lines[0])
+    x = (x1 + 1) + (int(( (win_width - x1) // 2) - (this_w // 2) - this_w % 2) ) - adj
+    x = min(x, win_width - this_w - 1)
+    return (y, x, len(lines) + (2 if pad else 0), this_w)
+
+
+def paint_notify(win, lines, pad, glyphs, attr, pad_attr):
+    """Draws a notify area, with half blocks above and below if pad
+    """
+    h, w = win.getmaxyx()
+    y = 0
+    if pad:
+        put(win, y, 0, glyphs['block_hd'] * w, pad_attr)
+        y += 1
+    for line in lines:
+        put(win, y, 0, line, attr | curses.A_BOLD)
+        y += 1
+    if pad:
+        put(win, y, 0, glyphs['block_hu'] * w, pad_attr)
+
+
+def overlaps(a, b):
+    if a is None or b is None:
+        return False
+    return (a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and
+            a[1] < b[1] + b[3] and b[1] < a[1] + a[3])
+
+
+class Widget(object):
+    """A part of the screen with its own window, drawn only when dirty
+    """
+    def __init__(self, name, layout, paint):
+        self.name = name
+        self.layout = layout
+        self.paint = paint
+        self.rect = None
+        self.win = None
+        self.dirty = True
+
+    def __repr__(self):
+        return f"Widget {self.name} at {self.rect}{' (dirty)' if self.dirty else ''}"
+
+
+class Screen(object):
+    """The widgets of a form, in the order they are drawn
+
+        background is called with stdscr on a repaint, before the widgets
+        are drawn, to draw whatever is not a widget (eg., the border), and
+        to note the new terminal size.
+    """
+    def __init__(self, stdscr, background=None):
+        self.stdscr = stdscr
+        self.background = background
+        self.widgets = collections.OrderedDict()
+        self.size = None
+        self.lock = threading.RLock()
+
+    def add(self, name, layout, paint):
+        self.widgets[name] = Widget(name, layout, paint)
+        return self.widgets[name]
+
+    def touch(self, *names):
+        """Mark widgets as needing to be drawn. With no names, all of them are
+
+            Names of widgets that the form doesn't have (eg., the notify 
+            areas of a form without them) are ignored.
+        """
+        with self.lock:
+            for name in names or self.widgets:
+                if name in self.widgets:
+                    self.widgets[name].dirty = True
+
+    def repaint(self):
+        """Clear the screen and draw everything
+
+            Only needed when the terminal is resized.
+        """
+        with self.lock:
+            self.size = self.stdscr.getmaxyx()
+            self.stdscr.erase()
+            if self.background is not None:
+                self.background(self.stdscr)
+            self.stdscr.noutrefresh()
+            for widget in self.widgets.values():
+                widget.rect = None
+                widget.win = None
+                widget.dirty = True
+            self._draw()
+
+    def update(self):
+        """Draw the dirty widgets, and write the changes to the terminal
+        """
+        with self.lock:
+            if self.size != self.stdscr.getmaxyx():
+                self.repaint()
+            else:
+                self._draw()
+
+    def _draw(self):
+        widgets = list(self.widgets.values())
+        while any(widget.dirty for widget in widgets):
+            for i, widget in enumerate(widgets):
+                if widget.dirty:
+                    self._paint(widget, widgets[i+1:])
+        curses.doupdate()
+
+    def _clip(self, rect):
+        if rect is None:
+            return None
+        y, x, h, w = rect
+        y1, x1 = max(y, 0), max(x, 0)
+        y2, x2 = min(y + h, self.size[0]), min(x + w, self.size[1])
+        if y2 <= y1 or x2 <= x1:
+            return None
+        return (y1, x1, y2 - y1, x2 - x1)
+
+    def _paint(self, widget, above):
+        widget.dirty = False
+        rect = self._clip(widget.layout())
+        if rect != widget.rect:
+            if widget.rect is not None:
+                self._clear(widget)
+            widget.rect = rect
+            widget.win = None if rect is None else self.stdscr.derwin(rect[2], rect[3], rect[0], rect[1])
+        if widget.win is None:
+            return
+        widget.win.erase()
+        widget.paint(widget.win)
+        widget.win.noutrefresh()
+        # Widgets drawn after this one stay on top of it
+        for other in above:
+            if overlaps(other.rect, rect):
+                other.dirty = True
+
+    def _clear(self, widget):
+        # Blank the area a widget has left, and draw again whatever else was there
+        y, x, h, w = widget.rect
+        win = self.stdscr.derwin(h, w, y, x)
+        win.erase()
+        win.noutrefresh()
+        for other in self.widgets.values():
+            if other is not widget and overlaps(other.rect, widget.rect):
+                other.dirty = True
@@ -115,7 +115,7 @@
     including xfce4-terminal, gnome-terminal, qterminal, konsole, and 
     xterm. It may require the TERM var to be set for color support:
 
-        env TERM=xterm-256color python3 speech.py
+        env TERM=xterm-256color python3 -m gustav.forms.curses.speech
 
     It is working well on python 3.x. Much of the rendering is based on unicode 
     which is a mess in py2, and since py2 has reached end-of-life, not much work
@@ -128,100 +128,18 @@
 """
 
 #from __future__ import unicode_literals
-import os, sys
 import curses
 import threading
+import functools
 import time
-import math
 
-class Interface():
+from . import base
+from . import render
+
+class Interface(base.Interface):
     def __init__(self):
-        # Initialize text areas
+        base.Interface.__init__(self)
         self.title_l_str = "Gustav Speech!"
-        self.title_c_str = ""
-        self.title_r_str = ""
-#        self.notify_l_str = ""
-#        self.notify_l_show = False
-#        self.notify_r_str = ""
-#        self.notify_r_show = False
-#        self.notify_pad = True
-#        self.notify_offset_v = 2                # Vertical offset of notifications from top of window
-        self.status_l_str = "Press '/' to quit"
-        self.status_c_str = ""
-        self.status_r_str = ""
-
-        self.keypress_wait = .005 # Sleep time in sec during keypress loop to avoid cpu race
-                                  # Longer values are better for slower machines
-
-        # Some stuff for rendering
-        # Dict so you can specify colors in curses using standard xterm 256-color palette names.
-        self.palette256 = {'Black': 0, 'Maroon': 1, 'Green': 2, 'Olive': 3, 'Navy': 4, 'Purple': 5, 'Teal': 6, 'Silver': 7, 'Grey': 8, 'Red': 9, 'Lime': 10, 'Yellow': 11, 'Blue': 12, 'Fuchsia': 13, 'Aqua': 14, 'White': 15, 'Grey0': 16, 'NavyBlue': 17, 'DarkBlue': 18, 'Blue3-1': 19, 'Blue3-2': 20, 'Blue1': 21, 'DarkGreen': 22, 'DeepSkyBlue4-1': 23, 'DeepSkyBlue4-2': 24, 'DeepSkyBlue4-3': 25, 'DodgerBlue3': 26, 'DodgerBlue2': 27, 'Green4': 28, 'SpringGreen4': 29, 'Turquoise4': 30, 'DeepSkyBlue3': 31, 'DeepSkyBlue3': 32, 'DodgerBlue1': 33, 'Green3': 34, 'SpringGreen3': 35, 'DarkCyan': 36, 'LightSeaGreen': 37, 'DeepSkyBlue2': 38, 'DeepSkyBlue1': 39, 'Green3': 40, 'SpringGreen3': 41, 'SpringGreen2': 42, 'Cyan3': 43, 'DarkTurquoise': 44, 'Turquoise2': 45, 'Green1': 46, 'SpringGreen2': 47, 'SpringGreen1': 48, 'MediumSpringGreen': 49, 'Cyan2': 50, 'Cyan1': 51, 'DarkRed': 52, 'DeepPink4': 53, 'Purple4': 54, 'Purple4': 55, 'Purple3': 56, 'BlueViolet': 57, 'Orange4': 58, 'Grey37': 59, 'MediumPurple4': 60, 'SlateBlue3': 61, 'SlateBlue3': 62, 'RoyalBlue1': 63, 'Chartreuse4': 64, 'DarkSeaGreen4': 65, 'PaleTurquoise4': 66, 'SteelBlue': 67, 'SteelBlue3': 68, 'CornflowerBlue': 69, 'Chartreuse3': 70, 'DarkSeaGreen4': 71, 'CadetBlue': 72, 'CadetBlue': 73, 'SkyBlue3': 74, 'SteelBlue1': 75, 'Chartreuse3': 76, 'PaleGreen3': 77, 'SeaGreen3': 78, 'Aquamarine3': 79, 'MediumTurquoise': 80, 'SteelBlue1': 81, 'Chartreuse2': 82, 'SeaGreen2': 83, 'SeaGreen1': 84, 'SeaGreen1': 85, 'Aquamarine1': 86, 'DarkSlateGray2': 87, 'DarkRed': 88, 'DeepPink4': 89, 'DarkMagenta': 90, 'DarkMagenta': 91, 'DarkViolet': 92, 'Purple': 93, 'Orange4': 94, 'LightPink4': 95, 'Plum4': 96, 'MediumPurple3': 97, 'MediumPurple3': 98, 'SlateBlue1': 99, 'Yellow4': 100, 'Wheat4': 101, 'Grey53': 102, 'LightSlateGrey': 103, 'MediumPurple': 104, 'LightSlateBlue': 105, 'Yellow4': 106, 'DarkOliveGreen3': 107, 'DarkSeaGreen': 108, 'LightSkyBlue3': 109, 'LightSkyBlue3': 110, 'SkyBlue2': 111, 'Chartreuse2': 112, 'DarkOliveGreen3': 113, 'PaleGreen3': 114, 'DarkSeaGreen3': 115, 'DarkSlateGray3': 116, 'SkyBlue1': 117, 'Chartreuse1': 118, 'LightGreen': 119, 'LightGreen': 120, 'PaleGreen1': 121, 'Aquamarine1': 122, 'DarkSlateGray1': 123, 'Red3': 124, 'DeepPink4': 125, 'MediumVioletRed': 126, 'Magenta3': 127, 'DarkViolet': 128, 'Purple': 129, 'DarkOrange3': 130, 'IndianRed': 131, 'HotPink3': 132, 'MediumOrchid3': 133, 'MediumOrchid': 134, 'MediumPurple2': 135, 'DarkGoldenrod': 136, 'LightSalmon3': 137, 'RosyBrown': 138, 'Grey63': 139, 'MediumPurple2': 140, 'MediumPurple1': 141, 'Gold3': 142, 'DarkKhaki': 143, 'NavajoWhite3': 144, 'Grey69': 145, 'LightSteelBlue3': 146, 'LightSteelBlue': 147, 'Yellow3': 148, 'DarkOliveGreen3': 149, 'DarkSeaGreen3': 150, 'DarkSeaGreen2': 151, 'LightCyan3': 152, 'LightSkyBlue1': 153, 'GreenYellow': 154, 'DarkOliveGreen2': 155, 'PaleGreen1': 156, 'DarkSeaGreen2': 157, 'DarkSeaGreen1': 158, 'PaleTurquoise1': 159, 'Red3': 160, 'DeepPink3': 161, 'DeepPink3': 162, 'Magenta3': 163, 'Magenta3': 164, 'Magenta2': 165, 'DarkOrange3': 166, 'IndianRed': 167, 'HotPink3': 168, 'HotPink2': 169, 'Orchid': 170, 'MediumOrchid1': 171, 'Orange3': 172, 'LightSalmon3': 173, 'LightPink3': 174, 'Pink3': 175, 'Plum3': 176, 'Violet': 177, 'Gold3': 178, 'LightGoldenrod3': 179, 'Tan': 180, 'MistyRose3': 181, 'Thistle3': 182, 'Plum2': 183, 'Yellow3': 184, 'Khaki3': 185, 'LightGoldenrod2-1': 186, 'LightYellow3': 187, 'Grey84': 188, 'LightSteelBlue1': 189, 'Yellow2': 190, 'DarkOliveGreen1': 191, 'DarkOliveGreen1': 192, 'DarkSeaGreen1': 193, 'Honeydew2': 194, 'LightCyan1': 195, 'Red1': 196, 'DeepPink2': 197, 'DeepPink1': 198, 'DeepPink1': 199, 'Magenta2': 200, 'Magenta1': 201, 'OrangeRed1': 202, 'IndianRed1': 203, 'IndianRed1': 204, 'HotPink': 205, 'HotPink': 206, 'MediumOrchid1': 207, 'DarkOrange': 208, 'Salmon1': 209, 'LightCoral': 210, 'PaleVioletRed1': 211, 'Orchid2': 212, 'Orchid1': 213, 'Orange1': 214, 'SandyBrown': 215, 'LightSalmon1': 216, 'LightPink1': 217, 'Pink1': 218, 'Plum1': 219, 'Gold1': 220, 'LightGoldenrod2-2': 221, 'LightGoldenrod2-3': 222, 'NavajoWhite1': 223, 'MistyRose1': 224, 'Thistle1': 225, 'Yellow1': 226, 'LightGoldenrod1': 227, 'Khaki1': 228, 'Wheat1': 229, 'Cornsilk1': 230, 'Grey100': 231, 'Grey3': 232, 'Grey7': 233, 'Grey11': 234, 'Grey15': 235, 'Grey19': 236, 'Grey23': 237, 'Grey27': 238, 'Grey30': 239, 'Grey35': 240, 'Grey39': 241, 'Grey42': 242, 'Grey46': 243, 'Grey50': 244, 'Grey54': 245, 'Grey58': 246, 'Grey62': 247, 'Grey66': 248, 'Grey70': 249, 'Grey74': 250, 'Grey78': 251, 'Grey82': 252, 'Grey85': 253, 'Grey89': 254, 'Grey93': 255, }
-        # I'm sure there is a better way to do this, but I got tired of looking.
-        self.glyphs = { 'blocks':
-                            {
-                             'block': "█",      # 
-                             'block_hu': "▀",   # half up
-                             'block_hd': "▄",   # half down
-                             'block_hl': "▌",   # half left
-                             'block_hr': "▐",   # half right
-                             'block_qul': "▘",  # quarter upper left
-                             'block_qur': "▝",  # quarter upper right
-                             'block_qll;': "▖", # quarter lower left
-                             'block_qlr': "▗",  # quarter lower right
-                             },
-                        'lines':
-                           {'light':
-                                {'line_h': "─",
-                                 'line_hdd': "╌",
-                                 'line_hdt': "┄",
-                                 'line_hl': "╴",
-                                 'line_hr': "╶",
-                                 'line_v': "│",
-                                 'line_vdd': "╎",
-                                 'line_vdt': "┆",
-                                 'line_vl': "╷",
-                                 'line_vu': "╵",
-                                 'corner_ul': "┌",
-                                 'corner_ur': "┐",
-                                 'corner_ll': "└",
-                                 'corner_lr': "┘",
-                                },
-                            'heavy': 
-                                {'line_h': "━",     # horizontal
-                                 'line_hdd': "╍",   # horizontal dash double
-                                 'line_hdt': "┅",   # horizontal dash triple
-                                 'line_hl': "╸",    # horizontal left
-                                 'line_hr': "╺",    # horizontal right
-                                 'line_v': "┃",     # vertical
-                                 'line_vdd': "╏",   # vertical dash double
-                                 'line_vdt': "┇",   # vertical dash triple
-                                 'line_vu': "╹",    # vertical upper
-                                 'line_vl': "╻",    # vertical lower
-                                 'corner_ul': "┏",  # corner upper left
-                                 'corner_ur': "┓",  # corner upper right
-                                 'corner_ll': "┗",  # corner lower left
-                                 'corner_lr': "┛",  # corner lower right
-                                },
-                           'double':
-                                {'line_h': "═",
-                                 'line_v': "║",
-                                 'corner_ul': "╔",
-                                 'corner_ur': "╗",
-                                 'corner_ll': "╚",
-                                 'corner_lr': "╝",
-                                },
-                            },
-                        }
-
-
-        # Initialize curses stuff
-        self.stdscr = curses.initscr()   # Return a window object representing the entire screen
-        self.stdscr.keypad(True)         # Accept multibyte special keys (eg., curses.KEY_LEFT)
-        self.stdscr.nodelay(True)        # Don't block waiting for input (must then block manually in a while loop)
-        curses.cbreak()                  # Accept keypresses without having to hit enter
-        curses.noecho()                  # Don't automatically echo keypresses to screen
-        curses.curs_set(0)               # Hide the cursor
-        curses.start_color()             # Initialize color
 
         self.color_default_fg =     self.palette256['Grey']
         self.color_default_bg =     self.palette256['Black']
@@ -272,10 +190,11 @@ class Interface():
         # One feature is to highlight and underline words in all caps. If any of these chars are found in a word, do not highlight.
         self.allcaps_skip=list("`1234567890-=[]\\;',./'~!@#$%^&*()_+{}|:\"<>?")
 
+        self.add_widgets()
+        self.redraw()
+
         self.clock_timer = self.RepeatTimer(1, self.clock_callback)
         self.clock_timer.start()
- 
-        self.redraw()
 
     class RepeatTimer(threading.Timer):
         """A subclass of threading.timer that fires recursively
@@ -287,62 +206,84 @@ class Interface():
                 self.function(*self.args, **self.kwargs)
 
     def clock_callback(self):
-        self.clock_str = time.strftime("%T")
-        self.stdscr.addstr(3,self.clock_x, self.clock_str, self.white_cp)
+        self.screen.touch('clock')
+        self.screen.update()
 
     def destroy(self):
         self.clock_timer.cancel()
-        self.stdscr.nodelay(False)
-        self.stdscr.keypad(False)
-        curses.curs_set(1)
-        curses.echo()
-        curses.nocbreak()
-        curses.endwin()
+        base.Interface.destroy(self)
+
 
+    def widgets(self):
+        # There are no notify areas in this form
+        return [('playing',    self.layout_playing,    self.paint_playing),
+                ('clock',      self.layout_clock,      self.paint_clock),
+                ('block_info', self.layout_block_info, self.paint_block_info),
+                ('trial_info', self.layout_trial_info, self.paint_trial_info),
+                ('block_curr', self.layout_block_curr, functools.partial(self.paint_box, 'blockCurr')),
+                ('block_prev', self.layout_block_prev, functools.partial(self.paint_box, 'blockPrev')),
+                ('block_vars', self.layout_block_vars, functools.partial(self.paint_box, 'blockVars')),
+                ('exp_vars',   self.layout_exp_vars,   functools.partial(self.paint_box, 'expVars')),
+                ('title',      self.layout_title,      self.paint_title),
+                ('status',     self.layout_status,     self.paint_status),
+               ]
 
-    def redraw(self):
-        """Draw entire window
 
-            Called when term is resized, or manually by user
+    def border_color(self):
+        return self.grey_cp
 
+
+    def place(self):
+        """The playback indicator and clock are on the right, and the score 
+            and variables boxes are in two columns
         """
-        self.win_height,self.win_width = self.stdscr.getmaxyx()
-        
-        glyph_blocks = self.glyphs['blocks']
-
-        self.stdscr.erase()
-
-        y = 2
-
-        # Draw playing
-        len_playing = len(self.playing_str)
-        playing_x = self.win_width - 2 - len_playing
-        if self.playing_show:
-            self.stdscr.addstr(y,   playing_x, self.glyphs['blocks']['block_hd'] * len(self.playing_str), self.playing_edge_cp)
-            self.stdscr.addstr(y+2, playing_x, self.glyphs['blocks']['block_hu'] * len(self.playing_str), self.playing_edge_cp)
-            self.stdscr.addstr(y+1, playing_x, self.playing_str,                                          self.playing_cp | curses.A_BOLD)
-
-        # Draw clock
-        self.clock_x = playing_x - len(self.clock_str) - 1
-        self.clock_callback()
-
-        # Draw block info
-        this_x = 1 #len_clock + 3 # Account for clock
-        w = self.clock_x - this_x - 2
-        h = 1
-        self.rectangle(self.stdscr, y, this_x, y+2, this_x+w, self.grey_cp)
-        self.stdscr.addstr(y, this_x+1, self.blockInfo_lbl[:w-2], self.grey_cp)
-        self.stdscr.addstr(y+1, this_x+2, self.blockInfo_str[:w-2], self.white_cp)
-
-        # Draw trial info
-        this_x = 1
-        w = self.win_width - 2
-        y = y + 3
-        h = 4
-        self.rectangle(self.stdscr, y, this_x, y + h-1, this_x + w-1, self.grey_cp)
-        self.stdscr.addstr(y, this_x+1, self.trialInfo_lbl[:w-2], self.grey_cp)
+        self.playing_x = self.win_width - 2 - len(self.playing_str)
+        self.clock_x = self.playing_x - len(self.clock_str) - 1
+        self.col_w = (self.win_width // 2) - (self.win_width % 2) - 2     # Width of the left column
+        self.col_x = (self.win_width // 2) - (self.win_width % 2)         # Where the right column starts
+        self.vars_h = self.win_height - 13 - 2
+
+
+    def layout_playing(self):
+        if not self.playing_show:
+            return None
+        return (2, self.playing_x, 3, len(self.playing_str))
+
+    def paint_playing(self, win):
+        render.put(win, 0, 0, self.glyphs['blocks']['block_hd'] * len(self.playing_str), self.playing_edge_cp)
+        render.put(win, 2, 0, self.glyphs['blocks']['block_hu'] * len(self.playing_str), self.playing_edge_cp)
+        render.put(win, 1, 0, self.playing_str,                                          self.playing_cp | curses.A_BOLD)
+
+
+    def layout_clock(self):
+        return (3, self.clock_x, 1, len(self.clock_str))
+
+    def paint_clock(self, win):
+        self.clock_str = time.strftime("%T")
+        render.put(win, 0, 0, self.clock_str, self.white_cp)
+
+
+    def layout_block_info(self):
+        w = self.clock_x - 1 - 2
+        return (2, 1, 3, w+1)
+
+    def paint_block_info(self, win):
+        h, w = win.getmaxyx()
+        w -= 1
+        self.rectangle(win, 0, 0, 2, w, self.grey_cp)
+        render.put(win, 0, 1, self.blockInfo_lbl[:w-2], self.grey_cp)
+        render.put(win, 1, 2, self.blockInfo_str[:w-2], self.white_cp)
+
+
+    def layout_trial_info(self):
+        return (5, 1, 4, self.win_width - 2)
+
+    def paint_trial_info(self, win):
+        h, w = win.getmaxyx()
+        self.rectangle(win, 0, 0, h-1, w-1, self.grey_cp)
+        render.put(win, 0, 1, self.trialInfo_lbl[:w-2], self.grey_cp)
         
-        this_y = y
+        this_y = 0
         for line in self.trialInfo_str.split("\n"):
 
             this_line = line[:w-3]
@@ -357,286 +298,47 @@ class Interface():
                 word_x = 0
                 for word in words:
                     if word.upper() == word and not any(c in word for c in self.allcaps_skip):
-                        self.stdscr.addstr(this_y+1, this_x+2+word_x, word, self.trialInfo_fmt_allcaps)
+                        render.put(win, this_y+1, 2+word_x, word, self.trialInfo_fmt_allcaps)
                     else:
-                        self.stdscr.addstr(this_y+1, this_x+2+word_x, word)
+                        render.put(win, this_y+1, 2+word_x, word)
                     word_x += len(word)+1 # +1 for the space
                 if punc:
-                    self.stdscr.addstr(this_y+1, this_x+2+word_x-1, punc)
+                    render.put(win, this_y+1, 2+word_x-1, punc)
             else:
-                self.stdscr.addstr(this_y+1, this_x+2, line[:w-2], self.white_cp)
+                render.put(win, this_y+1, 2, line[:w-2], self.white_cp)
             this_y += 1
 
-        # Draw trial score
-        y = y + h
-        this_x = 1
-        h = 4
-        w = (self.win_width // 2) - (self.win_width % 2) - 2
-        self.rectangle(self.stdscr, y, this_x, y + h-1, this_x + w, self.grey_cp)
-        self.stdscr.addstr(y, this_x + 1, self.blockCurr_lbl[:w-2], self.grey_cp)
-        this_y = y
-        for line in self.blockCurr_str.split("\n"):
-            self.stdscr.addstr(this_y+1, this_x+2, line[:w-2], self.white_cp)
-            this_y += 1
 
-        # Draw block score
-        this_x = (self.win_width // 2) - (self.win_width % 2)
-        self.rectangle(self.stdscr, y, this_x, y + h-1, self.win_width - 2, self.grey_cp)
-        self.stdscr.addstr(y, this_x + 1, self.blockPrev_lbl[:w-2], self.grey_cp)
-        this_y = y
-        for line in self.blockPrev_str.split("\n"):
-            self.stdscr.addstr(this_y+1, this_x+2, line[:w-2], self.white_cp)
-            this_y += 1
+    # The score and variables boxes are in two columns
+    def layout_block_curr(self):
+        return (9, 1, 4, self.col_w+1)
 
-        # Draw block vars
-        y = y + h
-        this_x = 1
-        h = self.win_height - y - 2
-        w = (self.win_width // 2) - (self.win_width % 2) - 2
-        self.rectangle(self.stdscr, y, this_x, y + h, this_x + w, self.grey_cp)
-        self.stdscr.addstr(y, this_x + 1, self.blockVars_lbl[:w-2], self.grey_cp)
-        this_y = y
-        for line in self.blockVars_str.split("\n"):
-            self.stdscr.addstr(this_y+1, this_x+2, line[:w-2], self.white_cp)
-            this_y += 1
+    def layout_block_prev(self):
+        return (9, self.col_x, 4, self.win_width - 1 - self.col_x)
 
-        # Draw experiment vars
-        this_x = (self.win_width // 2) - (self.win_width % 2)
-        self.rectangle(self.stdscr, y, this_x, y + h, self.win_width - 2, self.grey_cp)
-        self.stdscr.addstr(y, this_x + 1, self.expVars_lbl[:w-2], self.grey_cp)
-        this_y = y
-        for line in self.expVars_str.split("\n"):
-            self.stdscr.addstr(this_y+1, this_x+2, line[:w-2], self.white_cp)
-            this_y += 1
+    def layout_block_vars(self):
+        return (13, 1, self.vars_h+1, self.col_w+1)
 
-        # Border
-        self.stdscr.attron(self.grey_cp)
-        self.stdscr.box()
-        self.stdscr.attroff(self.grey_cp)
-
-        # Title bar
-        self.stdscr.addstr(0, 1, " " * (self.win_width-2), self.cp['title'])
-        if self.title_l_str:
-            self.stdscr.addstr(0, 1, self.title_l_str, curses.A_BOLD | self.cp['title'])
-        if self.title_c_str:
-            x = int((self.win_width // 2) - (len(self.title_c_str) // 2) - len(self.title_c_str) % 2) -1
-            self.stdscr.addstr(0, x, self.title_c_str, curses.A_BOLD | self.cp['title'])
-        if self.title_r_str:
-            x = self.win_width - len(self.title_r_str) - 1
-            self.stdscr.addstr(0, x, self.title_r_str, curses.A_BOLD | self.cp['title'])
-
-        # Status bar
-        self.stdscr.addstr(self.win_height-1, 1, " " * (self.win_width-2), self.cp['status'])
-        if self.status_l_str:
-            self.stdscr.addstr(self.win_height-1, 1, self.status_l_str, self.cp['status'])
-        if self.status_c_str:
-            x = int((self.win_width // 2) - (len(self.status_c_str) // 2) - len(self.status_c_str) % 2) -1
-            self.stdscr.addstr(self.win_height-1, x, self.status_c_str, self.cp['status'])
-        if self.status_r_str:
-            x = self.win_width - len(self.status_r_str) - 1
-            self.stdscr.addstr(self.win_height-1, x, self.status_r_str, self.cp['status'])
-
-
-        self.stdscr.refresh()
-
-
-    def rectangle(self, win, uly, ulx, lry, lrx, cp):
-        """Draw a rectangle with corners at the provided upper-left
-            and lower-right coordinates.
-
-            https://stackoverflow.com/questions/52804155/extending-curses-rectangle-box-to-edge-of-terminal-in-python
-        """
-        win.attron(cp)
-        win.vline(uly+1, ulx, curses.ACS_VLINE, lry - uly - 1)
-        win.hline(uly, ulx+1, curses.ACS_HLINE, lrx - ulx - 1)
-        win.hline(lry, ulx+1, curses.ACS_HLINE, lrx - ulx - 1)
-        win.vline(uly+1, lrx, curses.ACS_VLINE, lry - uly - 1)
-        win.addch(uly, ulx, curses.ACS_ULCORNER)
-        win.addch(uly, lrx, curses.ACS_URCORNER)
-        win.addch(lry, lrx, curses.ACS_LRCORNER)
-        win.addch(lry, ulx, curses.ACS_LLCORNER)
-        win.attroff(cp)
-
-
-    def round_to(self, x, base):
-        """Rounds x to the nearest base, which can be any float
+    def layout_exp_vars(self):
+        return (13, self.col_x, self.vars_h+1, self.win_width - 1 - self.col_x)
+
+    def paint_box(self, name, win):
+        """Draws one of the boxes, eg. blockCurr draws blockCurr_lbl and blockCurr_str
         """
-        recip = 1/float(base)
-        return round(x * recip) / recip
+        h, w = win.getmaxyx()
+        self.rectangle(win, 0, 0, h-1, w-1, self.grey_cp)
+        # Both columns are cropped to the width of the left one
+        w = self.col_w
+        render.put(win, 0, 1, getattr(self, name + '_lbl')[:w-2], self.grey_cp)
+        this_y = 0
+        for line in getattr(self, name + '_str').split("\n"):
+            render.put(win, this_y+1, 2, line[:w-2], self.white_cp)
+            this_y += 1
 
 
     #########################################################################
     ## USER FACING FUNCTIONS BELOW
 
-    def get_resp(self, timeout=None):
-        """Wait modally for a keypress, returns the key as a char. 
-            If you want to evaluate arrow keys etc, use ord:
-
-                ret = get_resp()
-                if ord(ret) == curses.KEY_LEFT:
-                    # do something to the left
-
-            If timeout is None, then block. If it is a float, wait at 
-            least that many seconds, return None if no input.
-        """
-
-        try:
-            key = curses.ERR
-            waiting = True
-            timeout_start = time.time()
-            # Debugging:
-            #loops = 0
-            self.stdscr.timeout(10)
-            curses.flushinp()
-            while waiting:
-                key = self.stdscr.getch()
-                if key == curses.ERR: # Default wait response from curses; keep waiting
-                    if (timeout is not None) and (time.time() >= timeout_start + timeout):
-                        ret = None
-                        waiting = False
-                    time.sleep(self.keypress_wait) # Avoid cpu race while looping
-                elif key == curses.KEY_RESIZE:
-                    self.redraw()
-                else:
-                    # Something else: return key as char and let user evaluate
-                    ret = chr(key)
-                    waiting = False
-                #loops += 1
-                #self.update_Title_Left("Interface Loops: {:}".format(loops), redraw=True)
-            return ret
-
-        except:
-            self.destroy()
-            raise Exception("Error getting input")
-    
-    def update_Title_Left(self, s, redraw=False):
-        """Update the text on the left side of the title bar
-
-            redraw is a bool specifying whether to redraw window. 
-            A window redraw can also be set with update.
-        """
-        self.title_l_str = s
-        if redraw: 
-            self.redraw()
-
-    def update_Title_Center(self, s, redraw=False):
-        """Update the text in the center of the title bar
-
-            redraw is a bool specifying whether to redraw window. 
-            A window redraw can also be set with update.
-        """
-        self.title_c_str = s
-        if redraw: 
-            self.redraw()
-
-    def update_Title_Right(self, s, redraw=False):
-        """Update the text on the right side of the title bar
-
-            redraw is a bool specifying whether to redraw window. 
-            A window redraw can also be set with update.
-        """
-        self.title_r_str = s
-        if redraw: 
-            self.redraw()
-
-    # def update_Notify_Left(self, s, show=None, redraw=False):
-    #     """Update the notify text to the left of the face.
-
-    #         show is a bool specifying whether to show the text,
-    #         set to None to leave this param unchanged [default].
-    #         show can also be set with show_Notify_Left.
-
-    #         redraw is a bool specifying whether to redraw window. 
-    #         A window redraw can also be set with update.
-    #     """
-    #     self.notify_l_str = s
-    #     if show is not None:
-    #         self.notify_l_show = show
-    #     if redraw: 
-    #         self.redraw()
-
-    # def update_Notify_Right(self, s, show=None, redraw=False):
-    #     """Update the notify text to the left of the face.
-
-    #         show is a bool specifying whether to show the text,
-    #         set to None to leave this param unchanged [default].
-    #         show can also be set with show_Notify_Left.
-
-    #         redraw is a bool specifying whether to redraw window. 
-    #         A window redraw can also be set with update.
-    #     """
-    #     self.notify_r_str = s
-    #     if show is not None:
-    #         self.notify_r_show = show
-    #     if redraw: 
-    #         self.redraw()
-
-    # def show_Notify_Left(self, show=None, redraw=True):
-    #     """Show the left notify text
-
-    #         If show==None, toggle. Otherwise show should be a bool.
-
-    #         redraw is a bool specifying whether to redraw window. 
-    #         A window redraw can also be set with update.
-    #     """        
-    #     if show is not None:
-    #         self.notify_l_show = show
-    #     else:
-    #         self.notify_l_show = not self.notify_l_show
-
-    #     if redraw: 
-    #         self.redraw()
-
-    # def show_Notify_Right(self, show=None, redraw=True):
-    #     """Show the right notify text
-
-    #         If show==None, toggle. Otherwise show should be a bool.
-
-    #         redraw is a bool specifying whether to redraw window. 
-    #         A window redraw can also be set with update.
-    #     """        
-
-    #     if show is not None:
-    #         self.notify_r_show = show
-    #     else:
-    #         self.notify_r_show = not self.notify_r_show
-
-    #     if redraw: 
-    #         self.redraw()
-
-    def update_Status_Left(self, s, redraw=False):
-        """Update the text on the left side of the status bar
-
-            redraw is a bool specifying whether to redraw window. 
-            A window redraw can also be set with update.
-        """
-        self.status_l_str = s
-        if redraw: 
-            self.redraw()
-
-    def update_Status_Center(self, s, redraw=False):
-        """Update the text in the center of the status bar
-
-            redraw is a bool specifying whether to redraw window. 
-            A window redraw can also be set with update.
-        """
-        self.status_c_str = s
-        if redraw: 
-            self.redraw()
-
-    def update_Status_Right(self, s, redraw=False):
-        """Update the text on the right side of the status bar
-
-            redraw is a bool specifying whether to redraw window. 
-            A window redraw can also be set with update.
-        """
-        self.status_r_str = s
-        if redraw: 
-            self.redraw()
-
-    def update(self):
-        self.redraw()
-
     ## Speech-specific user functions
 
     def update_Playing(self, s, show=True, redraw=False):
@@ -645,11 +347,12 @@ class Interface():
             redraw is a bool specifying whether to redraw window. 
             A window redraw can also be set with update.
         """
+        self.screen.touch('playing', 'clock', 'block_info')
         self.playing_str = s
         self.playing_show = show
 
         if redraw: 
-            self.redraw()
+            self.update()
 
 
     def show_Playing(self, show=None, redraw=True):
@@ -661,13 +364,14 @@ class Interface():
             redraw is a bool specifying whether to redraw window. 
             A window redraw can also be set with update.
         """        
+        self.screen.touch('playing')
         if show is not None:
             self.playing_show = show
-            self.redraw()
+            self.update()
         else:
             self.playing_show = not self.playing_show
             if redraw: 
-                self.redraw()
+                self.update()
 
     def update_Block_Info(self, s, redraw=False):
         """Update the Block Info text
@@ -675,9 +379,10 @@ class Interface():
             redraw is a bool specifying whether to redraw window. 
             A window redraw can also be set with update.
         """
+        self.screen.touch('block_info')
         self.blockInfo_str = s
         if redraw: 
-            self.redraw()
+            self.update()
 
     def update_Trial_Info(self, s, redraw=False):
         """Update the Trial_Info text
@@ -685,9 +390,10 @@ class Interface():
             redraw is a bool specifying whether to redraw window. 
             A window redraw can also be set with update.
         """
+        self.screen.touch('trial_info')
         self.trialInfo_str = s
         if redraw: 
-            self.redraw()
+            self.update()
 
     def update_Block_Curr(self, s, redraw=False):
         """Update the Trial Score text
@@ -695,9 +401,10 @@ class Interface():
             redraw is a bool specifying whether to redraw window. 
             A window redraw can also be set with update.
         """
+        self.screen.touch('block_curr')
         self.blockCurr_str = s
         if redraw: 
-            self.redraw()
+            self.update()
 
     def update_Block_Prev(self, s, redraw=False):
         """Update the Block Score text
@@ -705,9 +412,10 @@ class Interface():
             redraw is a bool specifying whether to redraw window. 
             A window redraw can also be set with update.
         """
+        self.screen.touch('block_prev')
         self.blockPrev_str = s
         if redraw: 
-            self.redraw()
+            self.update()
 
     def update_Block_Vars(self, s, redraw=False):
         """Update the Block Variables text
@@ -715,9 +423,10 @@ class Interface():
             redraw is a bool specifying whether to redraw window. 
             A window redraw can also be set with update.
         """
+        self.screen.touch('block_vars')
         self.blockVars_str = s
         if redraw: 
-            self.redraw()
+            self.update()
 
     def update_Exp_Vars(self, s, redraw=False):
         """Update the Experiment Variables text
@@ -725,9 +434,10 @@ class Interface():
             redraw is a bool specifying whether to redraw window. 
             A window redraw can also be set with update.
         """
+        self.screen.touch('exp_vars')
         self.expVars_str = s
         if redraw: 
-            self.redraw()
+            self.update()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2010-2020 Christopher Brown
+#
+# This file is part of gustav.
+#
+# gustav is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# gustav is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gustav.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Comments and/or additions are welcome. Send e-mail to: cbrown1@pitt.edu.
+#
+
+"""Per-experiment archives of web sessions
+
+    Each experiment has one archive, an sqlite database (eg.,
+    FlaskApp/static/exp/archive/gap_detection.sqlite), holding the files of
+    all of its sessions, indexed by subject id. A session's messages and
+    files are added as it runs, and are compressed (zlib) and written by a
+    background thread, so neither adding a file nor ending a session waits
+    on compression or the disk. When a session is closed, the files left in
+    its subject directory are added, and the directory is removed.
+
+    To get a subject's files back:
+
+        >>> from gustav.forms.html import archive
+        >>> archive.subjects('static/exp/archive/gap_detection.sqlite')
+        [('1700000000.5', 1700000000.6, 1700000342.1, 'stop')]
+        >>> files = archive.read('static/exp/archive/gap_detection.sqlite', '1700000000.5')
+        >>> files['g1_trial.json']
+
+    Any number of processes can write to the same archive; sqlite does the
+    locking.
+"""
+
+import os
+import time
+import zlib
+import queue
+import atexit
+import shutil
+import sqlite3
+import threading
+
+schema = """
+CREATE TABLE IF NOT EXISTS sessions (subject TEXT PRIMARY KEY, started REAL, ended REAL, tag TEXT);
+CREATE TABLE IF NOT EXISTS files (subject TEXT, name TEXT, time REAL, size INTEGER, data BLOB);
+CREATE INDEX IF NOT EXISTS files_subject ON files (subject);
+"""
+
+# All archivers in a process share one writer thread
+_queue = queue.Queue()
+_thread = None
+_lock = threading.Lock()
+
+
+class Archiver(object):
+    """Adds one session's files to its experiment's archive
+
+        add and close only queue the work for the writer thread, and return
+        at once. directory is the subject directory, which is swept into the
+        archive and removed when the session is closed.
+    """
+    def __init__(self, filename, subject, directory=None):
+        self.filename = filename
+        self.subject = str(subject)
+        self.directory = directory
+        self.names = set()
+        self.closed = False
+        _start()
+        _queue.put(('open', self, time.time()))
+
+    def __repr__(self):
+        return f"Gustav archiver\n  Archive: {self.filename}\n  Subject: {self.subject} Files: {len(self.names)}"
+
+    def add(self, name, data):
+        """Adds a file (bytes or str) to the archive
+        """
+        if self.closed:
+            return
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.names.add(name)
+        _queue.put(('add', self, (name, time.time(), data)))
+
+    def close(self, keep=True, tag=''):
+        """Ends the session
+
+            Files still in the subject directory are added, and the
+            directory removed. If keep is False, the session is removed from
+            the archive instead. tag (eg., 'stop', 'abort') is saved with it.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        _queue.put(('close', self, (time.time(), keep, tag)))
+
+
+def _start():
+    global _thread
+    with _lock:
+        if _thread is None:
+            atexit.register(flush)
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_write, name='gustav_archive', daemon=True)
+            _thread.start()
+
+
+def flush():
+    """Waits until everything queued has been written
+    """
+    if _thread is not None and _thread.is_alive():
+        _queue.join()
+
+
+def _connect(filename):
+    db = sqlite3.connect(filename, timeout=60)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.executescript(schema)
+    return db
+
+
+def _write():
+    # Takes whatever is queued, and writes it in one transaction per archive
+    dbs = {}
+    while True:
+        batch = [_queue.get()]
+        while True:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        touched = set()
+        for op, archiver, args in batch:
+            try:
+                if archiver.filename not in dbs:
+                    dbs[archiver.filename] = _connect(archiver.filename)
+                db = dbs[archiver.filename]
+                touched.add(archiver.filename)
+                if op == 'open':
+                    db.execute('INSERT OR REPLACE INTO sessions VALUES (?, ?, NULL, ?)', (archiver.subject, args, ''))
+                elif op == 'add':
+                    _insert(db, archiver.subject, *args)
+                elif op == 'close':
+                    _close(db, archiver, *args)
+            except Exception as e:
+                print(f'Archive {archiver.filename} failed to {op} for {archiver.subject}: {e}')
+        for filename in touched:
+            try:
+                dbs[filename].commit()
+            except sqlite3.Error as e:
+                print(f'Archive {filename} failed to commit: {e}')
+        for i in range(len(batch)):
+            _queue.task_done()
+
+
+def _insert(db, subject, name, t, data):
+    db.execute('INSERT INTO files VALUES (?, ?, ?, ?, ?)', (subject, name, t, len(data), zlib.compress(data)))
+
+
+def _close(db, archiver, t, keep, tag):
+    directory = archiver.directory
+    if keep:
+        if directory is not None and os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                path = os.path.join(directory, name)
+                if name not in archiver.names and os.path.isfile(path):
+                    with open(path, 'rb') as f:
+                        _insert(db, archiver.subject, name, os.path.getmtime(path), f.read())
+        db.execute('UPDATE sessions SET ended = ?, tag = ? WHERE subject = ?', (t, tag, archiver.subject))
+    else:
+        db.execute('DELETE FROM files WHERE subject = ?', (archiver.subject,))
+        db.execute('DELETE FROM sessions WHERE subject = ?', (archiver.subject,))
+    if directory is not None:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def subjects(filename):
+    """Returns the sessions in an archive: [(subject, started, ended, tag), ...]
+    """
+    db = _connect(filename)
+    try:
+        return db.execute('SELECT subject, started, ended, tag FROM sessions ORDER BY started').fetchall()
+    finally:
+        db.close()
+
+
+def read(filename, subject):
+    """Returns a subject's files from an archive: {name: bytes}, in the order they were added
+    """
+    db = _connect(filename)
+    try:
+        rows = db.execute('SELECT name, data FROM files WHERE subject = ? ORDER BY time, rowid', (str(subject),))
+        return {name: zlib.decompress(data) for name, data in rows}
+    finally:
+        db.close()
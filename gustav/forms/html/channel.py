@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2010-2020 Christopher Brown
+#
+# This file is part of gustav.
+#
+# gustav is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# gustav is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gustav.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Comments and/or additions are welcome. Send e-mail to: cbrown1@pitt.edu.
+#
+
+"""A message channel between the web server and a gustav experiment
+
+    The server (FlaskApp/gustavio.py) listens on a unix domain socket, and
+    passes its path to the experiment process in the GUSTAV_SOCKET
+    environment variable (and GUSTAV_TRANSCRIPT=1 if messages should also
+    be written to json files, as an audit log). The html form connects to
+    it, and from then on each client request is sent to the experiment as one message, and the
+    experiment's reply comes back as one message. Messages are JSON
+    objects with a 'type' ('info', 'trial', 'answer', 'stop', 'abort',
+    'style'), each sent as a 4-byte big-endian length followed by the
+    UTF-8 encoded JSON.
+
+    Both ends block on the socket rather than polling the file system, so
+    a reply is received as soon as it is sent.
+
+    When the server runs experiments in-process, on threads (see
+    FlaskApp/sessions.py), it makes a pair of connected ends with pipe, and
+    binds one to the experiment's thread, where connect returns it instead
+    of connecting to a socket. Messages are passed through queues, and are
+    still encoded as JSON, so both kinds of channel behave the same.
+"""
+
+import os
+import json
+import socket
+import queue
+import struct
+import tempfile
+import threading
+
+socket_env = 'GUSTAV_SOCKET'
+transcript_env = 'GUSTAV_TRANSCRIPT'
+header = struct.Struct('!I')
+_local = threading.local()
+
+
+def socket_path(name):
+    """Returns a path for a socket, short enough for AF_UNIX (~100 chars)
+    """
+    return os.path.join(tempfile.gettempdir(), f'gustav_{os.getpid()}_{name}.sock')
+
+
+def listen(path, backlog=1):
+    """Creates a unix domain socket listening at path (replacing any old one)
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.listen(backlog)
+    return sock
+
+
+def accept(listener, timeout=None):
+    """Waits for the experiment to connect, returns a Channel or None on timeout
+    """
+    listener.settimeout(timeout)
+    try:
+        conn, _ = listener.accept()
+    except socket.timeout:
+        return None
+    conn.settimeout(None)
+    return Channel(conn)
+
+
+def pipe():
+    """Returns a pair of connected in-process ends: (server, experiment)
+    """
+    a, b = queue.Queue(), queue.Queue()
+    return QueueChannel(a, b), QueueChannel(b, a)
+
+
+def bind(end, notify=False):
+    """Makes connect (without a path) return end, in the calling thread
+
+        If notify is True, a {'type': 'connected'} message is sent over end
+        when the form connects, to tell the server the session is ready (used
+        by pre-started workers, whose connection is made before the session).
+    """
+    _local.channel = end
+    _local.notify = notify
+
+
+def connect(path=None, timeout=None):
+    """Connects to the server's socket (from GUSTAV_SOCKET by default)
+
+        If an in-process end was bound to this thread, it is returned instead.
+    """
+    if path is None:
+        end = getattr(_local, 'channel', None)
+        if end is not None:
+            if isinstance(end, QueueChannel):
+                end.connected.set()
+            if _local.notify:
+                _local.notify = False
+                end.send({'type': 'connected'})
+            return end
+        path = os.environ[socket_env]
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    sock.connect(path)
+    sock.settimeout(None)
+    return Channel(sock)
+
+
+class Channel():
+    """One end of a connection, sending and receiving length-prefixed JSON messages
+    """
+    def __init__(self, sock):
+        self.sock = sock
+        self.closed = False
+
+    def send(self, msg):
+        data = json.dumps(msg).encode('utf-8')
+        self.sock.sendall(header.pack(len(data)) + data)
+
+    def _recv_exactly(self, n):
+        buf = bytearray()
+        while len(buf) < n:
+            chunk = self.sock.recv(n - len(buf))
+            if not chunk:
+                raise EOFError('Connection closed')
+            buf += chunk
+        return bytes(buf)
+
+    def recv(self, timeout=None):
+        """Returns the next message, or None if none arrives within timeout s
+
+            Raises EOFError if the other end has closed the connection.
+        """
+        self.sock.settimeout(timeout)
+        try:
+            n = header.unpack(self._recv_exactly(header.size))[0]
+        except socket.timeout:
+            return None
+        # Once a message has started, wait for all of it
+        self.sock.settimeout(None)
+        return json.loads(self._recv_exactly(n).decode('utf-8'))
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+
+
+class QueueChannel():
+    """One end of an in-process connection, with the same methods as Channel
+
+        connected is set when the experiment picks up its end (with connect).
+    """
+    _eof = object()
+
+    def __init__(self, inbox, outbox):
+        self.inbox = inbox
+        self.outbox = outbox
+        self.closed = False
+        self.connected = threading.Event()
+
+    def send(self, msg):
+        if self.closed:
+            raise EOFError('Connection closed')
+        self.outbox.put(json.dumps(msg))
+
+    def recv(self, timeout=None):
+        """Returns the next message, or None if none arrives within timeout s
+
+            Raises EOFError if either end has closed the connection.
+        """
+        if self.closed:
+            raise EOFError('Connection closed')
+        try:
+            data = self.inbox.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if data is self._eof:
+            # Leave it for any later recv
+            self.inbox.put(data)
+            raise EOFError('Connection closed')
+        return json.loads(data)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.outbox.put(self._eof)
@@ -1,16 +1,43 @@
+import io
 import os
 import json
 import time
+import wave
+import base64
 import shutil
 import requests
 from datetime import datetime
 
 import numpy as np
 
+from . import channel
+from . import archive
+
+
+def encode_audio(signal, fs, fmt='wav'):
+    """Returns signal (samples, or samples x channels, -1 to 1) as the bytes of an audio file
+
+        fmt is 'wav' (16 bit), or 'flac' (which needs soundfile).
+    """
+    signal = np.asarray(signal)
+    buf = io.BytesIO()
+    if fmt == 'wav':
+        pcm = (np.clip(signal, -1, 1) * 32767).astype('<i2')
+        with wave.open(buf, 'wb') as w:
+            w.setnchannels(1 if pcm.ndim == 1 else pcm.shape[1])
+            w.setsampwidth(2)
+            w.setframerate(int(fs))
+            w.writeframes(pcm.tobytes())
+    else:
+        import soundfile as sf
+        sf.write(buf, signal, int(fs), format=fmt.upper())
+    return buf.getvalue()
+
 
 class Interface():
-    def __init__(self, alternatives=2, prompt='Choose an alternative', port=5050):
+    def __init__(self, alternatives=2, prompt='Choose an alternative', port=5050, transcript=None, name=None):
         self.prompt = prompt
+        self.name = name if name is not None else 'gustav'
         self.abort_prompt = "Experiment has been aborted."
         self.stop_prompt = "Experiment completed, thank you for participating."
         self.alternatives = alternatives
@@ -27,7 +54,29 @@ class Interface():
         os.makedirs(self.archivedir, exist_ok=True)
         self.client_portdir = f'static/exp/{port}'
         self.sessions = {}
-        self.io = {}
+        # Messages come from the server over a socket (see channel.py). If
+        # transcript is True, replies are also written to json files in the
+        # subject directory, as an audit log (the server writes requests)
+        self.channel = None
+        if transcript is None:
+            transcript = os.environ.get(channel.transcript_env, '') != ''
+        self.transcript = transcript
+        self.last_answer = None
+        # If archiving is True, messages to and from the client are added to
+        # the experiment's archive (archivedir/<name>.sqlite) as the session
+        # runs, along with the rest of the subject directory when it ends (see
+        # archive.py)
+        self.archiving = True
+        self.archiver = None
+        # Trial audio is sent to the server, which serves it from memory. If
+        # archive_audio is True, it is also added to the archive. If bundle
+        # is True, the intervals and the ISIs between them are sent as one
+        # buffer, so the browser makes one request per trial, and interval
+        # timing does not depend on request latency
+        self.audio = []
+        self.signals = None
+        self.archive_audio = False
+        self.bundle = False
 
         self.info = ''
         self.upper_left_text = ''
@@ -35,52 +84,40 @@ class Interface():
         self.lower_right_text = ''
         self.feedback_duration = 1000
 
-        self.checked = []
-
     def __repr__(self):
         return f"Gustav web interface\n  ID: {self.id}"
 
+    def connect(self, timeout=30):
+        """Connects to the server, if not already connected
+        """
+        if self.channel is None:
+            self.channel = channel.connect(timeout=timeout)
+            where = 'in-process' if isinstance(self.channel, channel.QueueChannel) else os.environ.get(channel.socket_env)
+            print(f'Connected to server: {where}')
+        return self.channel
+
     def get_resp(self, resp_type=None, sleep=0.1, max_timeout=300, max_load_attempts=3):
-        try:
-            waiting = True
-            load_attempt = 0
-            timeout_start = time.time()
-            out_dir = os.path.join(self.expdir, self.id)
-            print(f'Get resp waiting: {out_dir}', '' if resp_type is None else f' expected type: {resp_type}')
-            # checked = []
-            while waiting:
-                outs = os.listdir(out_dir)
-                for out in outs:
-                    if out.startswith('c') and out.split('.')[-1] == 'json' and out not in self.io and out not in self.checked:
-                        filename = os.path.join(out_dir, out)
-                        print(f'Found new out: {filename}')
-                        try:
-                            resp = self.load(filename)
-                            if resp_type is None:
-                                print('No type selected, read type: ', resp['type'] if 'type' in resp else None)
-                                waiting = False
-                                self.io[out] = resp
-                                ret = self.io[out]
-                            else:
-                                if resp['type'] == resp_type:
-                                    print(f'Out correct type: {resp_type} : {out}')
-                                    waiting = False
-                                    self.io[out] = resp
-                                    ret = self.io[out]
-                                else:
-                                    print(f'Out not expected: {out} is not type {resp_type}')
-                                    self.checked.append(out)
-                        except:
-                            load_attempt += 1
-                            print(f'Could not load file, attempt: {load_attempt}')
-                            time.sleep(sleep)
-                        if load_attempt >= max_load_attempts:
-                            print(f'Reached max load attempts: {max_load_attempts}, ignoring out')
-                            self.checked.append(out)
-                            load_attempt = 0
-                time.sleep(sleep)
+        """Waits for the next message from the client (via the server)
 
-            return ret
+            If resp_type is set, messages of other types are skipped. sleep 
+            and max_load_attempts are unused, and kept for compatibility.
+        """
+        try:
+            self.connect()
+            print('Get resp waiting', '' if resp_type is None else f' expected type: {resp_type}')
+            while True:
+                resp = self.channel.recv(timeout=max_timeout)
+                if resp is None:
+                    raise Exception(f'No response in {max_timeout} s')
+                if resp.get('type') == 'answer':
+                    self.last_answer = resp
+                if self.get_archiver() is not None and 'response_file' in resp:
+                    # Named as the server names its transcript files
+                    num = os.path.basename(resp['response_file'])[1:].split('_')[0]
+                    self.archiver.add(f"c{num}_{resp.get('type')}.json", json.dumps(resp, indent=2))
+                if resp_type is None or resp.get('type') == resp_type:
+                    return resp
+                print(f"Message not expected: {resp.get('type')} is not type {resp_type}")
         except:
             self.destroy(tag='no_response')
             raise Exception('Error getting input')
@@ -126,7 +163,54 @@ class Interface():
                 self.id = False
         return {'id': self.id}
 
-    def present_trial(self, exp):
+    def set_audio(self, exp, audio, fs, fmt='wav'):
+        """Sets the audio for the trial, one signal per interval
+
+            It is encoded in memory by present_trial, and sent to the server
+            with the trial, to be served from there until the next trial.
+        """
+        self.signals = (list(audio), fs, fmt)
+        self.audio = [{'name': i, 'id': i} for i in range(1, len(self.signals[0]) + 1)]
+
+    def encode_trial(self, exp, bundle=False):
+        """Encodes the trial's audio (from set_audio) into the items sent with it
+
+            If bundle is True, all of the intervals are sent as one buffer,
+            with exp.user.isi (ms) of silence between them, and each item
+            gets its 'start' and 'end' in it (s). Returns the bundle or None.
+        """
+        audio, fs, fmt = self.signals
+        if not bundle:
+            buffers = [encode_audio(a, fs, fmt) for a in audio]
+            for item, data in zip(self.audio, buffers):
+                item.update(format=fmt, data=base64.b64encode(data).decode('ascii'))
+            names = [f'{exp.run.block}_{exp.run.trials_block}_{i}.{fmt}' for i in range(1, len(audio) + 1)]
+            output = None
+        else:
+            audio = [np.asarray(a) for a in audio]
+            gap = int(round(fs * getattr(exp.user, 'isi', 0) / 1000.))
+            parts = []
+            start = 0
+            for i, (item, a) in enumerate(zip(self.audio, audio)):
+                if i > 0:
+                    parts.append(np.zeros((gap,) + a.shape[1:]))
+                    start += gap
+                parts.append(a)
+                item.update(start=start / fs, end=(start + len(a)) / fs)
+                start += len(a)
+            buffers = [encode_audio(np.concatenate(parts), fs, fmt)]
+            names = [f'{exp.run.block}_{exp.run.trials_block}.{fmt}']
+            output = {'format': fmt, 'duration': start / fs, 'data': base64.b64encode(buffers[0]).decode('ascii')}
+        if self.archive_audio and self.get_archiver() is not None:
+            for name, data in zip(names, buffers):
+                self.archiver.add(name, data)
+        self.signals = None
+        return output
+
+    def present_trial(self, exp, bundle=None):
+        if bundle is None:
+            bundle = self.bundle
+        trial_bundle = self.encode_trial(exp, bundle) if self.signals is not None else None
         # self.lower_left_text = 'Trial: {}'.format(exp.run.trials_block)
         # self.lower_right_text = f"Block {exp.run.block + 1} of {exp.var.nblocks}"
         output = {
@@ -143,6 +227,8 @@ class Interface():
                     'block': exp.run.block,
                     'trial': exp.run.trials_block
                   }
+        if trial_bundle is not None:
+            output['bundle'] = trial_bundle
         last_answer = self.find_last_answer()
         print(f'Last answer: {last_answer}')
         if last_answer is not None:
@@ -151,20 +237,29 @@ class Interface():
             filename = os.path.join(self.subjdir, f"g{exp.run.trials_block}_trial.json")
         self.dump(output, filename)
 
+    def get_archiver(self):
+        """Returns the session's archiver (None if archiving is off), starting it if need be
+        """
+        if self.archiving and self.archiver is None:
+            filename = os.path.join(self.archivedir, f'{self.name}.sqlite')
+            self.archiver = archive.Archiver(filename, self.id, self.subjdir)
+        return self.archiver
+
     def destroy(self, archive=True, sleep=1, tag=''):
-        if os.path.exists(self.subjdir):
-            if archive:
-                if tag != '':
-                    tag = '_' + tag
-                fname = os.path.join(self.archivedir, f'{self.id}{tag}')
-                shutil.make_archive(fname, 'zip', self.subjdir)
-                print(f'Archived: {self.subjdir}.zip')
-            print(f'Waiting for {sleep} s')
-            time.sleep(sleep)
-            print('Deleting...')
-            if len(os.listdir(self.subjdir)) > 1:
-                for f in os.listdir(self.subjdir):
-                    os.remove(os.path.join(self.subjdir, f))
+        """Ends the session
+
+            The connection to the server is closed, and the subject directory
+            handed to the archiver, which adds what is left in it to the
+            archive (or, if archive is False, removes the session from it)
+            and deletes it, in the background. sleep is unused, and kept for
+            compatibility.
+        """
+        if self.channel is not None:
+            self.channel.close()
+        if self.get_archiver() is not None:
+            self.archiver.close(keep=archive, tag=tag)
+            print(f'Archiving to: {self.archiver.filename}')
+        elif os.path.exists(self.subjdir):
             shutil.rmtree(self.subjdir)
 
     def abort(self, exp, prompt=None, archive=False, destroy=False):
@@ -206,14 +301,7 @@ class Interface():
         Find last answer from client
         Includes info about what the next response should be
         """
-        answers = [i for i in self.io if 'answer' in i]
-        print(f'answers: {answers}')
-        if len(answers) > 0:
-            nanswers = [int(i.split('_')[0][1:]) for i in answers]
-            last_answer = self.io[answers[np.argsort(nanswers)[-1]]]
-        else:
-            last_answer = None
-        return last_answer
+        return self.last_answer
 
     def pre_exp(self, data):
         self.read(data)
@@ -231,15 +319,31 @@ class Interface():
             data = json.load(f)
         return data
 
-    def dump(self, data=None, filename=None):
-        """Dump data to json file"""
+    def dump(self, data=None, filename=None, send=True):
+        """Send data to the server, as the reply to its last message
+
+            data (without audio) is added to the archive, as the basename of
+            filename. If transcript is True, or send is False, it is also
+            written to filename (a json file), as before messages were sent
+            over a socket.
+        """
         if data is None:
             data = self.response
+        if send:
+            self.connect().send(data)
         if filename is None:
             filename = os.path.join(self.subjdir, f"g{self.num_trial}_{self.response['type']}.json")
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
-        print(f'dump -> {filename}')
+        if data.get('items'):
+            # Leave the audio out of the transcript
+            data = dict(data, items=[{k: v for k, v in item.items() if k != 'data'} for item in data['items']])
+        if data.get('bundle'):
+            data = dict(data, bundle={k: v for k, v in data['bundle'].items() if k != 'data'})
+        if send and self.get_archiver() is not None:
+            self.archiver.add(os.path.basename(filename), json.dumps(data, indent=2))
+        if self.transcript or not send:
+            with open(filename, 'w') as f:
+                json.dump(data, f, indent=2)
+            print(f'dump -> {filename}')
 
     def dump_style(self, style=None):
         """Dump data to json file"""
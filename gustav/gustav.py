@@ -25,8 +25,30 @@ import os
 from random import shuffle
 import sys
 import getopt
+import time
+import importlib.util
 import numpy as np
 from . import utils
+from . import simulate
+from . import cache
+
+def add_path(path):
+    """Adds path to sys.path, once (run may be called many times in one process)
+    """
+    if path not in sys.path:
+        sys.path.append(path)
+
+def load_private(name, path):
+    """Loads the experiment file at path as a new module, not shared through sys.modules
+
+        Each call runs the file again, so experiments running at once in one
+        process (eg., the FlaskApp with --inprocess) do not share the
+        script's globals.
+    """
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
 
 def configure(experimentFile = None, frontend = None):
 
@@ -43,7 +65,7 @@ def configure(experimentFile = None, frontend = None):
     exp.experimentPath,exp.experimentFile = os.path.split(experimentFile)
     exp.experimentBase = os.path.splitext(exp.experimentFile)[0]
     exp.experimentFilePath = os.path.join(exp.experimentPath,exp.experimentFile)
-    sys.path.append(exp.experimentPath)
+    add_path(exp.experimentPath)
     experiment = __import__(exp.experimentBase)
 
     experiment.setup( exp )
@@ -65,7 +87,7 @@ def info(experimentFile = None, frontend = None):
     exp.experimentPath,exp.experimentFile = os.path.split(experimentFile)
     exp.experimentBase = os.path.splitext(exp.experimentFile)[0]
     exp.experimentFilePath = os.path.join(exp.experimentPath,exp.experimentFile)
-    sys.path.append(exp.experimentPath)
+    add_path(exp.experimentPath)
     experiment = __import__(exp.experimentBase)
 
     experiment.setup( exp )
@@ -73,12 +95,13 @@ def info(experimentFile = None, frontend = None):
     exp.utils.process_variables(var)
     print(exp.utils.get_variable_strtable(var))
 
-def run(experimentFile = None, subjectID = None, frontend = None, recordData = None):
+def run(experimentFile = None, subjectID = None, frontend = None, recordData = None, responder = None,
+        timeEvents = None, profileFile = None, traceMalloc = None, privateModule = False):
 
     exp = utils.exp()
     exp.utils = utils
 
-    sys.path.append( os.path.dirname( os.path.realpath( __file__ ) ) )
+    add_path( os.path.dirname( os.path.realpath( __file__ ) ) )
 
     if experimentFile == None:
         experimentFile = exp.term.get_file(None, "Open Gustav Experiment File", "", "Python or Plain Text Files (*.py *.txt);;All files (*.*)")
@@ -90,8 +113,11 @@ def run(experimentFile = None, subjectID = None, frontend = None, recordData = N
     exp.experimentPath,exp.experimentFile = os.path.split(experimentFile)
     exp.experimentBase = os.path.splitext(exp.experimentFile)[0]
     exp.experimentFilePath = os.path.join(exp.experimentPath,exp.experimentFile)
-    sys.path.append(exp.experimentPath)
-    exp.experiment = __import__(exp.experimentBase)
+    add_path(exp.experimentPath)
+    if privateModule:
+        exp.experiment = load_private(exp.experimentBase, exp.experimentFilePath)
+    else:
+        exp.experiment = __import__(exp.experimentBase)
 
     exp.experiment.setup( exp )
 
@@ -106,72 +132,104 @@ def run(experimentFile = None, subjectID = None, frontend = None, recordData = N
     exp.method = getattr(methodi, exp.method_str)
 
     exp.utils.initialize_experiment( exp )
-    if recordData is not None:
-        exp.recordData = recordData
-
-    if exp.recordData:
-        got_dataString = False
-        for datatype in exp.eventTypes:
-            if hasattr(exp, 'dataString_{}'.format(datatype)):
-                got_dataString = True
-                break
-        if not got_dataString:
-            ret = exp.frontend.get_yesno(None, title = "Gustav!",
-                    prompt = "exp.recordData == True, but no dataStrings were found so no data will be record data.\nAre you sure you want to continue?")
-            if ret:
+    if responder == 'simulate':
+        # Use the responder the experiment file set up for simulations, if any
+        responder = exp.simulateResponder or simulate.guess()
+    if responder is not None:
+        exp.responder = responder
+    if timeEvents is not None:
+        exp.timeEvents = timeEvents
+    if profileFile is not None:
+        exp.profileFile = profileFile
+    if traceMalloc is not None:
+        exp.traceMalloc = traceMalloc
+    exp.prefetcher = cache.prefetcher(cache.get_prefetch_funcs(exp.experiment))
+    exp.utils.start_profiling( exp )
+    try:
+        if exp.responder is not None:
+            exp.utils.make_headless( exp )
+        if recordData is not None:
+            exp.recordData = recordData
+
+        if exp.recordData:
+            got_dataString = False
+            for datatype in exp.eventTypes:
+                if hasattr(exp, 'dataString_{}'.format(datatype)):
+                    got_dataString = True
+                    break
+            if not got_dataString and exp.responder is not None:
                 exp.utils.log(exp, "WARNING: No data will be recorded!")
-            else:
-                exp.utils.log(exp, "Gustav cancelled at user request (Prompt to record data)")
-                return
-    else:
-        exp.utils.log(exp, "WARNING: No data will be recorded!")
-    if exp.var.order == 'menu':
-        exp.utils.menu_condition( exp )
-
-    if exp.run.gustav_is_go == False:
-        exp.utils.log(exp, "Gustav cancelled at user request (Prompt to select conditions)")
-        return
-
-    exp.run.gustav_is_go = True
-    exp.utils.do_event(exp, 'pre_exp') # gustav_is_go can now be set to false in pre_exp to cancel
-    if not exp.run.gustav_is_go:
-        exp.utils.log(exp, "Gustav cancelled (via pre_exp)")
-    else:
-        exp.utils.update_time(exp.run)
-        if not os.path.isfile(exp.dataFile):
-            exp.utils.save_data(exp, 'header')
-        exp.run.trials_exp = 0
-
-    while exp.run.gustav_is_go:
-        if exp.var.order == 'prompt':
-            exp.prompt_condition(exp)
+            elif not got_dataString:
+                ret = exp.frontend.get_yesno(None, title = "Gustav!",
+                        prompt = "exp.recordData == True, but no dataStrings were found so no data will be record data.\nAre you sure you want to continue?")
+                if ret:
+                    exp.utils.log(exp, "WARNING: No data will be recorded!")
+                else:
+                    exp.utils.log(exp, "Gustav cancelled at user request (Prompt to record data)")
+                    return
         else:
-            exp.run.condition = exp.var.orderarray[exp.run.block]
-        if exp.var.order == 'prompt' or exp.run.condition+1 not in exp.var.ignore:
-            exp.run.trials_block = 0
-            exp.utils.get_current_variables(exp)
-            exp.utils.do_event(exp, 'pre_block')
-            exp.run.block_on = True
-            while exp.run.block_on:
-                exp.run.trial_on = True
-                while exp.run.trial_on:
-                    exp.utils.do_event(exp, 'pre_trial')
-                    exp.present_trial(exp)
-                    exp.prompt_response(exp)
-                    exp.utils.do_event(exp, 'post_trial')
-                    exp.run.trials_block += 1
-                    exp.run.trials_exp += 1
-                    if not exp.run.gustav_is_go:
-                        exp.run.trial_on = False
-                        exp.run.block_on = False
-
-            exp.utils.do_event(exp, 'post_block')
-            exp.run.block += 1
-            if exp.var.order != 'prompt' and exp.run.block == exp.run.nblocks:
-                exp.run.gustav_is_go = False
-
-    # End gustav_is_go loop
-    exp.utils.do_event(exp, 'post_exp')
+            exp.utils.log(exp, "WARNING: No data will be recorded!")
+        if exp.var.order == 'menu' and exp.responder is None:
+            exp.utils.menu_condition( exp )
+
+        if exp.run.gustav_is_go == False:
+            exp.utils.log(exp, "Gustav cancelled at user request (Prompt to select conditions)")
+            return
+
+        exp.run.gustav_is_go = True
+        exp.utils.do_event(exp, 'pre_exp') # gustav_is_go can now be set to false in pre_exp to cancel
+        t0 = (time.perf_counter(), time.process_time())
+        if not exp.run.gustav_is_go:
+            exp.utils.log(exp, "Gustav cancelled (via pre_exp)")
+        else:
+            exp.utils.update_time(exp.run)
+            if not os.path.isfile(exp.dataFile):
+                exp.utils.save_data(exp, 'header')
+            exp.run.trials_exp = 0
+
+        while exp.run.gustav_is_go:
+            if exp.var.order == 'prompt':
+                exp.prompt_condition(exp)
+            else:
+                exp.run.condition = exp.var.orderarray[exp.run.block]
+            if exp.var.order == 'prompt' or exp.run.condition+1 not in exp.var.ignore:
+                exp.run.trials_block = 0
+                exp.utils.get_current_variables(exp)
+                exp.utils.do_event(exp, 'pre_block')
+                exp.run.block_on = True
+                while exp.run.block_on:
+                    exp.run.trial_on = True
+                    while exp.run.trial_on:
+                        exp.utils.do_event(exp, 'pre_trial')
+                        # Make the likely next stimuli while this one is presented and answered
+                        exp.prefetcher.finish()
+                        exp.prefetcher.start(exp)
+                        exp.utils.time_call(exp, 'present_trial', exp.present_trial)
+                        exp.utils.time_call(exp, 'prompt_response', exp.prompt_response)
+                        exp.utils.do_event(exp, 'post_trial')
+                        exp.run.trials_block += 1
+                        exp.run.trials_exp += 1
+                        if not exp.run.gustav_is_go:
+                            exp.run.trial_on = False
+                            exp.run.block_on = False
+
+                exp.utils.do_event(exp, 'post_block')
+                exp.run.block += 1
+                if exp.var.order != 'prompt' and exp.run.block == exp.run.nblocks:
+                    exp.run.gustav_is_go = False
+
+        # End gustav_is_go loop
+        exp.utils.do_event(exp, 'post_exp')
+        if exp.responder is not None and exp.run.trials_exp > 0:
+            wall, cpu = time.perf_counter() - t0[0], time.process_time() - t0[1]
+            exp.utils.log(exp, "Headless run: {} trials in {:.3f} s; per trial: {:.3f} ms wall, {:.3f} ms cpu\n".format(
+                exp.run.trials_exp, wall, wall / exp.run.trials_exp * 1000., cpu / exp.run.trials_exp * 1000.))
+    finally:
+        exp.prefetcher.shutdown()
+        exp.utils.restore_headless(exp)
+        exp.utils.stop_profiling(exp)
+        # Flush and close data and log files, even if a form or an event raised
+        exp.utils.close_writer(exp)
     if exp.logConsoleDelay:
         print(exp.logConsoleDelay_str)
 
@@ -181,9 +239,14 @@ def main(argv):
     subjectID = None
     frontend = None
     recordData = None
+    responder = None
+    timeEvents = None
+    profileFile = None
+    traceMalloc = None
     action = 'run'
     try:
-        opts, args = getopt.getopt(argv, "hcdif:e:s:", ["help", "config", "dontrecord", "info", "frontend=", "experimentFile=", "subjectID="])
+        opts, args = getopt.getopt(argv, "hcdif:e:s:r:Stp:m", ["help", "config", "dontrecord", "info", "frontend=", "experimentFile=", "subjectID=", "replay=", "simulate",
+                                                           "timing", "profile=", "tracemalloc"])
     except (getopt.error, msg):
         print(msg)
         print("for help use --help")
@@ -204,12 +267,23 @@ def main(argv):
             recordData = False
         elif var in ("--info", "-i"):
             action = 'info'
+        elif var in ("--replay", "-r"):
+            responder = simulate.replay(val)
+        elif var in ("--simulate", "-S"):
+            responder = 'simulate'
+        elif var in ("--timing", "-t"):
+            timeEvents = True
+        elif var in ("--profile", "-p"):
+            profileFile = val
+        elif var in ("--tracemalloc", "-m"):
+            traceMalloc = True
     if action in ('config'):
         configure(experimentFile = experimentFile, frontend = frontend)
     elif action in ('list'):
         info(experimentFile = experimentFile, frontend = frontend)
     else:
-        run(experimentFile = experimentFile, subjectID = subjectID, frontend = frontend, recordData = recordData)
+        run(experimentFile = experimentFile, subjectID = subjectID, frontend = frontend, recordData = recordData, responder = responder,
+            timeEvents = timeEvents, profileFile = profileFile, traceMalloc = traceMalloc)
 
 if __name__ == '__main__':
     main(sys.argv[1:])
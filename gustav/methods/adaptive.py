@@ -42,8 +42,15 @@
             'vals_to_avg': 0,    # The number of values (at reversal) to average
             'step': step,        # A custom step function [optional]
            }
+
+    In pre_block this dict is replaced by a Staircase, which behaves like
+    the dict but keeps the track histories in preallocated numpy arrays.
 """
 import os, codecs
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
 import numpy as np
 
 # TODO: change vals to types, so we can specify the type on initialize error
@@ -92,6 +99,270 @@ dynamic_vars_track = {           # Tracking stuff
                                  #  'cn' for ceiling trials
            }
 
+class Staircase(MutableMapping):
+    """The state of one adaptive track, backed by preallocated numpy arrays
+
+        The method creates one of these for each block, and puts it in 
+        exp.var.dynamic. Tracking state is held in fixed attributes, and the 
+        values, track and values_at_rev histories in numpy buffers sized 
+        from max_trials (or run_n_trials), so each trial is an O(1) update.
+
+        It is also a mutable mapping with the same keys as the old dynamic
+        dict, so $dynamic[...] expansion, custom step functions, and other 
+        code that uses exp.var.dynamic['value'] etc. keep working. 'values', 
+        'track' and 'values_at_rev' are returned as (read-only) numpy views 
+        of the filled part of each buffer. Any other keys (name, units, 
+        step, or custom keys) are stored in a plain dict.
+    """
+    __slots__ = (
+        'params',
+        # User settings used on every trial
+        'steps', 'downs', 'ups', 'val_floor', 'val_ceil', 'val_floor_n', 
+        'val_ceil_n', 'run_n_trials', 'max_trials', 'vals_to_avg',
+        # Tracking state
+        'value', 'val_floor_count', 'val_ceil_count', 'prev_dir', 'init_dir', 
+        'cur_ups', 'cur_dns', 'cur_step', 'correct', 'cur_correct', 
+        'cur_status', 'n_reversals', 'msg', 'good_run', 'mean', 'sd',
+        # History buffers
+        'n_trials', '_values', '_track', '_values_at_rev',
+        )
+    param_fields = ('steps', 'downs', 'ups', 'val_floor', 'val_ceil', 'val_floor_n', 
+                    'val_ceil_n', 'run_n_trials', 'max_trials', 'vals_to_avg')
+    state_fields = ('value', 'val_floor_count', 'val_ceil_count', 'prev_dir', 'init_dir', 
+                    'cur_ups', 'cur_dns', 'cur_step', 'correct', 'cur_correct', 
+                    'cur_status', 'n_reversals', 'msg', 'good_run', 'mean', 'sd')
+    array_fields = ('values', 'track', 'values_at_rev')
+
+    def __init__(self, params):
+        self.params = {}
+        for key, val in params.items():
+            if key in self.param_fields:
+                setattr(self, key, val)
+            elif key not in self.state_fields and key not in self.array_fields:
+                self.params[key] = val
+        for key, val in dynamic_vars_block.items():
+            if key not in self.array_fields:
+                setattr(self, key, val)
+        for key, val in dynamic_vars_track.items():
+            setattr(self, key, val)
+        self.value = params['val_start']
+        self.n_reversals = 0
+        self.mean = np.nan
+        self.sd = np.nan
+        # finish_trial ends the block after trial max_trials+1 (trials_block is 0-based)
+        size = max(self.max_trials, self.run_n_trials) + 1
+        if size == 1:
+            size = 64
+        # Keep ints as ints, so datafiles look the same as with lists
+        # (the buffers become float if a step function makes the value one; see _fit)
+        dtype = np.result_type(self.value, self.val_floor, self.val_ceil, *self.steps)
+        self.n_trials = 0
+        self._values = np.zeros(size, dtype=dtype)
+        self._track = np.zeros(size, dtype=np.int8)
+        self._values_at_rev = np.zeros(max(len(self.steps), 1), dtype=dtype)
+
+    def user_params(self):
+        """Returns a dict of the settings the track was created with
+        """
+        out = dict(self.params)
+        for key in self.param_fields:
+            out[key] = getattr(self, key)
+        return out
+
+    # Mapping interface
+    def _view(self, key):
+        if key == 'values':
+            buf = self._values[:self.n_trials]
+        elif key == 'track':
+            buf = self._track[:self.n_trials]
+        else:
+            buf = self._values_at_rev[:self.n_reversals]
+        buf.flags.writeable = False
+        return buf
+
+    def __getitem__(self, key):
+        if key in self.array_fields:
+            return self._view(key)
+        elif key in self.param_fields or key in self.state_fields:
+            return getattr(self, key)
+        return self.params[key]
+
+    def __setitem__(self, key, val):
+        if key in self.array_fields:
+            val = np.asarray(val)
+            if key in ('values', 'values_at_rev'):
+                self._fit(val)
+            if key == 'values':
+                self._values = np.resize(self._values, max(len(self._values), len(val)))
+                self._track = np.resize(self._track, len(self._values))
+                self._values[:len(val)] = val
+                self.n_trials = len(val)
+            elif key == 'track':
+                self._track[:len(val)] = val
+            else:
+                self._values_at_rev = np.resize(self._values_at_rev, max(len(self._values_at_rev), len(val)))
+                self._values_at_rev[:len(val)] = val
+                self.n_reversals = len(val)
+        elif key in self.param_fields or key in self.state_fields:
+            setattr(self, key, val)
+        else:
+            self.params[key] = val
+
+    def __delitem__(self, key):
+        if key in self.params:
+            del self.params[key]
+        else:
+            raise KeyError("Cannot delete tracking field: {}".format(key))
+
+    def __iter__(self):
+        for key in self.param_fields:
+            yield key
+        for key in self.state_fields:
+            yield key
+        for key in self.array_fields:
+            yield key
+        for key in self.params:
+            yield key
+
+    def __len__(self):
+        return len(self.param_fields) + len(self.state_fields) + len(self.array_fields) + len(self.params)
+
+    def __contains__(self, key):
+        return key in self.params or key in self.param_fields or key in self.state_fields or key in self.array_fields
+
+    def __repr__(self):
+        return "Staircase({})".format(dict(self.items()))
+
+    # Tracking
+    def _fit(self, val):
+        # Upcast the value buffers if val can't be stored in them as is (eg., 
+        # a custom step function made an int track's value 24.5), so what is 
+        # recorded is what was presented
+        dtype = np.result_type(self._values, val)
+        if dtype != self._values.dtype:
+            self._values = self._values.astype(dtype)
+            self._values_at_rev = self._values_at_rev.astype(dtype)
+
+    def _grow(self):
+        self._values = np.resize(self._values, len(self._values) * 2)
+        self._track = np.resize(self._track, len(self._values))
+
+    def record(self, correct):
+        """Records the current value and response, and detects reversals
+        """
+        self.cur_correct = correct
+        n = self.n_trials
+        if n == len(self._values):
+            self._grow()
+        self._fit(self.value)
+        self._values[n] = self.value
+        self.n_trials = n + 1
+        rev = 0
+        if correct:                                 # It's a down
+            self.cur_dns += 1
+            self.cur_ups = 0
+            if self.cur_dns == self.downs:          # We have the right number of dns
+                self.cur_step = -1
+                self.cur_dns = 0
+                if self.prev_dir == 0:              # No previous direction (must be start)
+                    self.init_dir = -1
+                    self.cur_status = "v"
+                elif self.prev_dir == 1:            # Reversal
+                    rev = -1
+                else:
+                    self.cur_status = " "
+                self.prev_dir = -1
+            else:
+                self.cur_step = 0
+                self.cur_status = " "
+        else:                                       # It's an up
+            self.cur_dns = 0
+            self.cur_ups += 1
+            if self.cur_ups == self.ups:            # We have the right number of ups
+                self.cur_step = 1
+                self.cur_ups = 0
+                if self.prev_dir == 0:
+                    self.init_dir = 1
+                    self.cur_status = "^"
+                elif self.prev_dir == -1:
+                    rev = 1
+                else:
+                    self.cur_status = " "
+                self.prev_dir = 1
+            else:
+                self.cur_step = 0
+                self.cur_status = " "
+        self._track[n] = rev
+        if rev != 0:
+            if self.n_reversals == len(self._values_at_rev):
+                self._values_at_rev = np.resize(self._values_at_rev, len(self._values_at_rev) * 2)
+            self._values_at_rev[self.n_reversals] = self.value
+            self.n_reversals += 1
+            self.cur_status = "{}{:}".format("-" if rev == -1 else "+", self.n_reversals)
+
+    def finish(self, trials_block):
+        """Checks for end-of-block situations, returns False if the block should end
+
+            trials_block is the (0-based) number of the current trial in the block
+        """
+        block_on = True
+        if self.value == self.val_floor:
+            if self.cur_step == -1:
+                self.val_floor_count += 1
+                self.cur_status = "f{:}".format(self.val_floor_count)
+            elif not self.cur_correct:
+                self.val_floor_count = 0
+            if self.val_floor_count == self.val_floor_n:
+                block_on = False
+                self.msg = "{:} consecutive floor trials reached".format(self.val_floor_n)
+        else:
+            self.val_floor_count = 0
+        if self.value == self.val_ceil:
+            if self.cur_step == 1:
+                self.val_ceil_count += 1
+                self.cur_status = "c{:}".format(self.val_ceil_count)
+            elif self.cur_correct:  # At ceil, correct, but not a step. So reset ceil_count
+                self.val_ceil_count = 0
+            if self.val_ceil_count == self.val_ceil_n:
+                block_on = False
+                self.msg = "{:} consecutive ceiling trials reached".format(self.val_ceil_n)
+        else:
+            self.val_ceil_count = 0
+
+        if block_on:
+            if self.run_n_trials > 0 and trials_block == self.run_n_trials:
+                block_on = False
+                self.good_run = True
+                self.msg = "{:} trials reached".format(self.run_n_trials)
+            elif self.max_trials > 0 and trials_block == self.max_trials:
+                block_on = False
+                self.good_run = True
+                self.msg = "A maximum of {:} trials reached".format(self.max_trials)
+            elif self.n_reversals == len(self.steps)-1: # -1 because we added one to len in pre_exp
+                block_on = False
+                self.good_run = True
+                self.msg = "{:} reversals reached".format(len(self.steps)-1)
+        return block_on
+
+    def apply_step(self):
+        """The default step: move value by the step size for the current reversal
+        """
+        self.value += self.cur_step * self.steps[self.n_reversals]
+        self.value = max(self.value, self.val_floor)
+        self.value = min(self.value, self.val_ceil)
+
+    def summarize(self):
+        """Sets mean and sd of the last vals_to_avg values at reversals
+        """
+        if self.good_run:
+            vals = self._values_at_rev[:self.n_reversals][self.vals_to_avg*-1:]
+            self.mean = np.mean(vals)
+            self.sd = np.std(vals)
+        else:
+            self.mean = np.nan
+            self.sd = np.nan
+
+
 def step(exp):
     """ The step function
         
@@ -106,130 +377,41 @@ def step(exp):
             exp.var.dynamic['value'] = min(exp.var.dynamic['value'], exp.var.dynamic['val_ceil'])
         exp.var.dynamic['step'] = step
     """
-    exp.var.dynamic['value'] += exp.var.dynamic['cur_step'] * exp.var.dynamic['steps'][exp.var.dynamic['n_reversals']]
-    exp.var.dynamic['value'] = max(exp.var.dynamic['value'], exp.var.dynamic['val_floor'])
-    exp.var.dynamic['value'] = min(exp.var.dynamic['value'], exp.var.dynamic['val_ceil'])
+    exp.var.dynamic.apply_step()
 
 
 def track(exp):
     """ The tracking function
     """
-    exp.var.dynamic['values'].append(exp.var.dynamic['value'])
-    if exp.var.dynamic['cur_correct']:                         #It's a down
-        exp.var.dynamic['cur_dns'] += 1                        # Increment dns
-        exp.var.dynamic['cur_ups'] = 0                         # Reset ups
-        if exp.var.dynamic['cur_dns'] == exp.var.dynamic['downs']: # If we have the right number of dns
-            exp.var.dynamic['cur_step'] = -1                   #  Set current step
-            exp.var.dynamic['cur_dns'] = 0                     #  Reset dns
-            if exp.var.dynamic['prev_dir'] == -1:              #  If previous direction was dn
-                exp.var.dynamic['track'].append(0)             #   No reversal
-                exp.var.dynamic['cur_status'] = " "
-            elif exp.var.dynamic['prev_dir'] == 0:             #  No previous direction (must be start)
-                exp.var.dynamic['prev_dir'] = -1               #   Set prev_dir
-                exp.var.dynamic['track'].append(0)             #   Don't record this as a change
-                exp.var.dynamic['init_dir'] = -1               #   Set initial direction
-                exp.var.dynamic['cur_status'] = "v"
-            else:                                          #  Otherwise, its a reversal
-                exp.var.dynamic['prev_dir'] = -1               #   Set prev_dir
-                exp.var.dynamic['track'].append(-1)            #   Record reversal
-                exp.var.dynamic['n_reversals'] += 1            #   Count it
-                exp.var.dynamic['values_at_rev'].append(exp.var.dynamic['value'])
-                exp.var.dynamic['cur_status'] = "-{:}".format(len(exp.var.dynamic['values_at_rev']))
-        else:
-            exp.var.dynamic['cur_step'] = 0                    #  No current step
-            exp.var.dynamic['track'].append(0)                 #   No reversal
-            exp.var.dynamic['cur_status'] = " "
-    else:                                                      #It's an up
-        exp.var.dynamic['cur_dns'] = 0                         # Reset dns
-        exp.var.dynamic['cur_ups'] += 1                        # Increment ups
-        if exp.var.dynamic['cur_ups'] == exp.var.dynamic['ups']: # If we have the right number of ups
-            exp.var.dynamic['cur_step'] = 1                    #  Set current step
-            exp.var.dynamic['cur_ups'] = 0                     #  Reset ups
-            if exp.var.dynamic['prev_dir'] == 1:               #  If previous direction was up
-                exp.var.dynamic['track'].append(0)             #   No reversal
-                exp.var.dynamic['cur_status'] = " "
-            elif exp.var.dynamic['prev_dir'] == 0:             #  If no previous direction (must be start)
-                exp.var.dynamic['prev_dir'] = 1                #   Set prev_dir
-                exp.var.dynamic['track'].append(0)             #   Don't record this as a change
-                exp.var.dynamic['init_dir'] = 1                #   Set initial direction
-                exp.var.dynamic['cur_status'] = "^"
-            else:                                          #  Otherwise, its a reversal
-                exp.var.dynamic['prev_dir'] = 1                #   Set prev_dir
-                exp.var.dynamic['track'].append(1)             #   Record reversal
-                exp.var.dynamic['n_reversals'] += 1            #   Count it
-                exp.var.dynamic['values_at_rev'].append(exp.var.dynamic['value'])
-                exp.var.dynamic['cur_status'] = "+{:}".format(len(exp.var.dynamic['values_at_rev']))
-        else:                                                  # Not a reversal
-            exp.var.dynamic['cur_step'] = 0                    #   No current step
-            exp.var.dynamic['track'].append(0)                 #   No reversal
-            exp.var.dynamic['cur_status'] = " "
+    exp.var.dynamic.record(exp.var.dynamic.cur_correct)
 
 
 def finish_trial(exp):
     '''Check for various end-of-block situations
     '''
-    if exp.var.dynamic['value'] == exp.var.dynamic['val_floor']:
-        if exp.var.dynamic['cur_step'] == -1:
-            exp.var.dynamic['val_floor_count'] += 1
-            exp.var.dynamic['cur_status'] = "f{:}".format(exp.var.dynamic['val_floor_count'])
-        elif  not exp.var.dynamic['cur_correct']:
-            exp.var.dynamic['val_floor_count'] = 0
-        if exp.var.dynamic['val_floor_count'] == exp.var.dynamic['val_floor_n']:
-            exp.run.block_on = False
-            exp.var.dynamic['msg'] = "{:} consecutive floor trials reached".format(exp.var.dynamic['val_floor_n'])
-    else:
-        exp.var.dynamic['val_floor_count'] = 0
-    if exp.var.dynamic['value'] == exp.var.dynamic['val_ceil']:
-        if exp.var.dynamic['cur_step'] == 1:
-            exp.var.dynamic['val_ceil_count'] += 1
-            exp.var.dynamic['cur_status'] = "c{:}".format(exp.var.dynamic['val_ceil_count'])
-        elif exp.var.dynamic['cur_correct']:  # At ceil, correct, but not a step. So reset ceil_count
-            exp.var.dynamic['val_ceil_count'] = 0
-        if exp.var.dynamic['val_ceil_count'] == exp.var.dynamic['val_ceil_n']:
-            exp.run.block_on = False
-            exp.var.dynamic['msg'] = "{:} consecutive ceiling trials reached".format(exp.var.dynamic['val_ceil_n'])
-    else:
-        exp.var.dynamic['val_ceil_count'] = 0
-
-    if exp.run.block_on:
-        if exp.var.dynamic['run_n_trials'] > 0 and exp.run.trials_block == exp.var.dynamic['run_n_trials']:
-            exp.run.block_on = False
-            exp.var.dynamic['good_run'] = True
-            exp.var.dynamic['msg'] = "{:} trials reached".format(exp.var.dynamic['run_n_trials'])
-        elif exp.var.dynamic['max_trials'] > 0 and exp.run.trials_block == exp.var.dynamic['max_trials']:
-            exp.run.block_on = False
-            exp.var.dynamic['good_run'] = True
-            exp.var.dynamic['msg'] = "A maximum of {:} trials reached".format(exp.var.dynamic['max_trials'])
-        elif exp.var.dynamic['n_reversals'] == len(exp.var.dynamic['steps'])-1: # -1 because we added one to len in pre_exp
-            exp.run.block_on = False
-            exp.var.dynamic['good_run'] = True
-            exp.var.dynamic['msg'] = "{:} reversals reached".format(len(exp.var.dynamic['steps'])-1)
+    if not exp.var.dynamic.finish(exp.run.trials_block):
+        exp.run.block_on = False
 
 def pre_block(exp):
+    if isinstance(exp.var.dynamic, Staircase):
+        params = exp.var.dynamic.user_params()
+    else:
+        params = dict(exp.var.dynamic)
     missing_vars = ''
     for key,val in dynamic_vars_user.items():
-        if key not in exp.var.dynamic:
+        if key not in params:
             missing_vars += "exp.var.dynamic['{}']\n".format(key)
     if missing_vars != '':
             raise Exception("The following dynamic variables must be set: \n\n{}".format(missing_vars))
-    d = exp.var.dynamic.copy()
-    exp.var.dynamic = dynamic_vars_block.copy()
-    exp.var.dynamic.update(dynamic_vars_track.copy())
-    exp.var.dynamic.update(d.copy())
+    # A new track for every block; all tracking state starts from the defaults
+    exp.var.dynamic = Staircase(params)
     if 'step' in exp.var.dynamic:
         exp.dynamic_step = exp.var.dynamic['step']
     else:
         exp.dynamic_step = step
-    exp.var.dynamic['value'] = exp.var.dynamic['val_start']
-    exp.var.dynamic['values'] = []
-    exp.var.dynamic['track'] = []
-    exp.var.dynamic['values_at_rev'] = []
-    exp.var.dynamic['prev_dir'] = 0
-    exp.var.dynamic['init_dir'] = 0
-    exp.var.dynamic['n_reversals'] = 0
 
 def post_trial(exp):
-    exp.var.dynamic['cur_correct'] = str(exp.run.response)==str(exp.var.dynamic['correct'])
+    exp.var.dynamic.cur_correct = str(exp.run.response)==str(exp.var.dynamic.correct)
     track(exp)
     finish_trial(exp)
     exp.dynamic_step(exp)
@@ -237,12 +419,28 @@ def post_trial(exp):
     exp.run.trial_on = False
 
 def post_block(exp):
-    if exp.var.dynamic['good_run']:
-        exp.var.dynamic['mean'] = np.mean(exp.var.dynamic['values_at_rev'][exp.var.dynamic['vals_to_avg']*-1:])
-        exp.var.dynamic['sd'] = np.std(exp.var.dynamic['values_at_rev'][exp.var.dynamic['vals_to_avg']*-1:])
-    else:
-        exp.var.dynamic['mean'] = np.nan
-        exp.var.dynamic['sd'] = np.nan
+    exp.var.dynamic.summarize()
+
+
+def predict_next(exp):
+    """Returns the possible (current, dynamic value) pairs for the next trial
+
+        Used to make stimuli ahead of time (see cache.prefetcher). The next
+        value is the current one, or one step down or up, with the current
+        step size, or the next one if this trial is a reversal. The most 
+        likely (no step) comes first.
+    """
+    d = exp.var.dynamic
+    if not isinstance(d, Staircase):
+        return []
+    vals = []
+    for i in (d.n_reversals, d.n_reversals + 1):
+        if i < len(d.steps):
+            for direction in (0, -1, 1):
+                val = min(max(d.value + direction * d.steps[i], d.val_floor), d.val_ceil)
+                if val not in vals:
+                    vals.append(val)
+    return [(exp.var.current, val) for val in vals]
 
 
 def pre_exp(exp):
@@ -270,23 +468,21 @@ def save_data_block(exp):
         The files are written so as to be an executable python script, 
         and the data for runs are stored in python classes.
     """
-    if os.path.isfile(exp.dataFile):
-        f = codecs.open(exp.dataFile, encoding='utf-8', mode='a')
-    else:
-        f = codecs.open(exp.dataFile, encoding='utf-8', mode='w')
-        f.write("# -*- coding: utf-8 -*-\n\n# A datafile created by Gustav!\n\n")
-        f.write("# Experiment: {}\n\n'''{}\n'''\n\n".format(exp.name, exp.comments))
+    out = ""
+    if not exp.utils.data_exists(exp, exp.dataFile):
+        out += "# A datafile created by Gustav!\n\n"
+        out += "# Experiment: {}\n\n'''{}\n'''\n\n".format(exp.name, exp.comments)
         
-    f.write("class block_{}_{} ():\n".format(exp.run.date.replace("-","_"), exp.run.time.replace(":","_")))
+    out += "class block_{}_{} ():\n".format(exp.run.date.replace("-","_"), exp.run.time.replace(":","_"))
     indent="    "
-    f.write(exp.utils.obj_to_str(exp.name,'name',indent))
-    f.write(exp.utils.obj_to_str(exp.note,'note',indent))
-    f.write(exp.utils.obj_to_str(exp.subjID,'subjID',indent))
-    f.write(exp.utils.obj_to_str(exp.run.date,'date',indent))
-    f.write(exp.utils.obj_to_str(exp.run.time,'time',indent))
-    f.write(exp.utils.obj_to_str(exp.host,'host',indent))
-    f.write(exp.utils.obj_to_str(exp.var.current,'variables',indent))
-    f.write(exp.utils.obj_to_str(exp.user,'user',indent))
-    f.write(exp.utils.obj_to_str(exp.var.dynamic,'dynamic',indent))
-    f.write("\n")
-    f.close()
+    out += exp.utils.obj_to_str(exp.name,'name',indent)
+    out += exp.utils.obj_to_str(exp.note,'note',indent)
+    out += exp.utils.obj_to_str(exp.subjID,'subjID',indent)
+    out += exp.utils.obj_to_str(exp.run.date,'date',indent)
+    out += exp.utils.obj_to_str(exp.run.time,'time',indent)
+    out += exp.utils.obj_to_str(exp.host,'host',indent)
+    out += exp.utils.obj_to_str(exp.var.current,'variables',indent)
+    out += exp.utils.obj_to_str(exp.user,'user',indent)
+    out += exp.utils.obj_to_str(exp.var.dynamic,'dynamic',indent)
+    out += "\n"
+    exp.utils.write_out(exp, out, exp.dataFile)
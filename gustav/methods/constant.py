@@ -37,6 +37,8 @@
     startblock and starttrial are intended for crash recovery, and are optional.
 """
 
+import collections
+
 constant_vars = {
     'trialsperblock' : 10,
     'startblock' : 1,
@@ -81,3 +83,22 @@ def post_trial(exp):
         exp.run.block_on = False
     exp.run.trial_on = False
 
+
+def predict_next(exp):
+    """Returns the possible (current, dynamic value) pairs for the next trial
+
+        Used to make stimuli ahead of time (see cache.prefetcher). Within a 
+        block the levels do not change. On the last trial of a block, the 
+        levels for the next block are returned, if they are known.
+    """
+    if exp.run.trials_block < exp.var.constant['trialsperblock']-1:
+        return [(exp.var.current, None)]
+    if exp.var.order == 'prompt' or exp.run.block+1 >= min(exp.run.nblocks, len(exp.var.orderarray)):
+        return []
+    condition = exp.var.orderarray[exp.run.block+1]
+    current = collections.OrderedDict()
+    for v in exp.var.varlist:
+        if v in exp.var.prompt:
+            return []
+        current[v] = exp.var.levelsbycond[v][condition]
+    return [(current, None)]
@@ -269,23 +269,21 @@ def save_data_block(exp):
         The files are written so as to be an executable python script, 
         and the data for runs are stored in python classes.
     """
-    if os.path.isfile(exp.dataFile):
-        f = codecs.open(exp.dataFile, encoding='utf-8', mode='a')
-    else:
-        f = codecs.open(exp.dataFile, encoding='utf-8', mode='w')
-        f.write("# -*- coding: utf-8 -*-\n\n# A datafile created by Gustav!\n\n")
-        f.write("# Experiment: {}\n\n'''{}\n'''\n\n".format(exp.name, exp.comments))
+    out = ""
+    if not exp.utils.data_exists(exp, exp.dataFile):
+        out += "# A datafile created by Gustav!\n\n"
+        out += "# Experiment: {}\n\n'''{}\n'''\n\n".format(exp.name, exp.comments)
         
-    f.write("class block_{}_{} ():\n".format(exp.run.date.replace("-","_"), exp.run.time.replace(":","_")))
+    out += "class block_{}_{} ():\n".format(exp.run.date.replace("-","_"), exp.run.time.replace(":","_"))
     indent="    "
-    f.write(exp.utils.obj_to_str(exp.name,'name',indent))
-    f.write(exp.utils.obj_to_str(exp.note,'note',indent))
-    f.write(exp.utils.obj_to_str(exp.subjID,'subjID',indent))
-    f.write(exp.utils.obj_to_str(exp.run.date,'date',indent))
-    f.write(exp.utils.obj_to_str(exp.run.time,'time',indent))
-    f.write(exp.utils.obj_to_str(exp.host,'host',indent))
-    f.write(exp.utils.obj_to_str(exp.var.current,'variables',indent))
-    f.write(exp.utils.obj_to_str(exp.user,'user',indent))
-    f.write(exp.utils.obj_to_str(exp.var.dynamic,'dynamic',indent))
-    f.write("\n")
-    f.close()
+    out += exp.utils.obj_to_str(exp.name,'name',indent)
+    out += exp.utils.obj_to_str(exp.note,'note',indent)
+    out += exp.utils.obj_to_str(exp.subjID,'subjID',indent)
+    out += exp.utils.obj_to_str(exp.run.date,'date',indent)
+    out += exp.utils.obj_to_str(exp.run.time,'time',indent)
+    out += exp.utils.obj_to_str(exp.host,'host',indent)
+    out += exp.utils.obj_to_str(exp.var.current,'variables',indent)
+    out += exp.utils.obj_to_str(exp.user,'user',indent)
+    out += exp.utils.obj_to_str(exp.var.dynamic,'dynamic',indent)
+    out += "\n"
+    exp.utils.write_out(exp, out, exp.dataFile)
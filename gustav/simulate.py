@@ -0,0 +1,461 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2010-2020 Christopher Brown
+#
+# This file is part of gustav.
+#
+# gustav is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# gustav is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gustav.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Comments and/or additions are welcome. Send e-mail to: cbrown1@pitt.edu.
+#
+
+
+"""Simulated listeners for choosing method parameters offline
+
+    Before running an experiment, it is useful to know how a given set of
+    adaptive parameters (steps, downs, ups, max_trials, vals_to_avg, etc.)
+    will behave: how biased and how variable the threshold estimates are,
+    how many trials a block takes, and how often tracks end at the floor or
+    ceiling. This module runs many simulated blocks against a simulated
+    listener, vectorized across runs with numpy. No frontend, form, or
+    experiment file is needed:
+
+        >>> dynamic = {'alternatives': 3, 'steps': [4, 4, 2, 2, 2, 2, 2, 2],
+        ...     'downs': 2, 'ups': 1, 'val_start': 20, 'val_floor': -20,
+        ...     'val_ceil': 40, 'val_floor_n': 3, 'val_ceil_n': 3,
+        ...     'run_n_trials': 0, 'max_trials': 60, 'vals_to_avg': 6}
+        >>> r = gustav.simulate.adaptive(dynamic, midpoint=10, slope=.5, n_runs=5000)
+        >>> print(gustav.simulate.report(r))
+
+    dynamic is the dict you would set as exp.var.dynamic (the first step
+    is repeated internally, as the adaptive method does in pre_exp). Custom
+    step functions are not used; the default step is simulated.
+
+    The default listener is a logistic psychometric function, with a guess
+    rate of 1/alternatives and an optional lapse rate. Any other function
+    that takes an array of values and returns an array of probabilities
+    correct can be passed as listener.
+
+    The method of constant stimuli can be simulated in the same way, see
+    constant.
+
+    The responders at the end of this module (replay, guess, psychometric)
+    supply responses to a headless run of a complete experiment script; 
+    see gustav.run and utils.make_headless.
+"""
+
+import functools
+import numpy as np
+
+# Why an adaptive track ended. The index is stored in results['end']
+end_reasons = (
+    'none',         # Did not end within max_iter trials
+    'floor',        # val_floor_n consecutive floor trials
+    'ceiling',      # val_ceil_n consecutive ceiling trials
+    'run_n_trials', # run_n_trials reached
+    'max_trials',   # max_trials reached
+    'reversals',    # All reversals reached
+    )
+
+
+def logistic(x, midpoint, slope, alternatives=2, lapse=0.):
+    """A logistic psychometric function
+
+        Returns the probability of a correct response at each value in x.
+        The function goes from the guess rate (1/alternatives) to 1-lapse,
+        and is halfway between the two at midpoint. Set alternatives to 1
+        for a yes/no task (no guessing).
+    """
+    guess = 1. / alternatives if alternatives > 1 else 0.
+    x = np.asarray(x, dtype=float)
+    return guess + (1. - guess - lapse) / (1. + np.exp(-slope * (x - midpoint)))
+
+
+def logistic_inverse(p, midpoint, slope, alternatives=2, lapse=0.):
+    """Returns the value at which the logistic function gives probability p
+    """
+    guess = 1. / alternatives if alternatives > 1 else 0.
+    return midpoint - np.log((1. - guess - lapse) / (p - guess) - 1.) / slope
+
+
+def target_p(downs, ups):
+    """Returns the probability correct that a transformed up-down track converges on
+
+        That is, the p at which a step down (downs consecutive correct before
+        ups consecutive incorrect) is as likely as a step up. Eg., .707 for
+        2-down 1-up, .794 for 3-down 1-up (Levitt, 1971).
+    """
+    lo, hi = 0., 1.
+    for i in range(60):
+        p = (lo + hi) / 2.
+        q = 1. - p
+        a, b = p**(downs - 1), q**(ups - 1)
+        if a * (1. - q**ups) / (a + b - a * b) < .5:
+            lo = p
+        else:
+            hi = p
+    return (lo + hi) / 2.
+
+
+def _listener(listener, midpoint, slope, alternatives, lapse):
+    if listener is None:
+        listener = functools.partial(logistic, midpoint=midpoint, slope=slope,
+                                     alternatives=alternatives, lapse=lapse)
+    return listener
+
+
+def adaptive(dynamic, midpoint, slope, n_runs=1000, lapse=0., listener=None,
+             max_iter=1000, seed=None):
+    """Simulates n_runs blocks of the adaptive method
+
+        dynamic is the dict of adaptive parameters (as exp.var.dynamic), and
+        midpoint, slope and lapse (with dynamic['alternatives']) describe the
+        logistic listener. Runs are simulated in parallel, one trial at a
+        time, exactly as methods.adaptive tracks them. A block that has not
+        ended after max_iter trials (only possible if max_trials and
+        run_n_trials are both 0) is stopped and counted as not finished.
+
+        Returns a dict of arrays with one entry per run:
+
+            threshold   : The mean of the last vals_to_avg values at reversals
+                           (nan if the run did not finish normally, as with
+                           dynamic['mean'])
+            sd          : The sd of the same values
+            n_trials    : The number of trials in the block
+            n_reversals : The number of reversals
+            good_run    : Whether the run finished normally
+            end         : Why the run ended, an index into end_reasons
+
+        along with 'target', the value at which the listener's probability
+        correct is target_p(downs, ups) (what the track should converge on),
+        and 'target_p'. Pass the result to summarize or report.
+    """
+    rng = np.random.default_rng(seed)
+    listener = _listener(listener, midpoint, slope, dynamic.get('alternatives', 2), lapse)
+    steps = np.asarray([dynamic['steps'][0]] + list(dynamic['steps']), dtype=float)
+    n_revs = len(steps) - 1
+    downs, ups = dynamic['downs'], dynamic['ups']
+    floor, ceil = dynamic['val_floor'], dynamic['val_ceil']
+    floor_n, ceil_n = dynamic['val_floor_n'], dynamic['val_ceil_n']
+    run_n_trials, max_trials = dynamic['run_n_trials'], dynamic['max_trials']
+    vals_to_avg = dynamic['vals_to_avg']
+    # The block ends at whichever trial limit comes first
+    limits = [n for n in (run_n_trials, max_trials) if n > 0]
+    n_iter = min(limits) + 1 if limits else max_iter
+    runs = np.arange(n_runs)
+
+    value = np.full(n_runs, dynamic['val_start'], dtype=float)
+    cur_dns = np.zeros(n_runs, dtype=int)
+    cur_ups = np.zeros(n_runs, dtype=int)
+    prev_dir = np.zeros(n_runs, dtype=int)
+    n_reversals = np.zeros(n_runs, dtype=int)
+    floor_count = np.zeros(n_runs, dtype=int)
+    ceil_count = np.zeros(n_runs, dtype=int)
+    values_at_rev = np.full((n_runs, n_revs + 1), np.nan)
+    n_trials = np.zeros(n_runs, dtype=int)
+    end = np.zeros(n_runs, dtype=int)
+    active = np.ones(n_runs, dtype=bool)
+
+    for trial in range(n_iter):
+        # trial is exp.run.trials_block at post_trial
+        correct = rng.random(n_runs) < listener(value)
+        down = active & correct
+        up = active & ~correct
+        n_trials[active] += 1
+
+        # track
+        cur_dns = np.where(down, cur_dns + 1, np.where(up, 0, cur_dns))
+        cur_ups = np.where(up, cur_ups + 1, np.where(down, 0, cur_ups))
+        step_dn = down & (cur_dns == downs)
+        step_up = up & (cur_ups == ups)
+        cur_dns[step_dn] = 0
+        cur_ups[step_up] = 0
+        cur_step = step_up.astype(int) - step_dn.astype(int)
+        rev = (step_dn & (prev_dir == 1)) | (step_up & (prev_dir == -1))
+        values_at_rev[runs[rev], n_reversals[rev]] = value[rev]
+        n_reversals += rev
+        prev_dir[step_dn] = -1
+        prev_dir[step_up] = 1
+
+        # finish_trial
+        at_floor = active & (value == floor)
+        floor_count = np.where(at_floor & (cur_step == -1), floor_count + 1,
+                               np.where(at_floor & ~correct, 0, floor_count))
+        floor_count[active & ~at_floor] = 0
+        at_ceil = active & (value == ceil)
+        ceil_count = np.where(at_ceil & (cur_step == 1), ceil_count + 1,
+                              np.where(at_ceil & correct, 0, ceil_count))
+        ceil_count[active & ~at_ceil] = 0
+        done = np.zeros(n_runs, dtype=bool)
+        for reason, hit in (('floor', at_floor & (floor_count == floor_n)),
+                            ('ceiling', at_ceil & (ceil_count == ceil_n))):
+            end[hit] = end_reasons.index(reason)
+            done |= hit
+        on = active & ~done
+        # As the elif chain in Staircase.finish: run_n_trials, then max_trials
+        for reason, limit in (('run_n_trials', run_n_trials), ('max_trials', max_trials)):
+            if limit > 0 and trial == limit:
+                hit = on.copy()
+                end[hit] = end_reasons.index(reason)
+                done |= hit
+                on &= ~hit
+        hit = on & (n_reversals == n_revs)
+        end[hit] = end_reasons.index('reversals')
+        done |= hit
+
+        # step
+        value = np.clip(value + cur_step * steps[np.minimum(n_reversals, n_revs)], floor, ceil)
+        active &= ~done
+        if not active.any():
+            break
+
+    good_run = end >= end_reasons.index('run_n_trials')
+    # The last vals_to_avg values at reversals for each run (all of them if 0, as [-0:])
+    col = np.arange(n_revs + 1)[None, :]
+    use = col < n_reversals[:, None]
+    if vals_to_avg > 0:
+        use &= col >= (n_reversals - vals_to_avg)[:, None]
+    count = use.sum(axis=1)
+    vals = np.where(use, values_at_rev, 0.)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        threshold = vals.sum(axis=1) / count
+        sd = np.sqrt((np.where(use, values_at_rev - threshold[:, None], 0.)**2).sum(axis=1) / count)
+    threshold[~good_run] = np.nan
+    sd[~good_run] = np.nan
+
+    p = target_p(downs, ups)
+    if isinstance(listener, functools.partial) and listener.func is logistic:
+        target = logistic_inverse(p, **listener.keywords)
+    else:
+        target = np.nan
+    return {
+        'method': 'adaptive',
+        'threshold': threshold,
+        'sd': sd,
+        'n_trials': n_trials,
+        'n_reversals': n_reversals,
+        'good_run': good_run,
+        'end': end,
+        'target': target,
+        'target_p': p,
+        }
+
+
+def constant(levels, trialsperblock, midpoint, slope, alternatives=2, n_runs=1000,
+             lapse=0., listener=None, seed=None):
+    """Simulates n_runs experiments using the method of constant stimuli
+
+        Each run is one block of trialsperblock trials at each of the levels
+        (which should be in ascending order of difficulty, ie., increasing
+        probability correct). Threshold is estimated for each run by linear
+        interpolation, as the level at which the proportion correct first
+        reaches the listener's midpoint probability (halfway between guessing
+        and 1-lapse).
+
+        Returns a dict of arrays:
+
+            pc        : The proportion correct, shape (n_runs, len(levels))
+            threshold : The threshold estimate for each run (nan if pc is
+                         above the target at the lowest level, or never
+                         reaches it)
+            end       : 1 ('floor') where pc is above target at the lowest
+                         level, 2 ('ceiling') where it never reaches it,
+                         otherwise 0
+
+        along with 'target', 'target_p' and 'n_trials' (the trials per run).
+    """
+    rng = np.random.default_rng(seed)
+    listener = _listener(listener, midpoint, slope, alternatives, lapse)
+    levels = np.asarray(levels, dtype=float)
+    n_correct = rng.binomial(trialsperblock, listener(levels), size=(n_runs, len(levels)))
+    pc = n_correct / float(trialsperblock)
+
+    guess = 1. / alternatives if alternatives > 1 else 0.
+    p = guess + (1. - guess - lapse) / 2.
+    above = pc >= p
+    first = np.argmax(above, axis=1)
+    floor = above[:, 0]
+    ceil = ~above.any(axis=1)
+    runs = np.arange(n_runs)
+    i = np.maximum(first, 1)
+    x0, x1 = levels[i - 1], levels[i]
+    y0, y1 = pc[runs, i - 1], pc[runs, i]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        threshold = x0 + (p - y0) * (x1 - x0) / (y1 - y0)
+    threshold[floor | ceil] = np.nan
+    end = np.zeros(n_runs, dtype=int)
+    end[floor] = end_reasons.index('floor')
+    end[ceil] = end_reasons.index('ceiling')
+
+    if isinstance(listener, functools.partial) and listener.func is logistic:
+        target = logistic_inverse(p, **listener.keywords)
+    else:
+        target = np.nan
+    return {
+        'method': 'constant',
+        'pc': pc,
+        'threshold': threshold,
+        'good_run': end == 0,
+        'end': end,
+        'n_trials': np.full(n_runs, trialsperblock * len(levels)),
+        'target': target,
+        'target_p': p,
+        }
+
+
+def summarize(results):
+    """Returns summary statistics for the results of adaptive or constant
+
+        bias is the mean threshold estimate minus the target, and sd, var and
+        rmse are of the estimates, all over runs that finished normally.
+        Trial counts are over all runs, and the rates are proportions of runs.
+    """
+    est = results['threshold'][results['good_run']]
+    n_trials = results['n_trials']
+    end = results['end']
+    out = {
+        'n_runs': len(end),
+        'target': results['target'],
+        'target_p': results['target_p'],
+        'mean': np.mean(est) if len(est) else np.nan,
+        'bias': np.mean(est) - results['target'] if len(est) else np.nan,
+        'sd': np.std(est) if len(est) else np.nan,
+        'var': np.var(est) if len(est) else np.nan,
+        'rmse': np.sqrt(np.mean((est - results['target'])**2)) if len(est) else np.nan,
+        'trials_mean': np.mean(n_trials),
+        'trials_median': np.median(n_trials),
+        'trials_p5': np.percentile(n_trials, 5),
+        'trials_p95': np.percentile(n_trials, 95),
+        'trials_max': np.max(n_trials),
+        'good_rate': np.mean(results['good_run']),
+        }
+    for i, reason in enumerate(end_reasons):
+        if reason != 'none' or results['method'] == 'adaptive':
+            out['{}_rate'.format(reason)] = np.mean(end == i)
+    return out
+
+
+def report(results):
+    """Returns a printable summary of the results of adaptive or constant
+    """
+    s = summarize(results)
+    out = "Simulated {} runs ({})\n".format(s['n_runs'], results['method'])
+    out += " Target: {:.4g} (p = {:.3f})\n".format(s['target'], s['target_p'])
+    out += " Estimate: mean {:.4g}, bias {:.4g}, sd {:.4g}, var {:.4g}, rmse {:.4g}\n".format(
+            s['mean'], s['bias'], s['sd'], s['var'], s['rmse'])
+    out += " Trials: mean {:.1f}, median {:.0f}, 5-95% {:.0f}-{:.0f}, max {:.0f}\n".format(
+            s['trials_mean'], s['trials_median'], s['trials_p5'], s['trials_p95'], s['trials_max'])
+    out += " Finished normally: {:.1%}\n".format(s['good_rate'])
+    for reason in end_reasons:
+        key = '{}_rate'.format(reason)
+        if key in s and s[key] > 0:
+            out += "  {}: {:.1%}\n".format(reason, s[key])
+    return out
+
+
+class responder(object):
+    """Supplies responses for a headless run of an experiment
+
+        Pass a responder to gustav.run (eg., gustav.run('exp.py', 
+        responder=gustav.simulate.guess())), and it is used instead of the 
+        experiment's prompt_response. present_trial is skipped, as are 
+        forms, audio and sleeps (see utils.make_headless), so the whole 
+        script, including stimulus generation in pre_trial, runs as fast 
+        as it can.
+
+        Subclasses implement get_response, which returns the response for 
+        the current trial as a string, or None to end the experiment.
+    """
+    def get_response(self, exp):
+        raise NotImplementedError
+
+    def prompt_response(self, exp):
+        ret = self.get_response(exp)
+        if ret is None:
+            exp.run.block_on = False
+            exp.run.gustav_is_go = False
+        else:
+            exp.run.response = ret
+
+
+class replay(responder):
+    """Replays recorded responses, in order
+
+        responses can be a list of responses, or the path to a trial file 
+        (see data.py), in which case its response column is used. The 
+        experiment ends when the responses run out. To replay a session 
+        exactly, any randomization in the script (condition order, correct
+        intervals, etc.) must be seeded the same way as when it was recorded.
+    """
+    def __init__(self, responses):
+        if isinstance(responses, str):
+            from . import data
+            responses = data.load(responses)['response']
+        self.responses = [str(r) for r in responses]
+        self.n = 0
+
+    def get_response(self, exp):
+        if self.n == len(self.responses):
+            return None
+        self.n += 1
+        return self.responses[self.n - 1]
+
+
+class guess(responder):
+    """Responds with one of the valid keys (exp.validKeys), at random
+    """
+    def __init__(self, keys=None, seed=None):
+        self.keys = keys
+        self.rng = np.random.default_rng(seed)
+
+    def get_response(self, exp):
+        keys = self.keys
+        if keys is None:
+            keys = [k.strip() for k in str(getattr(exp, 'validKeys', '1,2')).split(',') if k.strip() != '']
+        return keys[self.rng.integers(len(keys))]
+
+
+class psychometric(responder):
+    """A simulated listener for n-alternative tasks
+
+        On each trial, responds correctly with the probability given by the 
+        listener (by default, logistic with midpoint, slope, lapse and a 
+        guess rate from the number of alternatives), otherwise with one of 
+        the other alternatives at random. Alternatives are numbered from 1.
+
+        value and correct are functions that take exp and return the 
+        stimulus value and correct alternative for the current trial. The 
+        defaults use exp.var.dynamic['value'] and exp.var.dynamic['correct'], 
+        as in the adaptive method. alternatives defaults to 
+        exp.var.dynamic['alternatives'].
+    """
+    def __init__(self, midpoint=0., slope=1., lapse=0., alternatives=None, 
+                 value=None, correct=None, listener=None, seed=None):
+        self.midpoint = midpoint
+        self.slope = slope
+        self.lapse = lapse
+        self.alternatives = alternatives
+        self.value = value or (lambda exp: exp.var.dynamic['value'])
+        self.correct = correct or (lambda exp: exp.var.dynamic['correct'])
+        self.listener = listener
+        self.rng = np.random.default_rng(seed)
+
+    def get_response(self, exp):
+        alternatives = self.alternatives or exp.var.dynamic['alternatives']
+        listener = _listener(self.listener, self.midpoint, self.slope, alternatives, self.lapse)
+        correct = int(self.correct(exp))
+        if self.rng.random() < listener(float(self.value(exp))):
+            return str(correct)
+        others = [i for i in range(1, alternatives + 1) if i != correct]
+        return str(others[self.rng.integers(len(others))])
@@ -172,6 +172,13 @@ def prompt_response(exp):
     exp.interface.show_Notify_Left(False)
     exp.interface.show_Marker(False)
 
+@gustav.cache.cached(key=lambda exp: (exp.var.current['frequency'], exp.user.fs, exp.user.interval))
+def make_tone(exp):
+    # The tone only depends on the frequency, fs and duration, so it is only 
+    # generated once per frequency (see gustav.cache)
+    sig = psylab.signal.tone(float(exp.var.current['frequency']),exp.user.fs,exp.user.interval)
+    return psylab.signal.ramps(sig,exp.user.fs)
+
 def pre_trial(exp):
     """PRE_TRIAL
         This function gets called on every trial to generate the stimulus, and
@@ -182,8 +189,7 @@ def pre_trial(exp):
     exp.interface.update_Status_Right("Trial {:} of {:}".format(exp.run.trials_block+1, exp.var.constant['trialsperblock']), redraw=True)
     cue = exp.var.current['cue']
 
-    sig = psylab.signal.tone(float(exp.var.current['frequency']),exp.user.fs,exp.user.interval)
-    sig = psylab.signal.ramps(sig,exp.user.fs)
+    sig = make_tone(exp)
 
     if cue == 'ild':
         exp.stim.out = psylab.signal.apply_ild(sig, exp.user.this_range[exp.run.trials_block])
@@ -8,12 +8,14 @@ import time
 
 import numpy as np
 import scipy.signal
-import soundfile as sf
 
 import psylab           # https://github.com/cbrown1/psylab
 import gustav
 from gustav.forms.html import nafc as theForm
 
+# Filter coefficients are the same for every trial in a condition, so only design them once
+butter = gustav.cache.memoize(scipy.signal.butter)
+
 
 def setup(exp):
     print(f'n-AFC setup')
@@ -174,7 +176,7 @@ def pre_exp(exp):
         port = 5050
     print(f'Subject ID: {exp.subjID} port: {port}')
     # Only runs once before the whole thing
-    exp.interface = theForm.Interface(alternatives=exp.validKeys.split(","), port=port)
+    exp.interface = theForm.Interface(alternatives=exp.validKeys.split(","), port=port, name=exp.name)
     # Setup styling here (see style.json for more)
     exp.interface.style['logo'] = 'static/index.svg'
     exp.interface.style["--background_color"] = "#232323"
@@ -251,8 +253,8 @@ def pre_trial(exp):
     noi *= rms_targ / rms_noi
 
     fc_l,fc_h = psylab.signal.oct2f(float(exp.var.current['fc']), float(exp.var.current['bw'])/2.)
-    b_hp,a_hp = scipy.signal.butter(4, fc_l/(exp.user.fs/2.), btype='highpass')
-    b_lp,a_lp = scipy.signal.butter(4, fc_h/(exp.user.fs/2.), btype='lowpass')
+    b_hp,a_hp = butter(4, fc_l/(exp.user.fs/2.), btype='highpass')
+    b_lp,a_lp = butter(4, fc_h/(exp.user.fs/2.), btype='lowpass')
     sig = scipy.signal.lfilter(b_hp,a_hp,sig)
     sig = scipy.signal.lfilter(b_lp,a_lp,sig)
     noi = scipy.signal.lfilter(b_hp,a_hp,noi)
@@ -276,12 +278,8 @@ def pre_trial(exp):
         # Else send the 'silence' first
         audio = [interval_noi, interval_sig]
 
-    exp.interface.audio = []
-    for i, a in enumerate(audio, start=1):
-        fname = os.path.join(exp.interface.subjdir, f'{exp.run.block}_{exp.run.trials_block}_{i}.wav')
-        sf.write(fname, a, exp.user.fs)
-        client_fname = os.path.join(exp.interface.client_subjdir, f'{exp.run.block}_{exp.run.trials_block}_{i}.wav')
-        exp.interface.audio.append({'name': i, 'file': client_fname, 'id': i})
+    # Sent with the trial, and served to the browser from memory
+    exp.interface.set_audio(exp, audio, exp.user.fs)
 
 def present_trial(exp):
     """
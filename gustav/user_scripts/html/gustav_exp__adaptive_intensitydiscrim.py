@@ -8,7 +8,6 @@ import time
 
 import psylab           # https://github.com/cbrown1/psylab
 import numpy as np
-import soundfile as sf
 
 import gustav
 from gustav.forms.html import nafc as theForm
@@ -173,7 +172,7 @@ def pre_exp(exp):
         port = 5050
     print(f'Subject ID: {exp.subjID} port: {port}')
     # Only runs once before the whole thing
-    exp.interface = theForm.Interface(alternatives=exp.validKeys.split(","), port=port)
+    exp.interface = theForm.Interface(alternatives=exp.validKeys.split(","), port=port, name=exp.name)
     # Setup styling here (see style.json for more)
     exp.interface.style['logo'] = 'static/index.svg'
     exp.interface.style["--background_color"] = "#232323"
@@ -228,6 +227,20 @@ def prompt_response(exp):
             exp.var.dynamic['msg'] = "Cancelled by user"
             break
 
+@gustav.cache.cached(key=lambda exp: (exp.var.current['frequency'], exp.var.current['intensity'], exp.var.dynamic['value'],
+                                      exp.user.fs, exp.user.interval),
+                     prefetch=True)
+def make_intervals(exp):
+    # The tones only depend on the frequency, intensity and the dynamic 
+    # value, so they are made for the likely next trials while the subject 
+    # responds (see gustav.cache)
+    interval_sig = psylab.signal.tone(float(exp.var.current['frequency']),exp.user.fs,exp.user.interval)
+    interval_sig = psylab.signal.atten(interval_sig,int(exp.var.current['intensity'])*-1)
+    interval_sig = psylab.signal.ramps(interval_sig,exp.user.fs)
+    interval_noi = interval_sig.copy()
+    interval_sig = psylab.signal.atten(interval_sig,exp.var.dynamic['value']*-1)
+    return interval_sig, interval_noi
+
 def pre_trial(exp):
     """PRE_TRIAL
         This function gets called on every trial to generate the stimulus, and
@@ -237,11 +250,7 @@ def pre_trial(exp):
     """
     print(f'PRE TRIAL {exp.run.trials_block}')
     exp.interface.lower_left_text = f'Trial: {exp.run.trials_block}'
-    interval_sig = psylab.signal.tone(float(exp.var.current['frequency']),exp.user.fs,exp.user.interval)
-    interval_sig = psylab.signal.atten(interval_sig,int(exp.var.current['intensity'])*-1)
-    interval_sig = psylab.signal.ramps(interval_sig,exp.user.fs)
-    interval_noi = interval_sig.copy()
-    interval_sig = psylab.signal.atten(interval_sig,exp.var.dynamic['value']*-1)
+    interval_sig, interval_noi = make_intervals(exp)
 
     # Select correct answer randomly
     exp.var.dynamic['correct'] = np.random.randint(1, exp.var.dynamic['alternatives']+1)
@@ -252,12 +261,8 @@ def pre_trial(exp):
         # Else send the 'silence' first
         audio = [interval_noi, interval_sig]
 
-    exp.interface.audio = []
-    for i, a in enumerate(audio, start=1):
-        fname = os.path.join(exp.interface.subjdir, f'{exp.run.block}_{exp.run.trials_block}_{i}.wav')
-        sf.write(fname, a, exp.user.fs)
-        client_fname = os.path.join(exp.interface.client_subjdir, f'{exp.run.block}_{exp.run.trials_block}_{i}.wav')
-        exp.interface.audio.append({'name': i, 'file': client_fname, 'id': i})
+    # Sent with the trial, and served to the browser from memory
+    exp.interface.set_audio(exp, audio, exp.user.fs)
 
 def present_trial(exp):
     """
@@ -21,17 +21,25 @@
 #
 
 
-import os, sys, fnmatch
+import os, sys, fnmatch, re
+import threading
+import queue
 import numpy as np
 import socket
 import datetime
 import codecs
+import copy
 import types
 import collections
-from time import sleep
+import collections.abc
+import time
+import io
+from time import sleep, monotonic, perf_counter
 from inspect import getmembers
-from functools import reduce
+from functools import reduce, lru_cache
 from .frontends import term
+from . import data
+from . import cache
 
 #TODO: Modularize/standardize input methods. 
 # That is, implement modular, reuseable input methods that can be 
@@ -61,48 +69,110 @@ from .frontends import term
 # optional (eg., exp.validKeys). Alternative is to put optional vars into 
 # exp.exp, but this seems lame.
 
+def _init_fields(obj):
+    # Sets each field of obj to (a copy of) its default
+    for name, default in obj._fields:
+        setattr(obj, name, copy.copy(default))
+
+
+class container(object):
+    """A plain holder of attributes, eg., exp.user and exp.stim
+    """
+    pass
+
+
 class exp:
     """Experimental settings
+
+        An exp is made for each run, and holds all of its state. The fields 
+        gustav uses are listed, with their defaults, in _fields (and those of 
+        exp.var and exp.run in theirs), and each exp gets its own copy of 
+        every default. exp.var and exp.run have only these fields, so setting 
+        any other (eg., a misspelled exp.var.facotrial) raises an 
+        AttributeError. exp itself also keeps other settings the experiment 
+        file makes (eg., exp.validKeys, exp.interface) as ordinary 
+        attributes.
     """
-    name = ''
-    host = socket.gethostname()
-    subjID = ''
-    experimentPath = ''
-    experimentFile = ''
-    experimentFilePath = ''
-    frontend = None
-    debug = False
-    method = 'constant'
-    prompt = ''
-    logString_pre_exp = None   #Write this string to the console and/or logfile at start of exp
-    logString_pre_block = None #Write this string to the console and/or logfile before every block
-    logString_pre_trial = None #Write this string to the console and/or logfile before every trial
-    logString_post_trial = None#Write this string to the console and/or logfile after every trial
-    logString_post_block = None#Write this string to the console and/or logfile after every block
-    logString_post_exp = None  #Write this string to the console and/or logfile at end of exp
-    logString_header = "# A log file for Gustav\n\n" #Write this string to the logfile if it is new
-    logFile = 'gustav_logfile_$date.log'
-    logFile_unexpanded = ""
-    logConsole = True
-    logConsoleDelay = False
-    logConsoleDelay_str = ''
-    dataString_pre_exp = ''    #Write this string to datafile at exp begin
-    dataString_pre_block = ''  #Write this string to datafile before every block
-    dataString_pre_trial = ''  #Write this string to datafile before every trial
-    dataString_post_trial = '' #Write this string to datafile after every trial
-    dataString_post_block = '' #Write this string to datafile after every block
-    dataString_post_exp = ''   #Write this string to datafile at exp end
-    dataString_header = '#A data file for Gustav\n\n'#Write this string to datafile if the file is new
-    dataFile ='$name.csv'
-    dataFile_unexpanded =''
-    recordData = True
-    comments = ''
-    disable_functions = []          # Experimenter can add function names as strings to disable them
-    quitKeys = ['/', 'q']
+    _fields = (
+        ('name', ''),
+        ('host', socket.gethostname()),
+        ('subjID', ''),
+        ('experimentPath', ''),
+        ('experimentFile', ''),
+        ('experimentFilePath', ''),
+        ('experimentBase', ''),
+        ('experiment', None),           # The experiment file, as a module
+        ('utils', None),
+        ('frontend', None),
+        ('debug', False),
+        ('method', 'constant'),
+        ('method_str', ''),
+        ('prompt', ''),
+        ('logString_pre_exp', None),    # Write this string to the console and/or logfile at start of exp
+        ('logString_pre_block', None),  # Write this string to the console and/or logfile before every block
+        ('logString_pre_trial', None),  # Write this string to the console and/or logfile before every trial
+        ('logString_post_trial', None), # Write this string to the console and/or logfile after every trial
+        ('logString_post_block', None), # Write this string to the console and/or logfile after every block
+        ('logString_post_exp', None),   # Write this string to the console and/or logfile at end of exp
+        ('logString_header', "# A log file for Gustav\n\n"), # Write this string to the logfile if it is new
+        ('logFile', 'gustav_logfile_$date.log'),
+        ('logFile_unexpanded', ""),
+        ('logConsole', True),
+        ('logConsoleDelay', False),
+        ('logConsoleDelay_str', ''),
+        ('dataString_pre_exp', ''),     # Write this string to datafile at exp begin
+        ('dataString_pre_block', ''),   # Write this string to datafile before every block
+        ('dataString_pre_trial', ''),   # Write this string to datafile before every trial
+        ('dataString_post_trial', ''),  # Write this string to datafile after every trial
+        ('dataString_post_block', ''),  # Write this string to datafile after every block
+        ('dataString_post_exp', ''),    # Write this string to datafile at exp end
+        ('dataString_header', '#A data file for Gustav\n\n'), # Write this string to datafile if the file is new
+        ('dataFile', '$name.csv'),
+        ('dataFile_unexpanded', ''),
+        ('trialFile', ''),              # If set, write a typed record of every trial to this csv file (see data.py)
+        ('trialFile_unexpanded', ''),
+        ('trialFile_checked', False),
+        ('recordData', True),
+        ('writer', None),               # Holds the data and log files open during the exp (see utils.writer)
+        ('writeFlush', 'trial'),        # When to flush data and log files: 'event', 'trial', 'block', or 'time'
+        ('writeFlushInterval', 5.),     # Seconds between flushes, if writeFlush == 'time'
+        ('writeFsync', True),           # Whether to sync data and log files to disk at block boundaries
+        ('writeThread', False),         # Whether to write data and log files on a background thread
+        ('writeQueueSize', 1000),       # Max number of writes waiting for the background thread
+        ('responder', None),            # If set, run headless, with responses from responder (see simulate.py)
+        ('simulateResponder', None),    # The responder to use for --simulate (default: simulate.guess())
+        ('timeEvents', False),          # Whether to time each event handler, present_trial, etc. (see utils.timings)
+        ('timeEventsSize', 10000),      # How many timings to keep
+        ('timings', None),
+        ('profileFile', ''),            # If set, profile the experiment with cProfile, and write the stats here
+        ('profiler', None),
+        ('traceMalloc', False),         # Whether to trace memory allocations with tracemalloc
+        ('headlessModules', ['gustav.forms', 'medussa', 'sounddevice', 'pyaudio']), # Replaced in the experiment script when headless
+        ('headlessSaved', None),        # The experiment script's bindings that make_headless replaced
+        ('prefetcher', None),           # Makes the likely next stimuli during each trial (see cache.prefetcher)
+        ('comments', ''),
+        ('disable_functions', []),      # Experimenter can add function names as strings to disable them
+        ('quitKeys', ['/', 'q']),
+    )
     eventTypes = [ 'pre_exp', 'pre_block', 'pre_trial', 'post_trial', 'post_block', 'post_exp' ]
     frontendTypes = ['qt', 'tk', 'term']
+    # The handler lists (pre_exp_, etc) are slots too, filled in __init__. 
+    # var, run, user and stim are instances of the classes below, and so 
+    # are kept as ordinary attributes
+    __slots__ = tuple(name for name, default in _fields) + tuple("{}_".format(event) for event in eventTypes) + ('__dict__',)
     from .frontends import term
 
+    def __init__(self):
+        _init_fields(self)
+        # Each event starts with the (empty) default handler. The method's and
+        # the experiment's are added by initialize_experiment
+        for event in self.eventTypes:
+            setattr(self, "{}_".format(event), [getattr(type(self), event)])
+        self.var = type(self).var()
+        self.run = type(self).run()
+        self.user = type(self).user()
+        self.stim = type(self).stim()
+
     def prompt_response(self,exp):
         while True:
             ret = exp.frontend.get_input(None, "Gustav!","Enter Response: ")
@@ -152,55 +222,66 @@ class exp:
     def post_exp(exp):
         pass
 
-    pre_exp_ = [pre_exp]
-    pre_block_ = [pre_block]
-    pre_trial_ = [pre_trial]
-    post_trial_ = [post_trial]
-    post_block_ = [post_block]
-    post_exp_ = [post_exp]
-
 
     class var:
         """Experiment variable settings
         """
-        factorial = collections.OrderedDict()
-        covariable = collections.OrderedDict()
-        current = collections.OrderedDict()
-        ignore = []
-        default = []
-        varlist = []
-        levelsbycond = {}
-        nlevels_fact = 0
-        nlevels_list = 0
-        nlevels_total = 0
-        order = 'natural'
-        order_ = 0
-        prompt = []
-        dynamic = {}
+        _fields = (
+            ('factorial', collections.OrderedDict()),
+            ('covariable', collections.OrderedDict()),
+            ('current', collections.OrderedDict()),
+            ('ignore', []),
+            ('default', []),
+            ('varlist', []),
+            ('levelsbycond', {}),
+            ('nlevels_fact', 0),
+            ('nlevels_list', 0),
+            ('nlevels_total', 0),
+            ('order', 'natural'),
+            ('order_', 0),
+            ('orderarray', []),
+            ('nblocks', 0),
+            ('prompt', []),
+            ('dynamic', {}),
+            ('constant', {}),
+        )
+        # No __dict__: a misspelled setting (eg., exp.var.facotrial) raises
+        __slots__ = tuple(name for name, default in _fields)
+
+        def __init__(self):
+            _init_fields(self)
 
     
     class run:
         """Settings associated with the details of running the experiment
         """
-        time = ''
-        date = ''
-        trials_block = 0     # Current trial count within a block
-        trials_exp = 0      # Current total trial count
-        block = 0      # Current block (treatment) count
-        blocks = 0     # Current total block count
-        condition = 0  # Current condition
-        block_on = True
-        trial_on = True
-        gustav_is_go = True
-        response = ''
+        _fields = (
+            ('time', ''),
+            ('date', ''),
+            ('trials_block', 0),    # Current trial count within a block
+            ('trials_exp', 0),      # Current total trial count
+            ('block', 0),           # Current block (treatment) count
+            ('blocks', 0),          # Current total block count
+            ('nblocks', 0),         # Total number of blocks
+            ('condition', 0),       # Current condition
+            ('block_on', True),
+            ('trial_on', True),
+            ('gustav_is_go', True),
+            ('response', ''),
+            ('rt', None),           # Reaction time of the current response in s, if known
+        )
+        __slots__ = tuple(name for name, default in _fields)
+
+        def __init__(self):
+            _init_fields(self)
     
     
-    class user:
+    class user(container):
         """Convenience container for user settings
         """
         pass
 
-    class stim:
+    class stim(container):
         """Convenience container for stimulus stuff
         """
         pass
@@ -209,6 +290,11 @@ class exp:
 def initialize_experiment( exp ):
     """Do stuff necessary for the start of an experiment
     """
+    if exp.writeThread:
+        exp.writer = threaded_writer(flush=exp.writeFlush, interval=exp.writeFlushInterval, 
+                                     fsync=exp.writeFsync, maxsize=exp.writeQueueSize)
+    else:
+        exp.writer = writer(flush=exp.writeFlush, interval=exp.writeFlushInterval, fsync=exp.writeFsync)
     logpath = os.path.split(exp.logFile)
     if not os.path.isdir(logpath[0]):
         print("Created logfile path: {}".format(logpath[0]))
@@ -223,7 +309,7 @@ def initialize_experiment( exp ):
     exp.logFile = exp.logFile.replace("$host", exp.host)
     if not os.path.isfile(exp.logFile):
         exp.logString_header = exp.logString_header.replace("$date", date)
-        write_data(exp.logString_header, exp.logFile)
+        write_out(exp, exp.logString_header, exp.logFile)
         debug(exp, "Created log file: {}".format(exp.logFile))
     else:
         debug(exp, "Found log file: {}".format(exp.logFile))
@@ -232,16 +318,20 @@ def initialize_experiment( exp ):
     debug(exp, "Got frontend: {}".format(exp.frontend.name))
     # For each event type, look for a function in method, and in experiment.
     # If a function is found, add to list to be run during that event. 
+    # Handlers already in the list are not added again, so this is safe to 
+    # call more than once on an exp.
     for event in exp.eventTypes:
         if hasattr(exp.method, event):
             thisstr = "{}_".format(event)
             thisfunclist = getattr(exp, thisstr)
-            thisfunclist.append(getattr(exp.method, event))
+            if getattr(exp.method, event) not in thisfunclist:
+                thisfunclist.append(getattr(exp.method, event))
             debug(exp, "Found event in method: {}".format(event))
         if hasattr(exp.experiment, event):
             thisstr = "{}_".format(event)
             thisfunclist = getattr(exp, thisstr)
-            thisfunclist.append(getattr(exp.experiment, event))
+            if getattr(exp.experiment, event) not in thisfunclist:
+                thisfunclist.append(getattr(exp.experiment, event))
             debug(exp, "Found event in experiment: {}".format(event))
 
     # A few 'special' events that should only occur (if at all) in the experiment file:
@@ -269,10 +359,18 @@ def initialize_experiment( exp ):
         exp.dataFile = get_expanded_vals_in_string(exp.dataFile, exp)
         if not os.path.isfile(exp.dataFile):
             exp.dataString_header = get_expanded_vals_in_string(exp.dataString_header, exp)
-            write_data(exp.dataString_header, exp.dataFile)
+            write_out(exp, exp.dataString_header, exp.dataFile)
             debug(exp, "Created datafile: {}".format(exp.dataFile))
         else:
             debug(exp, "Found datafile: {}".format(exp.dataFile))
+        if exp.trialFile:
+            exp.trialFile_unexpanded = exp.trialFile
+            exp.trialFile = get_expanded_vals_in_string(exp.trialFile, exp)
+            trialpath = os.path.split(exp.trialFile)[0]
+            if trialpath != '' and not os.path.isdir(trialpath):
+                os.makedirs(trialpath)
+                debug(exp, "Created trialfile path: {}".format(trialpath))
+            debug(exp, "Trial records will be written to: {}".format(exp.trialFile))
     else:
         debug(exp, "Data will not be recorded")
 
@@ -283,6 +381,9 @@ def process_variables(exp):
     """
 
     # Begin get number of levels
+    # Start over, in case variables were processed before
+    exp.var.varlist = []
+    exp.var.levelsbycond = {}
     factorial = []
     covariable = []
     nfact = {}
@@ -476,8 +577,8 @@ def menu_condition(exp):
 def update_time(run):
     """Updates the date and time
     """
-    exp.run.time = datetime.datetime.now().strftime('%H:%M:%S')
-    exp.run.date = datetime.datetime.now().strftime('%Y-%m-%d')
+    run.time = datetime.datetime.now().strftime('%H:%M:%S')
+    run.date = datetime.datetime.now().strftime('%Y-%m-%d')
 
 
 def write_data(data, filename):
@@ -493,11 +594,395 @@ def write_data(data, filename):
     f.close()
 
 
+class writer():
+    """Buffered, persistent data and log file output
+
+        Files are opened the first time they are written to, and held open
+        until close is called. Writes are buffered in memory and flushed to
+        disk at the flush points set by flush:
+
+        'event' : After every event
+        'trial' : After every trial, and at block and experiment boundaries
+        'block' : At block and experiment boundaries
+        'time'  : Whenever more than interval seconds have passed since 
+                    the last flush, and at block and experiment boundaries
+
+        If fsync is True, files are also synced to disk at block and 
+        experiment boundaries, so that no more than one block of data can 
+        be lost in a crash.
+    """
+    flush_events = {
+        'event': ['pre_exp', 'pre_block', 'pre_trial', 'post_trial', 'post_block', 'post_exp'],
+        'trial': ['pre_exp', 'pre_block', 'post_trial', 'post_block', 'post_exp'],
+        'block': ['pre_exp', 'pre_block', 'post_block', 'post_exp'],
+        'time':  ['pre_exp', 'pre_block', 'post_block', 'post_exp'],
+    }
+    sync_events = ['pre_exp', 'post_block', 'post_exp']
+
+    def __init__(self, flush='trial', interval=5., fsync=True):
+        if flush not in self.flush_events:
+            raise Exception("Unknown flush point: {}. Must be one of: {}".format(flush, ", ".join(self.flush_events)))
+        self.flush_on = flush
+        self.interval = interval
+        self.fsync = fsync
+        self.files = {}         # filename: open file object
+        self.buffers = {}       # filename: list of strings waiting to be written
+        self.last_flush = monotonic()
+        self.closed = False
+
+    def exists(self, filename):
+        """Returns True if filename has already been written to, or exists on disk
+        """
+        return filename in self.files or os.path.isfile(filename)
+
+    def write(self, data, filename):
+        if filename not in self.files:
+            if os.path.isfile(filename):
+                self.files[filename] = codecs.open(filename, encoding='utf-8', mode='a')
+                self.buffers[filename] = []
+            else:
+                self.files[filename] = codecs.open(filename, encoding='utf-8', mode='w')
+                self.buffers[filename] = ["# -*- coding: utf-8 -*-\n\n"]
+        self.buffers[filename].append(data)
+        if self.flush_on == 'time' and monotonic() - self.last_flush >= self.interval:
+            self._flush()
+
+    def event(self, event):
+        """Flushes (and syncs) buffered writes if event is a flush point
+        """
+        if event in self.flush_events[self.flush_on]:
+            self._flush(sync = self.fsync and event in self.sync_events)
+        elif self.flush_on == 'time' and monotonic() - self.last_flush >= self.interval:
+            self._flush()
+
+    def flush(self, sync=False):
+        self._flush(sync)
+
+    def close(self):
+        """Flushes, syncs and closes all files. Safe to call more than once
+        """
+        if not self.closed:
+            self.closed = True
+            self._close()
+
+    def _flush(self, sync=False):
+        for filename, f in self.files.items():
+            buf = self.buffers[filename]
+            if buf:
+                f.write("".join(buf))
+                del buf[:]
+            f.flush()
+            if sync:
+                os.fsync(f.fileno())
+        self.last_flush = monotonic()
+
+    def _close(self):
+        self._flush(sync=self.fsync)
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+        self.buffers = {}
+
+
+class threaded_writer(writer):
+    """A writer that does its file IO on a background thread
+
+        write, event and flush only put the (already expanded) strings on 
+        a bounded queue, which a writer thread drains in order, so a slow 
+        disk does not add to the time between trials. If the queue is full, 
+        the caller blocks until there is room.
+
+        close drains the queue and joins the thread. Any error raised on 
+        the writer thread is re-raised by close (see close_writer).
+
+        For monitoring, depth is the current number of queued items, and
+        max_depth and max_enqueue_latency (in s) are the largest queue 
+        depth and the longest time spent waiting to enqueue.
+    """
+    def __init__(self, flush='trial', interval=5., fsync=True, maxsize=1000):
+        writer.__init__(self, flush=flush, interval=interval, fsync=fsync)
+        self.queue = queue.Queue(maxsize)
+        self.written = set()    # Filenames written to, but maybe still in the queue
+        self.max_depth = 0
+        self.max_enqueue_latency = 0.
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name='gustav_writer')
+        self.thread.daemon = True
+        self.thread.start()
+
+    @property
+    def depth(self):
+        return self.queue.qsize()
+
+    def _put(self, item):
+        t = perf_counter()
+        self.queue.put(item)
+        self.max_enqueue_latency = max(self.max_enqueue_latency, perf_counter() - t)
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def _run(self):
+        while True:
+            func, args = self.queue.get()
+            if func is None:
+                break
+            try:
+                func(*args)
+            except Exception as e:
+                if self.error is None:
+                    self.error = e
+
+    def exists(self, filename):
+        return filename in self.written or writer.exists(self, filename)
+
+    def write(self, data, filename):
+        self.written.add(filename)
+        self._put((writer.write, (self, data, filename)))
+
+    def event(self, event):
+        self._put((writer.event, (self, event)))
+
+    def flush(self, sync=False):
+        self._put((self._flush, (sync,)))
+
+    def close(self):
+        """Drains the queue, closes all files, and joins the writer thread
+        """
+        if not self.closed:
+            self.closed = True
+            self._put((self._close, ()))
+            self._put((None, ()))
+            self.thread.join()
+            if self.error is not None:
+                raise self.error
+
+
+def write_out(exp, data, filename):
+    """Writes data to filename, through exp.writer if it is open
+    """
+    if exp.writer is not None and not exp.writer.closed:
+        exp.writer.write(data, filename)
+    else:
+        write_data(data, filename)
+
+
+class timings():
+    """Records how long each part of the experiment takes, in a ring buffer
+
+        Each sample is the name of what was timed (eg., 'pre_trial: 
+        adaptive.pre_trial', 'present_trial', 'post_trial: log') and its 
+        duration in s. The buffer holds the most recent size samples, in 
+        preallocated arrays, so recording a sample does not allocate. 
+        summary gives the count, p50, p95 and max for each name over the 
+        samples in the buffer.
+    """
+    def __init__(self, size=10000):
+        self.size = size
+        self.names = []
+        self.ids = {}
+        self.counts = []
+        self.n = 0
+        self._id = np.zeros(size, dtype=np.int32)
+        self._dur = np.zeros(size)
+
+    def add(self, name, dur):
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+            self.counts.append(0)
+        self.counts[i] += 1
+        self._id[self.n % self.size] = i
+        self._dur[self.n % self.size] = dur
+        self.n += 1
+
+    def summary(self):
+        """Returns an ordered dict of name: (count, p50, p95, max), in s
+
+            count is the total number of samples, the others are over the 
+            samples still in the buffer.
+        """
+        n = min(self.n, self.size)
+        ids = self._id[:n]
+        out = collections.OrderedDict()
+        for i, name in enumerate(self.names):
+            durs = self._dur[:n][ids == i]
+            if len(durs):
+                p50, p95 = np.percentile(durs, [50, 95])
+                out[name] = (self.counts[i], p50, p95, durs.max())
+        return out
+
+    def summary_str(self):
+        out = "Timing (ms):{:>8} {:>9} {:>9} {:>9}\n".format('n', 'p50', 'p95', 'max')
+        for name, (count, p50, p95, mx) in self.summary().items():
+            out += "  {:<40} {:>8} {:>9.3f} {:>9.3f} {:>9.3f}\n".format(name, count, p50 * 1000., p95 * 1000., mx * 1000.)
+        return out
+
+
+def time_call(exp, name, func):
+    """Calls func(exp), and records how long it took if exp.timings is set
+    """
+    if exp.timings is None:
+        func(exp)
+    else:
+        t = perf_counter()
+        func(exp)
+        exp.timings.add(name, perf_counter() - t)
+
+
+def start_profiling(exp):
+    """Starts timing, profiling, and memory tracing, as set in exp
+    """
+    if exp.timeEvents:
+        exp.timings = timings(exp.timeEventsSize)
+    if exp.profileFile:
+        import cProfile
+        exp.profiler = cProfile.Profile()
+        exp.profiler.enable()
+    if exp.traceMalloc:
+        import tracemalloc
+        tracemalloc.start()
+
+
+def stop_profiling(exp):
+    """Stops profiling, and logs a summary of the timings, profile, and memory use
+    """
+    if exp.profiler is not None:
+        exp.profiler.disable()
+        import pstats
+        exp.profiler.dump_stats(exp.profileFile)
+        out = io.StringIO()
+        pstats.Stats(exp.profiler, stream=out).sort_stats('cumulative').print_stats(15)
+        log(exp, "Profile written to {}\n{}".format(exp.profileFile, out.getvalue()))
+        exp.profiler = None
+    if exp.traceMalloc:
+        import tracemalloc
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            out = "Memory: {:.1f} kB current, {:.1f} kB peak. Top allocations:\n".format(current / 1024., peak / 1024.)
+            for stat in tracemalloc.take_snapshot().statistics('lineno')[:10]:
+                out += "  {}\n".format(stat)
+            tracemalloc.stop()
+            log(exp, out)
+    if exp.timings is not None and exp.timings.n > 0:
+        log(exp, exp.timings.summary_str())
+        if cache.default_cache.hits + cache.default_cache.misses > 0:
+            log(exp, "Stimulus cache: {}\n".format(cache.default_cache.stats()))
+
+
+def data_exists(exp, filename):
+    """Returns True if filename exists, or has been written to by exp.writer
+    """
+    if exp.writer is not None and not exp.writer.closed:
+        return exp.writer.exists(filename)
+    return os.path.isfile(filename)
+
+
+def close_writer(exp):
+    """Flushes and closes exp.writer, if there is one
+
+        Write errors are raised, unless this is called while another 
+        exception is being handled (eg., from the finally in gustav.run, 
+        after a form raised). Then they are printed, so that the first 
+        error is the one raised.
+    """
+    if exp.writer is not None and not exp.writer.closed:
+        if sys.exc_info()[1] is None:
+            exp.writer.close()
+        else:
+            try:
+                exp.writer.close()
+            except Exception as e:
+                print("Error closing data and log files: {!r}".format(e), file=sys.stderr)
+        if isinstance(exp.writer, threaded_writer):
+            debug(exp, "Writer thread max queue depth: {}, max enqueue latency: {:.3f} ms".format(
+                exp.writer.max_depth, exp.writer.max_enqueue_latency * 1000.))
+
+
+class null_object(object):
+    """Stands in for a form, audio device, or module in a headless run
+
+        Every attribute is a null_object, calling one returns a null_object, 
+        and it is false and empty, so eg., exp.interface.update_Prompt(...)
+        and m.open_device().play() do nothing.
+    """
+    def __getattr__(self, name):
+        if name[:2] == "__":
+            raise AttributeError(name)
+        return self
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def __bool__(self):
+        return False
+
+    def __len__(self):
+        return 0
+
+    def __iter__(self):
+        return iter(())
+
+
+class null_time(object):
+    """The time module, without sleep
+    """
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+    def sleep(self, secs):
+        pass
+
+
+def _null_sleep(secs):
+    pass
+
+
+def make_headless(exp):
+    """Sets up an experiment to run without a subject, using exp.responder
+
+        Responses come from exp.responder.prompt_response (see simulate.py),
+        present_trial is not run, and in the experiment script, modules
+        whose names start with any of exp.headlessModules (forms, audio) are
+        replaced with null_objects, and sleeps are skipped. Everything
+        else, including stimulus generation in pre_trial, runs as usual.
+        The script is a shared module (in sys.modules), so the bindings
+        replaced are kept in exp.headlessSaved, and restore_headless puts
+        them back when the run ends.
+    """
+    if exp.var.order == 'prompt':
+        raise Exception("exp.var.order == 'prompt' cannot be used in a headless run")
+    exp.present_trial = exp.utils.null_object()
+    exp.prompt_response = exp.responder.prompt_response
+    namespace = vars(exp.experiment)
+    exp.headlessSaved = {}
+    for name, obj in list(namespace.items()):
+        if isinstance(obj, types.ModuleType):
+            if obj is time:
+                exp.headlessSaved[name] = obj
+                namespace[name] = null_time()
+            elif any(obj.__name__ == mod or obj.__name__.startswith(mod + '.') for mod in exp.headlessModules):
+                exp.headlessSaved[name] = obj
+                namespace[name] = exp.utils.null_object()
+                debug(exp, "Headless: replaced module {} ({})".format(name, obj.__name__))
+        elif obj is time.sleep:
+            exp.headlessSaved[name] = obj
+            namespace[name] = _null_sleep
+    log(exp, "Running headless, responses from: {}\n".format(type(exp.responder).__name__))
+
+
+def restore_headless(exp):
+    """Puts back the experiment script's bindings that make_headless replaced
+    """
+    if exp.headlessSaved:
+        vars(exp.experiment).update(exp.headlessSaved)
+    exp.headlessSaved = None
+
+
 def save_data(exp, message):
     if exp.recordData:
         if message is not None and message != '':
             message_exp = exp.utils.get_expanded_vals_in_string(message, exp)
-            exp.utils.write_data(message_exp, exp.dataFile)
+            exp.utils.write_out(exp, message_exp, exp.dataFile)
 
 
 def log(exp, message):
@@ -511,7 +996,7 @@ def log(exp, message):
             else:
                 print(message_exp),
         if exp.logFile is not None and exp.logFile is not '':
-            write_data(message_exp, exp.logFile)
+            write_out(exp, message_exp, exp.logFile)
 
     
 def debug(exp, message):
@@ -526,21 +1011,37 @@ def debug(exp, message):
         if exp.logFile is not None and exp.logFile is not '':
             if dmessage[-1:] != "\n":
                 dmessage += "\n"
-            write_data(dmessage, exp.logFile)
+            write_out(exp, dmessage, exp.logFile)
 
         
 def do_event(exp, event):
     debug(exp, "Begin Event: {}".format(event))
     exp.utils.update_time(exp.run)
+    tm = exp.timings
     if hasattr(exp, "{}_".format(event)):
         funcs = getattr(exp, "{}_".format(event))
         for f in funcs:
             if f.__name__ not in exp.disable_functions:
-                f(exp)
+                if tm is None:
+                    f(exp)
+                else:
+                    t = perf_counter()
+                    f(exp)
+                    tm.add("{}: {}.{}".format(event, f.__module__.split('.')[-1], f.__name__), perf_counter() - t)
+    t = perf_counter()
     if hasattr(exp, "logString_{}".format(event)):
         exp.utils.log(exp, getattr(exp, "logString_{}".format(event)))
+    if tm is not None:
+        tm.add("{}: log".format(event), perf_counter() - t)
+        t = perf_counter()
     if hasattr(exp, "dataString_{}".format(event)):
         exp.utils.save_data(exp, getattr(exp, "dataString_{}".format(event)))
+    if event == 'post_trial' and exp.recordData and exp.trialFile:
+        data.record_trial(exp)
+    if exp.writer is not None:
+        exp.writer.event(event)
+    if tm is not None:
+        tm.add("{}: save_data".format(event), perf_counter() - t)
     debug(exp, "End Event: {}".format(event))
         
         
@@ -562,10 +1063,13 @@ def obj_to_str(obj, name, indent=""):
     """Returns formatted, python-callable string representations of objects
         including classes, dicts, lists, and other built-in var types
     """
-    if isinstance(obj, dict):
+    if isinstance(obj, collections.abc.Mapping):
         outstr = "{}{} = {{\n".format(indent, name)
         for key, val in obj.items():
             if key[:2] != "__":
+                if hasattr(val, 'tolist'):
+                    # numpy arrays and scalars are written as plain lists and numbers
+                    val = val.tolist()
                 outstr += "{}    '{}' : {},\n".format(indent, key, repr(val))
         outstr += "{}}}\n".format(indent)
     elif isinstance(obj, list):
@@ -573,18 +1077,144 @@ def obj_to_str(obj, name, indent=""):
         for val in obj:
             outstr += "{}    {},\n".format(indent, repr(val))
         outstr += "{}]\n".format(indent)
-    elif isinstance(obj,(types.ClassType,types.InstanceType)):
+    elif isinstance(obj, (type, container)) or (hasattr(types, 'ClassType') and isinstance(obj,(types.ClassType,types.InstanceType))):
         outstr = "{}class {}():\n".format(indent, name)
-        items = getmembers(obj)
+        items = [(key, val) for key, val in getmembers(obj) if key[:2] != "__"]
         for key, val in items:
-            if key[:2] != "__":
-                outstr += "{}    {} = {}\n".format(indent, key, repr(val))
+            outstr += "{}    {} = {}\n".format(indent, key, repr(val))
+        if not items:
+            outstr += "{}    pass\n".format(indent)
         outstr += "{}\n".format(indent)
     else:
         outstr = "{}{} = {}\n".format(indent, name, repr(obj))
     return outstr
 
 
+def _get_currentvars(exp, delim):
+    # This func gets called from setup (for datafilename), and exp.var.current is not set at that point
+    if len(exp.var.current) == 0:
+        return None
+    return (delim or ",").join(str(val) for val in exp.var.current.values())
+
+
+def _get_currentvarsvals(exp, delim):
+    if len(exp.var.current) == 0:
+        return None
+    return (delim or ",").join("{} = {}".format(key, val) for key, val in exp.var.current.items())
+
+
+def _get_currentvars_names(exp, delim):
+    return (delim or ",").join(exp.var.varlist)
+
+
+def _get_var(exp, key):
+    if key in exp.var.current:
+        return str(exp.var.current[key])
+
+
+def _get_user(exp, key):
+    if key[:2] != "__" and hasattr(exp.user, key):
+        return str(getattr(exp.user, key))
+
+
+def _get_user_name(exp, key):
+    if key[:2] != "__" and hasattr(exp.user, key):
+        return key
+
+
+def _get_stim(exp, key):
+    if key[:2] != "__" and hasattr(exp.stim, key):
+        return str(getattr(exp.stim, key))
+
+
+def _get_stim_name(exp, key):
+    if key[:2] != "__" and hasattr(exp.stim, key):
+        return key
+
+
+def _get_dynamic(exp, key):
+    if hasattr(exp.var, 'dynamic') and key in exp.var.dynamic:
+        return str(exp.var.dynamic[key])
+
+
+def _get_dynamic_name(exp, key):
+    if hasattr(exp.var, 'dynamic') and key in exp.var.dynamic:
+        return key
+
+
+# Simple variable references ($name). Matched longest-first, so that eg.,
+# $trial_block is never read as $trial followed by '_block'
+_template_fields = {
+    'name':        lambda exp, arg: exp.name,
+    'note':        lambda exp, arg: "\n# ".join(getattr(exp, 'note', '').split('\n')),
+    'comments':    lambda exp, arg: "\n# ".join(exp.comments.split('\n')),
+    'host':        lambda exp, arg: exp.host,
+    'subj':        lambda exp, arg: str(exp.subjID),
+    'trial_block': lambda exp, arg: str(exp.run.trials_block+1),
+    'trial':       lambda exp, arg: str(exp.run.trials_exp+1),
+    'blocks':      lambda exp, arg: str(exp.run.nblocks),
+    'block':       lambda exp, arg: str(exp.run.block+1),
+    'conditions':  lambda exp, arg: str(exp.var.nlevels_total),
+    'condition':   lambda exp, arg: str(exp.run.condition+1),
+    'time':        lambda exp, arg: exp.run.time,
+    'date':        lambda exp, arg: exp.run.date,
+    'response':    lambda exp, arg: str(exp.run.response),
+}
+
+# Bracketed variable references ($user[varname]), keyed by (prefix, name)
+_template_args = {
+    ('$', 'currentvarsvals'): _get_currentvarsvals,
+    ('$', 'currentvars'):     _get_currentvars,
+    ('@', 'currentvars'):     _get_currentvars_names,
+    ('$', 'var'):             _get_var,
+    ('$', 'user'):            _get_user,
+    ('@', 'user'):            _get_user_name,
+    ('$', 'stim'):            _get_stim,
+    ('@', 'stim'):            _get_stim_name,
+    ('$', 'dynamic'):         _get_dynamic,
+    ('@', 'dynamic'):         _get_dynamic_name,
+}
+
+_template_re = re.compile(r"([$@])(?:({})\[([^\]]*)\]|({}))".format(
+    "|".join(sorted(set(name for prefix, name in _template_args), key=len, reverse=True)),
+    "|".join(sorted(_template_fields, key=len, reverse=True)),
+    ))
+
+
+@lru_cache(maxsize=512)
+def compile_template(instr):
+    """Parses a log or data string into a tuple of tokens
+
+        Each token is either a literal string, or a (getter, arg, source)
+        tuple, where getter(exp, arg) returns the current value of the
+        variable reference, or None if it can't be resolved (in which case
+        source, the reference as written, is used). Results are cached, so
+        each unique string is only parsed once.
+
+        See get_expanded_vals_in_string for the available references.
+    """
+    tokens = []
+    pos = 0
+    for match in _template_re.finditer(instr):
+        prefix, argname, arg, field = match.groups()
+        if argname is not None:
+            getter = _template_args.get((prefix, argname))
+            arg = arg.strip("\"\'")
+        elif prefix == '$':
+            getter = _template_fields[field]
+        else:
+            getter = None
+        if getter is None:
+            continue
+        if match.start() > pos:
+            tokens.append(instr[pos:match.start()])
+        tokens.append((getter, arg, match.group(0)))
+        pos = match.end()
+    if pos < len(instr):
+        tokens.append(instr[pos:])
+    return tuple(tokens)
+
+
 def get_expanded_vals_in_string(instr, exp):
     """Replaces all variable references with the specified variable's current value
 
@@ -592,12 +1222,15 @@ def get_expanded_vals_in_string(instr, exp):
 
         Var ref:         : Will be replaced with:
         $name            : The name of the experiment
+        $note            : The experiment note
+        $comments        : The experiment comments
         $host            : The name of the machine that the exp is being run on
         $subj            : The subject id
-        $resp            : The current response
+        $response        : The current response
         $trial           : The current trial number
         $trial_block     : The current trial number within the current block
         $block           : The current block number
+        $blocks          : The total number of blocks
         $condition       : The current condition number
         $conditions      : The total number of conditions
         $time            : The time the session started
@@ -612,84 +1245,21 @@ def get_expanded_vals_in_string(instr, exp):
                             instead of values (eg., for datafile header). 
         $user[varname]   : The value of a user variable
         $stim[varname]   : The value of a stim variable
-    """
+        $dynamic[varname]: The value of a dynamic (adaptive) variable
 
-    outstr = instr.replace("$name", exp.name)
-    outstr = outstr.replace("$note", "\n# ".join(exp.note.split('\n')) )
-    outstr = outstr.replace("$comments", "\n# ".join(exp.comments.split('\n')) )
-    outstr = outstr.replace("$host", exp.host)
-    outstr = outstr.replace("$subj", exp.subjID)
-    outstr = outstr.replace("$trial_block", str(exp.run.trials_block+1))
-    outstr = outstr.replace("$trial", str(exp.run.trials_exp+1))
-    outstr = outstr.replace("$blocks", str(exp.run.nblocks))
-    outstr = outstr.replace("$block", str(exp.run.block+1))
-    outstr = outstr.replace("$conditions", str(exp.var.nlevels_total))
-    outstr = outstr.replace("$condition", str(exp.run.condition+1))
-    outstr = outstr.replace("$time", exp.run.time)
-    outstr = outstr.replace("$date", exp.run.date)
-    outstr = outstr.replace("$response", exp.run.response)
-
-    # This func gets called from setup (for datafilename), and exp.var.current is not set at that point
-    if len(exp.var.current)>0:
-        currentvars = []
-        currentvarsvals = []
-        for key, val in exp.var.current.items():
-            currentvars.append(val)
-            currentvarsvals.append("{} = {}".format(key, val))
-            outstr = outstr.replace("$var[{}]".format(key), val)
-
-        got_cv = True
-        while got_cv:
-            expr, delim = get_arg(outstr,"$currentvarsvals")
-            if expr != "":
-                if delim == "":
-                    delim = ","
-                outstr = outstr.replace(expr, delim.join(currentvarsvals))
-            else:
-                got_cv = False
-
-        got_cv = True
-        while got_cv:
-            expr, delim = get_arg(outstr,"$currentvars")
-            if expr != "":
-                if delim == "":
-                    delim = ","
-                outstr = outstr.replace(expr, delim.join(currentvars))
-            else:
-                got_cv = False
-
-    varlist = []
-    for key in exp.var.varlist:
-        varlist.append(key)
-
-    got_cv = True
-    while got_cv:
-        expr, delim = get_arg(outstr,"@currentvars")
-        if expr != "":
-            if delim == "":
-                delim = ","
-            outstr = outstr.replace(expr, delim.join(varlist))
+        References that can't be resolved are left as is. The string is 
+        parsed once (see compile_template), and only the variables it 
+        references are looked up.
+    """
+    out = []
+    for token in compile_template(instr):
+        if isinstance(token, str):
+            out.append(token)
         else:
-            got_cv = False
-
-    items = getmembers(exp.user)
-    for key, val in items:
-        if key[:2] != "__":
-            outstr = outstr.replace("$user["+str(key)+"]", str(val))
-            outstr = outstr.replace("@user["+str(key)+"]", str(key))
-
-    items = getmembers(exp.stim)
-    for key, val in items:
-        if key[:2] != "__":
-            outstr = outstr.replace("$stim["+str(key)+"]", str(val))
-            outstr = outstr.replace("@stim["+str(key)+"]", str(key))
-
-    if hasattr(exp.var,'dynamic'):
-        for key, val in exp.var.dynamic.items():
-            outstr = outstr.replace("$dynamic["+str(key)+"]", str(val))
-            outstr = outstr.replace("@dynamic["+str(key)+"]", str(key))
-
-    return outstr
+            getter, arg, source = token
+            val = getter(exp, arg)
+            out.append(source if val is None else val)
+    return "".join(out)
 
 
 def get_arg(instr, var):